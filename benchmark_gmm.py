@@ -0,0 +1,310 @@
+"""Micro-benchmark untuk jalur data GMM (tanpa Streamlit).
+
+Jalankan:  python benchmark_gmm.py [nama_benchmark ...]
+Tanpa argumen, semua benchmark dijalankan.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import gmm_db
+import gmm_engine
+import gmm_history
+import gmm_import
+import gmm_search
+from gmm_import import TEXT_COLS, NUM_COLS, SHEET_SPECS
+
+AREAS = ["145", "161", "175", "181", "R11"]
+
+
+# ---------------------------
+# Data Sintetis
+# ---------------------------
+def synthetic_master(n_cabang, pegawai_per_cabang=10, seed=0):
+    """Frame master seperti hasil build_master_frame, dengan n_cabang x pegawai_per_cabang baris."""
+    rng = np.random.default_rng(seed)
+    n = n_cabang * pegawai_per_cabang
+    kode = np.repeat([f"{i:05d}" for i in range(n_cabang)], pegawai_per_cabang)
+    master = pd.DataFrame({"nip": [f"{9000000 + i}" for i in range(n)]})
+    for c in TEXT_COLS: master[c] = ""
+    master["nama"] = [f"PEGAWAI {i}" for i in range(n)]
+    master["kode_cabang"] = kode
+    master["unit"] = "KCP " + master["kode_cabang"]
+    master["area"] = rng.choice(AREAS, n)
+    master["kelas_cabang"] = rng.choice(["A", "B", "C", "A/R"], n)
+    master["posisi"] = rng.choice(["CS", "TELLER", "BO", "SALES"], n)
+    for c in NUM_COLS: master[c] = rng.integers(0, 1000, n).astype("float64")
+    return master
+
+def temp_database(master, with_base=True):
+    """Buat DB sementara berisi `master` (baseline + data berjalan). Kembalikan path file."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    gmm_db.create_schema(conn)
+    conn.commit()
+    if with_base: gmm_db.bulk_load_master(conn, master.sample(frac=1.0, random_state=1), is_base=True)
+    gmm_db.bulk_load_master(conn, master)
+    conn.close()
+    return path
+
+def synthetic_workbook(rows_per_sheet=50000, seed=0):
+    """Workbook .xlsx sementara dengan tiga sheet GMM x rows_per_sheet baris (header = alias pertama). Kembalikan path file."""
+    from openpyxl import Workbook
+    rng = np.random.default_rng(seed)
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    wb = Workbook(write_only=True)
+    nip = [str(9000000 + i) for i in range(rows_per_sheet)]
+    for name, spec in SHEET_SPECS.items():
+        ws = wb.create_sheet(name)
+        text_cols, num_cols = list(spec["text"]), list(spec["num"])
+        ws.append([spec["nip"][0]] + [spec["text"][c][0] for c in text_cols] + [spec["num"][c][0] for c in num_cols])
+        nums = rng.integers(0, 1000, (rows_per_sheet, len(num_cols))).tolist()
+        for i in range(rows_per_sheet):
+            ws.append([nip[i]] + [f"{c.upper()} {i % 997}" for c in text_cols] + nums[i])
+    wb.save(path)
+    return path
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix): os.remove(path + suffix)
+
+def timeit(fn, repeat=200):
+    """Rata-rata durasi satu panggilan fn() dalam milidetik."""
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+def bench_profil_cabang(sizes=(100, 1000, 5000), repeat=200):
+    """Latensi ambil rank satu cabang: lookup snapshot vs filter tiga leaderboard penuh."""
+    rows = []
+    for n_cabang in sizes:
+        path = temp_database(synthetic_master(n_cabang, pegawai_per_cabang=5))
+        pool = gmm_db.ConnectionPool(path)
+        kode = f"{n_cabang // 2:05d}"
+
+        def lookup():
+            with pool.read() as conn:
+                return gmm_db.get_entity_ranks(conn, "cabang", kode)
+
+        def full_scan():
+            ranks = {}
+            for kategori in gmm_db.SNAPSHOT_KATEGORI:
+                df = pool.read_df("SELECT entity_id AS kode_cabang, rank_current FROM leaderboard_snapshot WHERE kategori = ? AND entity = 'cabang'", params=(kategori,))
+                ranks[kategori] = df[df["kode_cabang"] == kode]["rank_current"].values[0]
+            return ranks
+
+        assert {k: v[0] for k, v in lookup().items()} == full_scan()
+        rows.append({"Cabang": n_cabang, "Lookup (ms)": round(timeit(lookup, repeat), 4),
+                     "3x Leaderboard (ms)": round(timeit(full_scan, max(1, repeat // 10)), 4)})
+        pool.close()
+        remove_database(path)
+    return pd.DataFrame(rows)
+
+def bench_engine(sizes=(1000, 5000), repeat=200):
+    """Satu halaman pegawai per area & leaderboard cabang: engine in-memory vs tarik snapshot + pandas."""
+    rows = []
+    for n_cabang in sizes:
+        path = temp_database(synthetic_master(n_cabang, pegawai_per_cabang=10))
+        pool = gmm_db.ConnectionPool(path)
+        area = AREAS[1]
+        t0 = time.perf_counter()
+        with pool.read() as conn: engine = gmm_engine.LeaderboardEngine.from_connection(conn)
+        load_ms = (time.perf_counter() - t0) * 1000
+
+        def sql_page():
+            df = pool.read_df("""
+                SELECT entity_id, growth_score, score, sec FROM leaderboard_snapshot
+                WHERE kategori = 'LIVIN' AND entity = 'pegawai' AND area = ? AND posisi = 'CS'
+            """, params=(area,))
+            return df.sort_values(["growth_score", "entity_id"], ascending=[False, True]).iloc[50:100]
+
+        def sql_cabang():
+            return pool.read_df("SELECT * FROM leaderboard_snapshot WHERE kategori = 'LIVIN' AND entity = 'cabang' ORDER BY rank_current")
+
+        rows.append({"Pegawai": n_cabang * 10, "Load Engine (ms)": round(load_ms, 1),
+                     "Memori Engine (MB)": round(engine.nbytes() / (1024 * 1024), 2),
+                     "Halaman SQL + Pandas (ms)": round(timeit(sql_page, repeat // 4), 3),
+                     "Halaman Engine (ms)": round(timeit(lambda: engine.pegawai_page("LIVIN", "area", area, "CS", "growth_score", False, 2, 50), repeat), 3),
+                     "Cabang SQL + Pandas (ms)": round(timeit(sql_cabang, repeat // 4), 3),
+                     "Cabang Engine (ms)": round(timeit(lambda: engine.cabang_leaderboard("LIVIN"), repeat), 3)})
+        pool.close()
+        remove_database(path)
+    return pd.DataFrame(rows)
+
+def bench_search(n_cabang=5000, repeat=100):
+    """View CARI di 50k pegawai: query search_index (20 hasil) vs tarik semua opsi + filter di Python."""
+    path = temp_database(synthetic_master(n_cabang, pegawai_per_cabang=10), with_base=False)
+    pool = gmm_db.ConnectionPool(path)
+    with pool.read() as conn: engine = "FTS5 trigram" if gmm_search.is_fts(conn) else "LIKE"
+    rows = []
+    for query in ["PEGAWAI 4321", "9012345", "KCP 00123", "4321", "zzz"]:
+        def indexed():
+            with pool.read() as conn:
+                return gmm_search.search(conn, query)
+
+        def full_list():
+            with pool.read() as conn:
+                peg = [f"👤 {r[0]} - {r[1]}" for r in conn.execute("SELECT nip, nama FROM pegawai ORDER BY nama ASC")]
+                cab = [f"🏢 {r[0]} - {r[1]}" for r in conn.execute("SELECT kode_cabang, unit FROM cabang WHERE valid = 1 ORDER BY unit ASC")]
+            terms = query.lower().split()
+            return [o for o in cab + peg if all(t in o.lower() for t in terms)]
+
+        rows.append({"Query": query, "Indeks": engine, "Hasil": len(indexed()),
+                     "Cari Indeks (ms)": round(timeit(indexed, repeat), 3),
+                     "Daftar Penuh (ms)": round(timeit(full_list, max(1, repeat // 20)), 3)})
+    pool.close()
+    remove_database(path)
+    return pd.DataFrame(rows)
+
+def bench_history(sizes=(500, 5000), uploads=10, repeat=5):
+    """Riwayat snapshot: ukuran per upload, waktu append, delta harian & trajectory satu pegawai."""
+    rows = []
+    for n_cabang in sizes:
+        path = temp_database(synthetic_master(n_cabang, pegawai_per_cabang=10), with_base=False)
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        t0 = time.perf_counter()
+        for day in range(1, uploads):
+            gmm_history.append_snapshot(cur, f"2026-01-{day + 1:02d} 08:00:00")
+        conn.commit()
+        append_ms = (time.perf_counter() - t0) / (uploads - 1) * 1000
+        size, count = gmm_history.storage_bytes(conn)
+        nip = f"{9000000 + n_cabang}"
+        rows.append({"Pegawai": n_cabang * 10, "Upload": count, "KB / Upload": round(size / count / 1024, 1),
+                     "Setahun Harian (MB)": round(size / count * 365 / 1024 / 1024, 1),
+                     "Append (ms)": round(append_ms, 1),
+                     "Top Movers Harian (ms)": round(timeit(lambda: gmm_history.top_movers(conn, "pegawai", "LIVIN", 1), repeat), 2),
+                     "Trajectory (ms)": round(timeit(lambda: gmm_history.trajectory(conn, "pegawai", nip, "LIVIN"), repeat), 2)})
+        conn.close()
+        remove_database(path)
+    return pd.DataFrame(rows)
+
+def bench_delta_import(n_cabang=1000, changed_pct=(0, 1, 10)):
+    """Upload Data Berjalan ulang: import penuh vs import delta, untuk beberapa persentase baris berubah."""
+    master = synthetic_master(n_cabang, pegawai_per_cabang=10)
+    rows = []
+    for pct in changed_pct:
+        upload = master.copy()
+        n_changed = len(upload) * pct // 100
+        upload.loc[upload.index[:n_changed], "end_balance"] += 1
+        result = {"Berubah (%)": pct}
+        for label, delta in (("Penuh", False), ("Delta", True)):
+            path = temp_database(master, with_base=False)
+            conn = sqlite3.connect(path)
+            diff_counts = {}
+            t0 = time.perf_counter()
+            gmm_db.bulk_load_master(conn, upload, delta=delta, diff_counts=diff_counts)
+            result[f"{label} (ms)"] = round((time.perf_counter() - t0) * 1000, 1)
+            if delta: result["Ditulis"] = diff_counts["Baru"] + diff_counts["Berubah"] + diff_counts["Dinonaktifkan"]
+            conn.close()
+            remove_database(path)
+        rows.append(result)
+    return pd.DataFrame(rows)
+
+def bench_parse(rows_per_sheet=50000, repeat=3):
+    """Parse & normalisasi workbook 3 sheet: serial vs satu proses per sheet (wall time, hasil harus identik)."""
+    path = synthetic_workbook(rows_per_sheet)
+    rows = []
+    try:
+        results = {}
+        for label, parallel in (("Serial", False), ("Paralel", True)):
+            t0 = time.perf_counter()
+            for _ in range(repeat): results[label] = gmm_import.build_master_frame_streaming(path, parallel=parallel)
+            rows.append({"Mode": label, "Baris/Sheet": rows_per_sheet, "CPU": os.cpu_count(),
+                         "Wall (detik)": round((time.perf_counter() - t0) / repeat, 2)})
+        pd.testing.assert_frame_equal(results["Serial"], results["Paralel"])
+    finally:
+        os.remove(path)
+    df = pd.DataFrame(rows)
+    df["Speedup"] = (df["Wall (detik)"].iloc[0] / df["Wall (detik)"]).round(2)
+    return df
+
+def bench_import_memory(rows_per_sheet=10000):
+    """Puncak alokasi Python (tracemalloc, opt-in) saat parse: baca penuh read_excel vs streaming."""
+    path = synthetic_workbook(rows_per_sheet)
+    rows = []
+    try:
+        for label in ("Baca Penuh", "Streaming"):
+            t0 = time.perf_counter()
+            with gmm_import.PeakMemory(trace=True) as mem:
+                if label == "Streaming": gmm_import.build_master_frame_streaming(path)
+                else: gmm_import.build_master_frame(pd.read_excel(path, sheet_name=None, dtype=str))
+            rows.append({"Mode": label, "Baris/Sheet": rows_per_sheet, "Puncak Alokasi (MB)": round(mem.peak_mb, 1),
+                         "Wall + tracemalloc (detik)": round(time.perf_counter() - t0, 2)})
+    finally:
+        os.remove(path)
+    return pd.DataFrame(rows)
+
+def payload_bytes(df):
+    """Perkiraan byte yang dikirim SQLite ke Python: 8 byte per angka, panjang UTF-8 per teks."""
+    total = 0
+    for row in df.itertuples(index=False):
+        for v in row:
+            if isinstance(v, str): total += len(v.encode("utf-8"))
+            elif not pd.isna(v): total += 8
+    return total
+
+def bench_projection(n_cabang=1000, pegawai_per_cabang=10):
+    """Byte ditarik & memori DataFrame per view: query lama (SELECT *) vs proyeksi sempit per kategori."""
+    path = temp_database(synthetic_master(n_cabang, pegawai_per_cabang))
+    conn = sqlite3.connect(path)
+    nip, kode, area = "9000015", "00001", AREAS[1]
+    kats = tuple(gmm_db.KATEGORI_METRICS)
+    engine = gmm_engine.LeaderboardEngine.from_connection(conn)
+    sql = lambda q, *params: (lambda: pd.read_sql_query(q, conn, params=params))
+    views = {
+        "Leaderboard Pegawai (area)": (
+            sql("""SELECT p.*, s.score, s.score_base, s.growth_score, s.sec, s.sec_base, s.growth_sec, s.rank_current, s.rank_base, s.rank_change
+                   FROM leaderboard_snapshot s JOIN pegawai p ON p.nip = s.entity_id
+                   WHERE s.kategori = 'LIVIN' AND s.entity = 'pegawai' AND s.area = ?""", area),
+            lambda: engine.pegawai_page("LIVIN", "area", area)[0],
+        ),
+        "Profil Pegawai": (
+            sql("SELECT * FROM pegawai WHERE nip = ?", nip),
+            lambda: gmm_db.query_pegawai_profile(conn, nip, kats),
+        ),
+        "Profil Cabang (MERCHANT)": (
+            sql("SELECT c.*, p.* FROM cabang c JOIN pegawai p ON c.kode_cabang = p.kode_cabang AND p.is_active = 1 WHERE c.kode_cabang = ?", kode),
+            lambda: gmm_db.query_cabang_profile(conn, kode, ("MERCHANT",)),
+        ),
+    }
+    rows = []
+    for view, (old, new) in views.items():
+        df_old, df_new = old(), new()
+        rows.append({"View": view, "Kolom Lama": df_old.shape[1], "Kolom Baru": df_new.shape[1],
+                     "Byte Lama": payload_bytes(df_old), "Byte Baru": payload_bytes(df_new),
+                     "Memori Lama (KB)": round(df_old.memory_usage(deep=True).sum() / 1024, 1),
+                     "Memori Baru (KB)": round(df_new.memory_usage(deep=True).sum() / 1024, 1)})
+    conn.close()
+    remove_database(path)
+    return pd.DataFrame(rows)
+
+BENCHMARKS = {
+    "profil_cabang": bench_profil_cabang,
+    "projection": bench_projection,
+    "engine": bench_engine,
+    "search": bench_search,
+    "history": bench_history,
+    "delta_import": bench_delta_import,
+    "parse": bench_parse,
+    "import_memory": bench_import_memory,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        print(BENCHMARKS[name]().to_string(index=False))
+        print()
@@ -0,0 +1,684 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import gmm_history
+import gmm_jobs
+import gmm_logship
+import gmm_search
+from gmm_import import TEXT_COLS, NUM_COLS, MASTER_COLS, SHEET_SPECS, SHEET_LIVIN, SHEET_MERCHANT, SHEET_TRANSAKSI
+
+# ---------------------------
+# Koneksi SQLite (Pool Reader + Writer Tunggal)
+# ---------------------------
+BASE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MB
+    "PRAGMA cache_size=-65536",     # 64 MB (nilai negatif = KiB)
+    "PRAGMA temp_store=MEMORY",
+]
+
+class ConnectionPool:
+    """Pengelola koneksi bersama untuk semua helper query.
+
+    Reader: koneksi read-only yang dipinjam satu thread pada satu waktu lalu
+    dikembalikan ke pool, jadi pragma & open file hanya dibayar sekali.
+    Writer: satu koneksi yang diserialisasi dengan lock; commit otomatis di
+    akhir blok, rollback jika terjadi error. Berkat WAL, reader tidak ikut
+    menunggu saat import sedang menulis.
+    """
+    def __init__(self, db_path, max_readers=8, timeout=15.0):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._created_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+
+    def _connect(self, readonly):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for pragma in BASE_PRAGMAS:
+            conn.execute(pragma)
+        if readonly: conn.execute("PRAGMA query_only=1")
+        return conn
+
+    @contextmanager
+    def read(self):
+        conn = None
+        try: conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._created_lock:
+                if self._created < self.max_readers:
+                    conn = self._connect(readonly=True)
+                    self._created += 1
+            if conn is None: conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction: conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def write(self):
+        with self._writer_lock:
+            if self._writer is None: self._writer = self._connect(readonly=False)
+            conn = self._writer
+            try:
+                yield conn
+                if conn.in_transaction: conn.commit()
+            except Exception:
+                if conn.in_transaction: conn.rollback()
+                raise
+
+    def read_df(self, sql, params=(), dtype=None):
+        with self.read() as conn:
+            return pd.read_sql_query(sql, conn, params=params, dtype=dtype)
+
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None: self._writer.close(); self._writer = None
+        while True:
+            try: self._idle.get_nowait().close()
+            except queue.Empty: break
+        with self._created_lock: self._created = 0
+
+
+# ---------------------------
+# Skema Database
+# ---------------------------
+def create_schema(conn):
+    """Buat seluruh tabel & index (idempoten); kolom baru ditambah via ALTER TABLE."""
+    cur = conn.cursor()
+
+    # --- CREATE TABLE ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cabang (
+            kode_cabang TEXT PRIMARY KEY,
+            unit TEXT,
+            area TEXT,
+            nama_cabang TEXT,
+            kelas_cabang TEXT
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pegawai (
+            nip TEXT PRIMARY KEY,
+            nama TEXT,
+            kode_cabang TEXT,
+            unit TEXT,
+            area TEXT,
+            nama_cabang TEXT,
+            posisi TEXT,
+            avatar_url TEXT,
+            end_balance REAL DEFAULT 0,
+            cif_akuisisi REAL DEFAULT 0,
+            cif_setor REAL DEFAULT 0,
+            cif_sudah_transaksi REAL DEFAULT 0,
+            frek_dari_cif_akuisisi REAL DEFAULT 0,
+            rata_rata REAL DEFAULT 0,
+            total_referral_livin REAL DEFAULT 0,
+            total_referral_edc REAL DEFAULT 0,
+            total_poin_transaksi REAL DEFAULT 0,
+            poin_on_us REAL DEFAULT 0,
+            poin_off_us REAL DEFAULT 0,
+            frek_on_us REAL DEFAULT 0,
+            frek_off_us REAL DEFAULT 0,
+            pct_on_us REAL DEFAULT 0,
+            FOREIGN KEY (kode_cabang) REFERENCES cabang(kode_cabang)
+        )
+    """)
+
+    # --- TAMBAH KOLOM BASE ---
+    base_cols = [
+        "end_balance_base", "cif_akuisisi_base", "cif_setor_base",
+        "cif_sudah_transaksi_base", "frek_dari_cif_akuisisi_base",
+        "rata_rata_base", "total_referral_livin_base",
+        "total_referral_edc_base", "total_poin_transaksi_base",
+        "poin_on_us_base", "poin_off_us_base",
+        "frek_on_us_base", "frek_off_us_base", "pct_on_us_base"
+    ]
+
+    for col in base_cols:
+        try:
+            cur.execute(f"ALTER TABLE pegawai ADD COLUMN {col} REAL DEFAULT 0")
+        except:
+            pass
+
+    # --- KOLOM ACTIVE ---
+    try:
+        cur.execute("ALTER TABLE pegawai ADD COLUMN is_active INTEGER DEFAULT 1")
+    except:
+        pass
+
+    # --- KOLOM HASH BARIS (import delta) ---
+    try:
+        cur.execute("ALTER TABLE pegawai ADD COLUMN row_hash INTEGER")
+    except:
+        pass
+
+    # --- KOLOM VALID (kode_cabang bersih, dihitung saat import) ---
+    added_valid = False
+    for table in ("pegawai", "cabang"):
+        try:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN valid INTEGER DEFAULT 0")
+            added_valid = True
+        except:
+            pass
+    if added_valid: refresh_valid_flags(cur)
+
+    # --- INDEX (WAJIB untuk performa) ---
+    # idx_pegawai_nip (duplikat PK) & idx_pegawai_is_active (hanya 2 nilai) tidak pernah terpakai planner
+    cur.execute("DROP INDEX IF EXISTS idx_pegawai_nip")
+    cur.execute("DROP INDEX IF EXISTS idx_pegawai_is_active")
+    cur.execute("DROP INDEX IF EXISTS idx_pegawai_kode_cabang")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_kode_active ON pegawai(kode_cabang, is_active)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_area ON pegawai(area)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cabang_valid_unit ON cabang(valid, unit, kode_cabang)")
+
+    # --- ACCESS LOG ---
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS access_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            waktu TEXT,
+            nip TEXT,
+            nama TEXT,
+            ip_address TEXT
+        )
+    """)
+    gmm_logship.ensure_visit_stats(conn)
+
+    # --- SNAPSHOT LEADERBOARD, INDEKS PENCARIAN & VERSI DATA ---
+    ensure_leaderboard_snapshot(conn)
+    gmm_search.ensure_search_index(conn, SEARCH_CABANG_WHERE)
+    gmm_history.create_history_tables(cur)
+    gmm_jobs.create_jobs_table(conn)
+    create_meta_table(cur)
+
+
+# ---------------------------
+# Bulk Load Hasil Import (Staging Table)
+# ---------------------------
+PEGAWAI_TEXT_COLS = ["nama", "kode_cabang", "unit", "area", "posisi"]
+
+def _create_staging(cur):
+    cols_sql = ", ".join(["nip TEXT PRIMARY KEY"] + [f"{c} TEXT" for c in TEXT_COLS] + [f"{c} REAL" for c in NUM_COLS] + ["row_hash INTEGER"])
+    cur.execute("DROP TABLE IF EXISTS temp.staging_pegawai")
+    cur.execute(f"CREATE TEMP TABLE staging_pegawai ({cols_sql})")
+
+def _fill_staging(cur, master, hashes):
+    _create_staging(cur)
+    cols = MASTER_COLS + ["row_hash"]
+    rows = master[MASTER_COLS].assign(row_hash=hashes)
+    cur.executemany(f"INSERT INTO staging_pegawai ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})",
+                    rows.itertuples(index=False, name=None))
+
+def _upsert_pegawai_sql(is_base):
+    # Baseline hanya mengisi kolom *_base, Data Berjalan mengisi kolom utama + menandai aktif.
+    # Baseline juga bisa mengubah kolom teks, jadi row_hash dikosongkan agar import delta berikutnya menulis ulang.
+    metric_cols = [f"{c}_base" for c in NUM_COLS] if is_base else list(NUM_COLS)
+    target_cols = ["nip"] + PEGAWAI_TEXT_COLS + metric_cols + ["row_hash"]
+    select_cols = ["nip"] + PEGAWAI_TEXT_COLS + list(NUM_COLS) + ["NULL" if is_base else "row_hash"]
+    update_cols = PEGAWAI_TEXT_COLS + metric_cols + ["row_hash"]
+    if not is_base:
+        target_cols.append("is_active")
+        select_cols.append("1")
+        update_cols.append("is_active")
+
+    return f"""
+        INSERT INTO pegawai ({", ".join(target_cols)})
+        SELECT {", ".join(select_cols)} FROM staging_pegawai WHERE true
+        ON CONFLICT(nip) DO UPDATE SET {", ".join(f"{c}=excluded.{c}" for c in update_cols)}
+    """
+
+def row_hashes(master):
+    """Hash 64-bit per baris untuk semua kolom yang ditulis ke `pegawai` (dibandingkan saat import delta)."""
+    cols = ["nip"] + PEGAWAI_TEXT_COLS + list(NUM_COLS)
+    return pd.util.hash_pandas_object(master[cols], index=False).to_numpy().view("int64")
+
+def _diff_pegawai(conn, master, hashes):
+    """Bandingkan master dengan isi `pegawai`: (mask baris baru/berubah, NIP yang hilang, dict jumlah)."""
+    existing = pd.read_sql_query("SELECT nip, row_hash AS stored_hash, is_active FROM pegawai", conn, dtype={"stored_hash": "Int64"})
+    incoming = pd.DataFrame({"nip": master["nip"].to_numpy(), "row_hash": hashes})
+    merged = incoming.merge(existing, on="nip", how="left", indicator=True)
+    is_new = (merged["_merge"] == "left_only").to_numpy()
+    # Baris lama tanpa hash (import penuh sebelumnya / baseline) atau non-aktif selalu ditulis ulang
+    changed = ~is_new & (merged["stored_hash"].ne(merged["row_hash"]).fillna(True) | (merged["is_active"] != 1)).to_numpy(dtype=bool)
+    gone = existing.loc[(existing["is_active"] == 1) & ~existing["nip"].isin(incoming["nip"]), "nip"].tolist()
+    counts = {"Baru": int(is_new.sum()), "Berubah": int(changed.sum()),
+              "Tetap": int(len(merged) - is_new.sum() - changed.sum()), "Dinonaktifkan": len(gone)}
+    return is_new | changed, gone, counts
+
+def _changed_cabang(conn, master):
+    """Cabang dari master (baris terakhir per kode menang) yang berbeda dari isi tabel `cabang`."""
+    cols = ["kode_cabang", "unit", "area", "kelas_cabang"]
+    incoming = master.loc[master["kode_cabang"] != "", cols].drop_duplicates("kode_cabang", keep="last")
+    existing = pd.read_sql_query(f"SELECT {', '.join(cols)} FROM cabang", conn)
+    merged = incoming.merge(existing, on="kode_cabang", how="left", suffixes=("", "_db"), indicator=True)
+    diff = merged["_merge"] == "left_only"
+    # NULL lama (import versi awal) dan '' dianggap sama, begitu juga spasi di tepi
+    norm = lambda s: s.fillna("").astype(str).str.strip()
+    for c in cols[1:]: diff |= norm(merged[c]) != norm(merged[f"{c}_db"])
+    return merged.loc[diff, cols]
+
+def _changed_columns(cur):
+    """Kolom pegawai yang berbeda antara staging (change set) dan isi tabel sekarang, lewat join PK.
+
+    'is_active' ikut jika ada NIP non-aktif yang aktif kembali. Biaya
+    sebanding jumlah baris yang berubah, bukan jumlah pegawai.
+    """
+    cols = PEGAWAI_TEXT_COLS + list(NUM_COLS)
+    row = cur.execute(f"""
+        SELECT {", ".join(f"MAX(p.{c} IS NOT s.{c})" for c in cols)}, MAX(p.is_active IS NOT 1)
+        FROM staging_pegawai s JOIN pegawai p ON p.nip = s.nip
+    """).fetchone()
+    return {c for c, hit in zip(cols + ["is_active"], row) if hit}
+
+def bulk_load_master(conn, master, is_base=False, timings=None, delta=False, diff_counts=None):
+    """Tulis hasil build_master_frame ke DB dalam satu transaksi.
+
+    Frame dimuat ke temp table via executemany, lalu satu INSERT ... SELECT
+    ... ON CONFLICT ke `pegawai` dan satu lagi (deduplikasi per kode_cabang,
+    baris terakhir menang) ke `cabang`. Untuk Data Berjalan, reset
+    `is_active` ikut dalam transaksi yang sama, begitu juga rebuild
+    `leaderboard_snapshot`, indeks pencarian dan kenaikan versi data.
+    Data Berjalan juga ditambahkan ke riwayat snapshot per upload.
+
+    `delta=True` (khusus Data Berjalan): hanya baris yang hash-nya berbeda
+    dari `pegawai.row_hash`, NIP baru, dan NIP yang hilang (dinonaktifkan)
+    yang ditulis; jumlahnya diisi ke `diff_counts`. Jika tidak ada yang
+    berubah, snapshot & versi data tidak disentuh sehingga cache tetap hangat.
+    Jika hanya skor yang berubah, snapshot dihitung ulang penuh untuk
+    kategori yang kolom sumbernya berubah saja (rank global ikut bergeser,
+    jadi tidak bisa per baris); indeks pencarian hanya dibangun ulang jika
+    ada NIP baru, cabang berubah, atau nama/unit/kode_cabang berubah.
+    """
+    if timings is None: timings = {}
+    if diff_counts is None: diff_counts = {}
+    delta = delta and not is_base
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        t0 = time.perf_counter()
+        hashes = row_hashes(master)
+        if delta:
+            write_mask, gone, counts = _diff_pegawai(conn, master, hashes)
+            cabang_rows = _changed_cabang(conn, master)
+            counts["Cabang Berubah"] = len(cabang_rows)
+            diff_counts.update(counts)
+            _fill_staging(cur, master[write_mask], hashes[write_mask])
+            changed_cols = _changed_columns(cur)
+            timings["Diff & Staging"] = time.perf_counter() - t0
+        else:
+            _fill_staging(cur, master, hashes)
+            timings["Staging"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if delta:
+            cur.executemany("UPDATE pegawai SET is_active = 0 WHERE nip = ?", [(nip,) for nip in gone])
+            cur.execute(_upsert_pegawai_sql(is_base))
+            cur.executemany("""
+                INSERT INTO cabang (kode_cabang, unit, area, kelas_cabang) VALUES (?, ?, ?, ?)
+                ON CONFLICT(kode_cabang) DO UPDATE SET unit=excluded.unit, area=excluded.area, kelas_cabang=excluded.kelas_cabang
+            """, cabang_rows.itertuples(index=False, name=None))
+        else:
+            if not is_base: cur.execute("UPDATE pegawai SET is_active = 0")
+            cur.execute(_upsert_pegawai_sql(is_base))
+            cur.execute("""
+                INSERT INTO cabang (kode_cabang, unit, area, kelas_cabang)
+                SELECT kode_cabang, unit, area, kelas_cabang FROM staging_pegawai
+                WHERE rowid IN (SELECT MAX(rowid) FROM staging_pegawai WHERE kode_cabang != '' GROUP BY kode_cabang)
+                ON CONFLICT(kode_cabang) DO UPDATE SET unit=excluded.unit, area=excluded.area, kelas_cabang=excluded.kelas_cabang
+            """)
+        cur.execute("DROP TABLE IF EXISTS temp.staging_pegawai")
+        refresh_valid_flags(cur)
+        timings["Upsert Pegawai & Cabang"] = time.perf_counter() - t0
+
+        kategoris, rebuild_search = list(SNAPSHOT_KATEGORI), True
+        if delta:
+            if not any(diff_counts[k] for k in ("Baru", "Berubah", "Dinonaktifkan", "Cabang Berubah")):
+                conn.commit()
+                return len(master)
+            # Anggota/identitas berubah -> semua kategori; selain itu hanya kategori yang kolom skornya berubah
+            membership = any(diff_counts[k] for k in ("Baru", "Dinonaktifkan", "Cabang Berubah")) or changed_cols & {*PEGAWAI_TEXT_COLS, "is_active"}
+            if not membership: kategoris = [k for k, cols in SNAPSHOT_SOURCE_COLS.items() if changed_cols & set(cols)]
+            rebuild_search = bool(diff_counts["Baru"] or diff_counts["Cabang Berubah"] or changed_cols & set(SEARCH_SOURCE_COLS))
+
+        t0 = time.perf_counter()
+        if kategoris: rebuild_leaderboard_snapshot(cur, kategoris)
+        timings["Snapshot Leaderboard"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if rebuild_search: gmm_search.rebuild_search_index(cur, SEARCH_CABANG_WHERE)
+        bump_data_version(cur)
+        timings["Indeks Pencarian"] = time.perf_counter() - t0
+
+        # Baseline tidak mengubah skor berjalan, jadi tidak dicatat sebagai upload baru;
+        # begitu juga upload yang tidak menggeser skor/rank kategori mana pun
+        t0 = time.perf_counter()
+        if not is_base and kategoris: gmm_history.append_snapshot(cur, data_version=get_data_version(conn))
+        conn.commit()
+        timings["Riwayat Snapshot"] = time.perf_counter() - t0
+    except Exception:
+        conn.rollback()
+        raise
+    return len(master)
+
+
+# ---------------------------
+# Snapshot Leaderboard (Materialisasi Ranking)
+# ---------------------------
+# (score_col, sec_col) per kategori, sama dengan KAT_CONFIG di aplikasi
+SNAPSHOT_KATEGORI = {
+    "LIVIN": ("end_balance", "cif_akuisisi"),
+    "MERCHANT": ("total_referral_edc", "total_referral_livin"),
+    "TRANSAKSI": ("pct_on_us", "total_poin_transaksi"),
+}
+# Kolom pegawai yang dibaca _pegawai_exprs & _cabang_exprs per kategori (import delta: kategori lain tidak dihitung ulang)
+SNAPSHOT_SOURCE_COLS = {
+    "LIVIN": ["end_balance", "cif_akuisisi"],
+    "MERCHANT": ["total_referral_edc", "total_referral_livin"],
+    "TRANSAKSI": ["frek_on_us", "frek_off_us", "total_poin_transaksi", "poin_on_us"],
+}
+
+VALID_KODE_SQL = "{k} IS NOT NULL AND TRIM({k}) != '' AND LOWER({k}) NOT IN ('unknown', 'nan','aktif')"
+
+# Cabang yang boleh muncul di hasil pencarian (sama dengan daftar cabang lama di view CARI)
+SEARCH_CABANG_WHERE = "valid = 1"
+# Kolom pegawai yang ikut diindeks gmm_search.rebuild_search_index
+SEARCH_SOURCE_COLS = ["nama", "unit", "kode_cabang"]
+
+def refresh_valid_flags(cur):
+    """Evaluasi filter kode sampah sekali (saat import) ke kolom `valid` pegawai & cabang."""
+    for table in ("pegawai", "cabang"):
+        cur.execute(f"UPDATE {table} SET valid = ({VALID_KODE_SQL.format(k='kode_cabang')}) WHERE valid IS NOT ({VALID_KODE_SQL.format(k='kode_cabang')})")
+
+def _cabang_exprs(kategori):
+    """(score, score_base, sec, sec_base) agregat cabang; TRANSAKSI dijumlah dari poin."""
+    if kategori == "TRANSAKSI":
+        return "SUM(p.total_poin_transaksi)", "SUM(p.total_poin_transaksi_base)", "SUM(p.poin_on_us)", "SUM(p.poin_on_us_base)"
+    sc, se = SNAPSHOT_KATEGORI[kategori]
+    return f"SUM(p.{sc})", f"SUM(p.{sc}_base)", f"SUM(p.{se})", f"SUM(p.{se}_base)"
+
+def _pegawai_exprs(kategori):
+    """(score, score_base, sec, sec_base) per pegawai; TRANSAKSI memakai rasio frekuensi on-us."""
+    if kategori == "TRANSAKSI":
+        sc = "(CASE WHEN (p.frek_on_us + p.frek_off_us) > 0 THEN (p.frek_on_us / (p.frek_on_us + p.frek_off_us)) ELSE 0 END)"
+        return sc, "p.pct_on_us_base", "p.total_poin_transaksi", "p.total_poin_transaksi_base"
+    sc, se = SNAPSHOT_KATEGORI[kategori]
+    return f"p.{sc}", f"p.{sc}_base", f"p.{se}", f"p.{se}_base"
+
+SNAPSHOT_COLS = [
+    "kategori", "entity", "entity_id", "nama", "kode_cabang", "unit", "area", "kelas_cabang", "posisi",
+    "score", "score_base", "growth_score", "sec", "sec_base", "growth_sec",
+    "jumlah_pegawai", "rank_current", "rank_base", "rank_change",
+    "rank_current_area", "rank_base_area", "rank_change_area",
+    "rank_current_cabang", "rank_base_cabang", "rank_change_cabang",
+]
+
+def create_snapshot_table(cur):
+    # Snapshot murni turunan: jika kolomnya tertinggal dari SNAPSHOT_COLS, buang & buat ulang
+    existing = [r[1] for r in cur.execute("PRAGMA table_info(leaderboard_snapshot)").fetchall()]
+    if existing and existing != SNAPSHOT_COLS: cur.execute("DROP TABLE leaderboard_snapshot")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard_snapshot (
+            kategori TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            nama TEXT,
+            kode_cabang TEXT,
+            unit TEXT,
+            area TEXT,
+            kelas_cabang TEXT,
+            posisi TEXT,
+            score REAL DEFAULT 0,
+            score_base REAL DEFAULT 0,
+            growth_score REAL DEFAULT 0,
+            sec REAL DEFAULT 0,
+            sec_base REAL DEFAULT 0,
+            growth_sec REAL DEFAULT 0,
+            jumlah_pegawai INTEGER DEFAULT 0,
+            rank_current INTEGER,
+            rank_base INTEGER,
+            rank_change INTEGER,
+            rank_current_area INTEGER,
+            rank_base_area INTEGER,
+            rank_change_area INTEGER,
+            rank_current_cabang INTEGER,
+            rank_base_cabang INTEGER,
+            rank_change_cabang INTEGER,
+            PRIMARY KEY (kategori, entity, entity_id)
+        )
+    """)
+    cur.execute("DROP INDEX IF EXISTS idx_snapshot_rank")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_global_rank ON leaderboard_snapshot(kategori, entity, rank_current, entity_id)")
+    # Paging per area/cabang dikerjakan gmm_engine di memori; index rank per scope hanya menambah biaya import
+    cur.execute("DROP INDEX IF EXISTS idx_snapshot_area_rank")
+    cur.execute("DROP INDEX IF EXISTS idx_snapshot_cabang_rank")
+
+def rank_columns_sql(prefix="", partition_by=None, suffix=""):
+    """Kolom rank_current, rank_base & rank_change via RANK() OVER (skor utama, tie-break skor kedua).
+
+    Dengan `partition_by` (mis. "area"), ranking dihitung per kelompok dan
+    nama kolom diberi `suffix` (mis. rank_current_area).
+    """
+    over = f"PARTITION BY {prefix}{partition_by} " if partition_by else ""
+    rank_current = f"RANK() OVER ({over}ORDER BY {prefix}score DESC, {prefix}sec DESC)"
+    rank_base = f"RANK() OVER ({over}ORDER BY {prefix}score_base DESC, {prefix}sec_base DESC)"
+    return f"{rank_current} AS rank_current{suffix}, {rank_base} AS rank_base{suffix}, {rank_base} - {rank_current} AS rank_change{suffix}"
+
+def _insert_ranked_sql(source_sql):
+    return f"""
+        INSERT INTO leaderboard_snapshot ({", ".join(SNAPSHOT_COLS)})
+        SELECT kategori, entity, entity_id, nama, kode_cabang, unit, area, kelas_cabang, posisi,
+               score, score_base, score - score_base, sec, sec_base, sec - sec_base, jumlah_pegawai,
+               {rank_columns_sql()},
+               {rank_columns_sql(partition_by="area", suffix="_area")},
+               {rank_columns_sql(partition_by="kode_cabang", suffix="_cabang")}
+        FROM ({source_sql})
+    """
+
+def _cabang_source_sql(kategori):
+    # Agregasi pegawai per kode_cabang dulu (satu kali scan), baru di-join ke daftar cabang
+    sc, sc_base, se, se_base = _cabang_exprs(kategori)
+    return f"""
+        SELECT '{kategori}' AS kategori, 'cabang' AS entity, k.kode_cabang AS entity_id,
+               COALESCE(c.unit, k.kode_cabang) AS nama, k.kode_cabang, COALESCE(c.unit, k.kode_cabang) AS unit,
+               COALESCE(c.area, '(Unknown)') AS area, COALESCE(c.kelas_cabang, '-') AS kelas_cabang, NULL AS posisi,
+               IFNULL(a.score,0) AS score, IFNULL(a.score_base,0) AS score_base,
+               IFNULL(a.sec,0) AS sec, IFNULL(a.sec_base,0) AS sec_base,
+               IFNULL(a.jumlah_pegawai,0) AS jumlah_pegawai
+        FROM (SELECT kode_cabang FROM cabang WHERE valid = 1
+              UNION SELECT DISTINCT kode_cabang FROM pegawai WHERE valid = 1) k
+        LEFT JOIN cabang c ON k.kode_cabang = c.kode_cabang
+        LEFT JOIN (SELECT p.kode_cabang, {sc} AS score, {sc_base} AS score_base, {se} AS sec, {se_base} AS sec_base,
+                          COUNT(p.nip) AS jumlah_pegawai
+                   FROM pegawai p WHERE p.is_active = 1 GROUP BY p.kode_cabang) a ON k.kode_cabang = a.kode_cabang
+    """
+
+def _pegawai_source_sql(kategori):
+    sc, sc_base, se, se_base = _pegawai_exprs(kategori)
+    return f"""
+        SELECT '{kategori}' AS kategori, 'pegawai' AS entity, p.nip AS entity_id,
+               p.nama, p.kode_cabang, p.unit, p.area, c.kelas_cabang, p.posisi,
+               IFNULL({sc},0) AS score, IFNULL({sc_base},0) AS score_base,
+               IFNULL({se},0) AS sec, IFNULL({se_base},0) AS sec_base,
+               1 AS jumlah_pegawai
+        FROM pegawai p
+        LEFT JOIN cabang c ON p.kode_cabang = c.kode_cabang
+        WHERE p.valid = 1 AND p.is_active = 1
+    """
+
+def rebuild_leaderboard_snapshot(cur, kategoris=None):
+    """Hitung ulang isi leaderboard_snapshot (cabang & pegawai) untuk `kategoris` (default semua).
+
+    Dipanggil di dalam transaksi import agar pembaca tidak pernah melihat
+    snapshot yang setengah jadi.
+    """
+    create_snapshot_table(cur)
+    kategoris = list(kategoris or SNAPSHOT_KATEGORI)
+    cur.execute(f"DELETE FROM leaderboard_snapshot WHERE kategori IN ({', '.join('?' for _ in kategoris)})", kategoris)
+    for kategori in kategoris:
+        cur.execute(_insert_ranked_sql(_cabang_source_sql(kategori)))
+        cur.execute(_insert_ranked_sql(_pegawai_source_sql(kategori)))
+
+def get_entity_ranks(conn, entity, entity_id):
+    """Rank semua kategori untuk satu cabang/pegawai dalam satu query (lookup PK).
+
+    Hasil: {kategori: (rank_current, rank_base, rank_change)}; kategori tanpa
+    data (mis. pegawai non-aktif) tidak muncul di dict.
+    """
+    kategori = list(SNAPSHOT_KATEGORI)
+    rows = conn.execute(f"""
+        SELECT kategori, rank_current, rank_base, rank_change FROM leaderboard_snapshot
+        WHERE kategori IN ({", ".join("?" for _ in kategori)}) AND entity = ? AND entity_id = ?
+    """, (*kategori, entity, entity_id)).fetchall()
+    return {r[0]: tuple(r[1:]) for r in rows}
+
+def ensure_leaderboard_snapshot(conn):
+    """Buat tabel snapshot; isi sekali jika DB lama sudah berisi data tapi snapshot masih kosong."""
+    cur = conn.cursor()
+    create_snapshot_table(cur)
+    if cur.execute("SELECT 1 FROM leaderboard_snapshot LIMIT 1").fetchone() is None:
+        if cur.execute("SELECT 1 FROM pegawai LIMIT 1").fetchone() is not None:
+            rebuild_leaderboard_snapshot(cur)
+
+
+# ---------------------------
+# Versi Data (Kunci Invalidasi Cache)
+# ---------------------------
+def create_meta_table(cur):
+    cur.execute("CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value INTEGER DEFAULT 0)")
+
+def bump_data_version(cur):
+    """Naikkan penanda versi data; dipanggil di setiap jalur yang mengubah isi leaderboard."""
+    create_meta_table(cur)
+    cur.execute("""
+        INSERT INTO app_meta (key, value) VALUES ('data_version', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """)
+
+def clear_master_data(cur):
+    """Kosongkan pegawai & cabang beserta turunannya (snapshot, indeks pencarian) lalu naikkan versi data.
+
+    Untuk tombol hapus di v9y/v9z yang berbagi DB_PATH dengan v9x; riwayat snapshot tidak disentuh.
+    """
+    for table in ("pegawai", "cabang", "leaderboard_snapshot", "search_index"):
+        cur.execute(f"DELETE FROM {table}")
+    bump_data_version(cur)
+
+def get_data_version(conn):
+    try: row = conn.execute("SELECT value FROM app_meta WHERE key = 'data_version'").fetchone()
+    except sqlite3.OperationalError: return 0
+    return row[0] if row else 0
+
+
+# ---------------------------
+# Kolom Leaderboard (Snapshot -> Frame View)
+# ---------------------------
+# Leaderboard cabang & halaman pegawai dijawab gmm_engine.LeaderboardEngine (satu-satunya
+# implementasi filter/sort/paging); di sini hanya nama kolom yang dipakai bersama engine & dashboard
+CABANG_FLOAT_COLS = ["total_balance", "total_balance_base", "growth_score", "total_cif", "total_cif_base", "growth_cif"]
+CABANG_LEADERBOARD_COLS = """entity_id AS kode_cabang, unit, area, kelas_cabang,
+               score AS total_balance, score_base AS total_balance_base, growth_score,
+               sec AS total_cif, sec_base AS total_cif_base, growth_sec AS growth_cif,
+               jumlah_pegawai, rank_current, rank_base, rank_change"""
+
+# Kolom sort yang boleh dipakai (nama kolom di frame -> kolom snapshot)
+PEGAWAI_SORT_COLS = {"score_utama": "score", "growth_score": "growth_score", "score_kedua": "sec", "growth_kedua": "growth_sec"}
+PEGAWAI_PAGE_COLS = """s.entity_id AS nip, s.nama, s.posisi, s.unit, s.area, s.kode_cabang,
+               s.score AS score_utama, s.score_base AS score_utama_base, s.growth_score,
+               s.sec AS score_kedua, s.sec_base AS score_kedua_base, s.growth_sec AS growth_kedua"""
+PEGAWAI_PAGE_FLOAT_COLS = ["score_utama", "score_utama_base", "growth_score", "score_kedua", "score_kedua_base", "growth_kedua"]
+
+
+# ---------------------------
+# Ringkasan Dashboard HOME (Top/Bottom per Kategori)
+# ---------------------------
+DASHBOARD_N = 10
+# Cabang kelas A/R tidak ikut daftar terbawah (sama dengan dashboard v9z)
+DASHBOARD_EXCLUDE_KELAS = "A/R"
+
+def _snapshot_extreme(conn, entity, kategori, n, bottom=False, exclude_kelas=None):
+    """N baris teratas/terbawah rank global, dibaca mundur/maju lewat idx_snapshot_global_rank + LIMIT."""
+    cols, float_cols = (PEGAWAI_PAGE_COLS, PEGAWAI_PAGE_FLOAT_COLS) if entity == "pegawai" else (CABANG_LEADERBOARD_COLS, CABANG_FLOAT_COLS)
+    if entity == "pegawai": cols += ", s.rank_current, s.rank_base, s.rank_change"
+    where, params = "kategori = ? AND entity = ?", [kategori, entity]
+    if exclude_kelas:
+        where += " AND kelas_cabang IS NOT ?"; params.append(exclude_kelas)
+    order = "rank_current DESC, entity_id DESC" if bottom else "rank_current, entity_id"
+    return pd.read_sql_query(f"SELECT {cols} FROM leaderboard_snapshot s WHERE {where} ORDER BY {order} LIMIT ?",
+                             conn, params=params + [n], dtype=float64_dtypes(float_cols))
+
+def top_bottom(conn, entity, kategori, n=DASHBOARD_N, exclude_kelas=None):
+    """(top, bottom): N cabang/pegawai teratas & terbawah satu kategori tanpa membaca seluruh leaderboard.
+
+    `bottom` urut dari yang paling bawah (rank terbesar dulu); `exclude_kelas`
+    hanya menyaring daftar terbawah. Kolom sama dengan
+    LeaderboardEngine.cabang_leaderboard / pegawai_page.
+    """
+    return (_snapshot_extreme(conn, entity, kategori, n),
+            _snapshot_extreme(conn, entity, kategori, n, bottom=True, exclude_kelas=exclude_kelas))
+
+def query_dashboard_summary(conn, n=DASHBOARD_N, exclude_kelas=DASHBOARD_EXCLUDE_KELAS):
+    """Payload halaman HOME untuk satu versi data: top-N & bottom-N cabang/pegawai tiap kategori.
+
+    Hasil: {kategori: {"top_cabang", "bottom_cabang", "top_pegawai",
+    "bottom_pegawai": DataFrame}} beserta rank_current/rank_base/rank_change.
+    Cabang kelas `exclude_kelas` hanya dikeluarkan dari daftar terbawah.
+    """
+    summary = {}
+    for kategori in SNAPSHOT_KATEGORI:
+        top_c, bottom_c = top_bottom(conn, "cabang", kategori, n, exclude_kelas)
+        top_p, bottom_p = top_bottom(conn, "pegawai", kategori, n)
+        summary[kategori] = {"top_cabang": top_c, "bottom_cabang": bottom_c, "top_pegawai": top_p, "bottom_pegawai": bottom_p}
+    return summary
+
+
+# ---------------------------
+# Proyeksi Kolom per Kategori (Profil Pegawai & Cabang)
+# ---------------------------
+# Kunci sama dengan KAT_CONFIG; metrik tiap kategori = kolom angka sheet sumbernya
+KATEGORI_METRICS = {
+    "LIVIN": list(SHEET_SPECS[SHEET_LIVIN]["num"]),
+    "MERCHANT": list(SHEET_SPECS[SHEET_MERCHANT]["num"]),
+    "TRANSAKSI": list(SHEET_SPECS[SHEET_TRANSAKSI]["num"]),
+}
+# Rasio per pegawai tidak bisa dijumlah; profil cabang menghitungnya dari frek_on_us/frek_off_us
+CABANG_SKIP_METRICS = {"pct_on_us"}
+
+def float64_dtypes(cols):
+    return {c: "float64" for c in cols}
+
+def metric_columns(kategoris, skip=()):
+    """Kolom metrik + pasangan _base untuk kategori yang dirender, urut & tanpa duplikat."""
+    cols = [c for k in kategoris for c in KATEGORI_METRICS[k] if c not in skip]
+    cols = list(dict.fromkeys(cols))
+    return [x for c in cols for x in (c, f"{c}_base")]
+
+def query_pegawai_profile(conn, nip, kategoris=tuple(KATEGORI_METRICS)):
+    """Satu baris profil pegawai: identitas + metrik kategori terpilih (float64)."""
+    cols = metric_columns(kategoris)
+    return pd.read_sql_query(f"SELECT nip, nama, posisi, unit, area, {', '.join(cols)} FROM pegawai WHERE nip = ?",
+                             conn, params=(nip,), dtype=float64_dtypes(cols))
+
+def query_cabang_profile(conn, kode_cabang, kategoris=tuple(KATEGORI_METRICS)):
+    """Satu baris profil cabang: identitas + SUM metrik pegawai aktif untuk kategori terpilih (float64)."""
+    cols = metric_columns(kategoris, skip=CABANG_SKIP_METRICS)
+    sums = ", ".join(f"IFNULL(SUM(p.{c}), 0) AS {c}" for c in cols)
+    return pd.read_sql_query(f"""
+        SELECT c.kode_cabang, c.unit, c.area, c.kelas_cabang, COUNT(p.nip) AS jml_pegawai, {sums}
+        FROM cabang c
+        LEFT JOIN pegawai p ON c.kode_cabang = p.kode_cabang AND p.is_active = 1
+        WHERE c.kode_cabang = ?
+        GROUP BY c.kode_cabang
+    """, conn, params=(kode_cabang,), dtype=float64_dtypes(cols))
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+import gmm_db
+
+# ---------------------------
+# Engine Leaderboard In-Memory (Kolom NumPy)
+# ---------------------------
+TEXT_COLS = ["entity_id", "nama", "kode_cabang", "unit", "area", "kelas_cabang", "posisi"]
+FLOAT_COLS = ["score", "score_base", "growth_score", "sec", "sec_base", "growth_sec"]
+INT_COLS = ["jumlah_pegawai", "rank_current", "rank_base", "rank_change",
+            "rank_current_area", "rank_base_area", "rank_change_area",
+            "rank_current_cabang", "rank_base_cabang", "rank_change_cabang"]
+
+RANK_SUFFIX = {None: "", "area": "_area", "kode_cabang": "_cabang"}
+
+class _Table:
+    """Satu (kategori, entity) dari leaderboard_snapshot sebagai array kolom + permutasi sort.
+
+    Permutasi dihitung sekali saat load untuk setiap kolom sort di
+    PEGAWAI_SORT_COLS, dua arah, dengan tie-break entity_id naik. Filter
+    area/cabang memakai daftar index per nilai yang juga dibuat sekali.
+    """
+    def __init__(self, df):
+        self.n = len(df)
+        self.cols = {c: df[c].to_numpy(dtype=object) for c in TEXT_COLS}
+        self.cols.update({c: df[c].to_numpy(dtype="float64") for c in FLOAT_COLS})
+        self.cols.update({c: df[c].fillna(0).to_numpy(dtype="int64") for c in INT_COLS})
+
+        ids = self.cols["entity_id"].astype(str)
+        keys = {"score_utama": (self.cols["score"], self.cols["sec"])}
+        keys.update({k: (self.cols[c],) for k, c in gmm_db.PEGAWAI_SORT_COLS.items() if k != "score_utama"})
+        self.perms, self.positions = {}, {}
+        for sort, cols in keys.items():
+            for ascending in (False, True):
+                # np.lexsort: kunci terakhir paling utama
+                perm = np.lexsort((ids,) + tuple(c if ascending else -c for c in reversed(cols)))
+                pos = np.empty(self.n, dtype=np.int64)
+                pos[perm] = np.arange(self.n)
+                self.perms[sort, ascending], self.positions[sort, ascending] = perm, pos
+
+        # Per scope: index baris dikelompokkan per nilai + {nilai: (awal, akhir)} ke array itu
+        self.groups = {}
+        for scope in ("area", "kode_cabang"):
+            codes, uniques = pd.factorize(self.cols[scope])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.groups[scope] = (order, dict(zip(uniques, zip(bounds[:-1], bounds[1:]))))
+
+    def nbytes(self):
+        total = sum(a.nbytes for a in self.cols.values())
+        total += sum(a.nbytes for a in self.perms.values()) + sum(a.nbytes for a in self.positions.values())
+        total += sum(order.nbytes for order, _ in self.groups.values())
+        return total
+
+    def select(self, scope=None, kode=None, posisi=None):
+        """Index baris yang lolos filter scope & posisi (None = semua baris)."""
+        idx = None
+        if scope in self.groups:
+            order, bounds = self.groups[scope]
+            start, end = bounds.get(kode, (0, 0))
+            idx = order[start:end]
+        if posisi:
+            hit = self.cols["posisi"] == posisi
+            idx = np.flatnonzero(hit) if idx is None else idx[hit[idx]]
+        return idx
+
+    def ordered(self, idx, sort, ascending):
+        """Index terurut: pakai permutasi global, subset diurutkan lewat posisinya di permutasi itu."""
+        if idx is None: return self.perms[sort, ascending]
+        return idx[np.argsort(self.positions[sort, ascending][idx], kind="stable")]
+
+
+class LeaderboardEngine:
+    """Snapshot leaderboard satu versi data, dimuat sekali ke memori dan dibagi ke semua sesi.
+
+    Satu-satunya jalur leaderboard cabang, halaman pegawai (filter, sort,
+    paging) dan daftar posisi; dijawab lewat operasi array tanpa ke SQLite.
+    Sumber datanya tetap tabel leaderboard_snapshot (rank dihitung saat
+    import). Objek read-only setelah dibuat, aman dipakai lintas thread.
+    """
+    def __init__(self, snapshot, data_version=0):
+        self.data_version = data_version
+        self.tables = {}
+        for (kategori, entity), df in snapshot.groupby(["kategori", "entity"], sort=False):
+            self.tables[kategori, entity] = _Table(df.reset_index(drop=True))
+        self.kode_cabang = set(snapshot.loc[snapshot["entity"] == "cabang", "entity_id"])
+        self._cabang_frames = {k: self._build_cabang_frame(k) for k, e in self.tables if e == "cabang"}
+
+    @classmethod
+    def from_connection(cls, conn):
+        snapshot = pd.read_sql_query(f"SELECT {', '.join(['kategori', 'entity'] + TEXT_COLS + FLOAT_COLS + INT_COLS)} FROM leaderboard_snapshot", conn)
+        return cls(snapshot, gmm_db.get_data_version(conn))
+
+    def nbytes(self):
+        return sum(t.nbytes() for t in self.tables.values())
+
+    def _table(self, kategori, entity):
+        return self.tables.get((kategori, entity))
+
+    def scope_of(self, kode):
+        # Sama dengan aturan lama: 3 karakter -> area; kode terdaftar -> cabang; selain itu area
+        if kode is None or kode == "ALL": return None
+        if len(kode) == 3: return "area"
+        return "kode_cabang" if kode in self.kode_cabang else "area"
+
+    # --- Leaderboard Cabang ---
+    def _build_cabang_frame(self, kategori):
+        t = self._table(kategori, "cabang")
+        order = t.perms["score_utama", False]
+        c = {k: v[order] for k, v in t.cols.items()}
+        return pd.DataFrame({
+            "kode_cabang": c["entity_id"], "unit": c["unit"], "area": c["area"], "kelas_cabang": c["kelas_cabang"],
+            "total_balance": c["score"], "total_balance_base": c["score_base"], "growth_score": c["growth_score"],
+            "total_cif": c["sec"], "total_cif_base": c["sec_base"], "growth_cif": c["growth_sec"],
+            "jumlah_pegawai": c["jumlah_pegawai"], "rank_current": c["rank_current"],
+            "rank_base": c["rank_base"], "rank_change": c["rank_change"],
+        })
+
+    def cabang_leaderboard(self, kategori):
+        df = self._cabang_frames.get(kategori)
+        if df is None: return pd.DataFrame(columns=["kode_cabang", "unit", "area", "kelas_cabang"] + gmm_db.CABANG_FLOAT_COLS)
+        return df.copy()
+
+    # --- Leaderboard Pegawai ---
+    def pegawai_page(self, kategori, scope=None, kode=None, posisi=None, sort="score_utama",
+                     ascending=False, page=1, page_size=50):
+        """Satu halaman leaderboard pegawai: (DataFrame halaman, dict ringkasan: total, sum/avg skor & skor kedua).
+
+        `scope`: None (semua), "area" atau "kode_cabang" dengan nilai `kode`;
+        rank/rank_change mengikuti scope (global, per area, per cabang).
+        """
+        summary = {"total": 0, "sum_score": 0.0, "avg_score": 0.0, "sum_sec": 0.0, "avg_sec": 0.0}
+        t = self._table(kategori, "pegawai")
+        if t is None: return pd.DataFrame(columns=["nip", "nama"] + gmm_db.PEGAWAI_PAGE_FLOAT_COLS), summary
+
+        idx = t.select(scope, kode, posisi)
+        score = t.cols["score"] if idx is None else t.cols["score"][idx]
+        sec = t.cols["sec"] if idx is None else t.cols["sec"][idx]
+        total = len(score)
+        if total:
+            summary = {"total": total, "sum_score": float(score.sum()), "avg_score": float(score.mean()),
+                       "sum_sec": float(sec.sum()), "avg_sec": float(sec.mean())}
+
+        start = max(0, page - 1) * page_size
+        rows = t.ordered(idx, sort, ascending)[start:start + page_size]
+        c, sfx = t.cols, RANK_SUFFIX.get(scope, "")
+        df = pd.DataFrame({
+            "nip": c["entity_id"][rows], "nama": c["nama"][rows], "posisi": c["posisi"][rows],
+            "unit": c["unit"][rows], "area": c["area"][rows], "kode_cabang": c["kode_cabang"][rows],
+            "score_utama": c["score"][rows], "score_utama_base": c["score_base"][rows], "growth_score": c["growth_score"][rows],
+            "score_kedua": c["sec"][rows], "score_kedua_base": c["sec_base"][rows], "growth_kedua": c["growth_sec"][rows],
+            "rank_current": c[f"rank_current{sfx}"][rows], "rank_base": c[f"rank_base{sfx}"][rows],
+            "rank_change": c[f"rank_change{sfx}"][rows],
+        })
+        return df, summary
+
+    def posisi_list(self, kategori, scope=None, kode=None):
+        t = self._table(kategori, "pegawai")
+        if t is None: return []
+        idx = t.select(scope, kode)
+        posisi = t.cols["posisi"] if idx is None else t.cols["posisi"][idx]
+        return sorted({p for p in posisi if p is not None and str(p).strip() != ""})
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Formatter Angka (Scalar & Versi Kolom)
+# ---------------------------
+def fmt_rp(value):
+    try:
+        v = int(round(float(value)))
+        return f"Rp {v:,}".replace(",", ".") + " Jt"
+    except:
+        return "Rp 0 Jt"
+
+def fmt_num(value):
+    try:
+        v = int(round(float(value)))
+        return f"{v:,}".replace(",", ".")
+    except:
+        return "0"
+
+def fmt_pct(value):
+    try:
+        v = float(value)
+        return f"{v * 100:.1f}%" if v <= 1 else f"{v:.1f}%"
+    except:
+        return "0.0%"
+
+def fmt_growth(current, base, formatter, is_penalty=False):
+    """Menghitung dan memformat indikator pertumbuhan (Growth DtD) dengan gaya Badge"""
+    try:
+        curr_val = float(current) if current else 0.0
+        base_val = float(base) if base else 0.0
+        
+        if is_penalty:
+            curr_val = abs(curr_val)
+            base_val = abs(base_val)
+            
+        diff = curr_val - base_val
+        
+        if diff > 0:
+            color = "#E10600" if is_penalty else "#10B981" 
+            bg_color = "#FFF5F5" if is_penalty else "#ECFDF5"
+            arrow, sign = "▲", "+"
+        elif diff < 0:
+            color = "#10B981" if is_penalty else "#E10600" 
+            bg_color = "#ECFDF5" if is_penalty else "#FFF5F5"
+            arrow, sign = "▼", "-"
+            diff = abs(diff) 
+        else:
+            return "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem; border:1px solid #CBD5E1;'>➖ 0</span>"
+        
+        diff_str = formatter(diff)
+        return f"<span style='background:{bg_color}; color:{color}; padding:4px 8px; border-radius:6px; font-weight:800; font-size:0.8rem; letter-spacing:-0.5px; border:1px solid {color}50; white-space:nowrap; box-shadow: 0 1px 2px rgba(0,0,0,0.1);'>{arrow} {sign}{diff_str}</span>"
+    except Exception as e:
+        return "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem;'>➖ N/A</span>"
+
+# --- Versi Kolom (Series) dari Formatter di Atas ---
+GROWTH_NEUTRAL_HTML = "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem; border:1px solid #CBD5E1;'>➖ 0</span>"
+GROWTH_NA_HTML = "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem;'>➖ N/A</span>"
+
+def _values(values):
+    return values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values, dtype=object)
+
+def _index(values):
+    return values.index if isinstance(values, pd.Series) else None
+
+def to_float_array(values):
+    """Seperti `float(v) if v else 0.0` per sel. Hasil: (array float64, mask teks non-angka)."""
+    a = _values(values)
+    if a.dtype.kind in "biuf": return a.astype("float64"), np.zeros(len(a), dtype=bool)
+    # Kolom campuran (mis. kartu profil): ikuti semantik scalar persis
+    out, invalid = np.zeros(len(a)), np.zeros(len(a), dtype=bool)
+    for i, v in enumerate(a):
+        if v is None or not v: continue
+        try: out[i] = float(v)
+        except (TypeError, ValueError): invalid[i] = True
+    return out, invalid
+
+def _int_str(v):
+    # int() Python, bukan astype("int64"): nilai di atas ~9.2e18 tidak wrap, sama dengan fmt_num
+    v = np.where(np.isfinite(v), v, 0.0)
+    return np.array([f"{int(x):,}".replace(",", ".") for x in np.round(v).tolist()], dtype=object)
+
+def fmt_num_series(values):
+    v, invalid = to_float_array(values)
+    return pd.Series(_int_str(np.where(invalid, 0.0, v)), index=_index(values))
+
+def fmt_rp_series(values):
+    return "Rp " + fmt_num_series(values) + " Jt"
+
+def fmt_pct_series(values):
+    v, invalid = to_float_array(values)
+    v = np.where(invalid, 0.0, v)
+    return pd.Series(np.char.mod("%.1f%%", np.where(v > 1, v, v * 100)).astype(object), index=_index(values))
+
+SERIES_FMT = {fmt_num: fmt_num_series, fmt_rp: fmt_rp_series, fmt_pct: fmt_pct_series}
+
+def fmt_series(values, formatter):
+    """Format satu kolom sekaligus; formatter tanpa versi Series (mis. str) jatuh ke .map()."""
+    vec = SERIES_FMT.get(formatter)
+    if vec is not None: return vec(values)
+    return pd.Series(_values(values), index=_index(values)).map(formatter)
+
+def _growth_diff(current, base, is_penalty=False):
+    curr, bad_c = to_float_array(current)
+    base, bad_b = to_float_array(base)
+    pen = np.broadcast_to(np.asarray(is_penalty, dtype=bool), curr.shape)
+    curr, base = np.where(pen, np.abs(curr), curr), np.where(pen, np.abs(base), base)
+    return curr - base, bad_c | bad_b, pen
+
+def growth_html_series(current, base, formatter, is_penalty=False):
+    """Versi kolom dari fmt_growth: badge HTML pertumbuhan untuk seluruh baris sekaligus."""
+    diff, invalid, pen = _growth_diff(current, base, is_penalty)
+    up, down = diff > 0, diff < 0
+    good = up != pen
+    color = np.where(good, "#10B981", "#E10600").astype(object)
+    bg_color = np.where(good, "#ECFDF5", "#FFF5F5").astype(object)
+    arrow = np.where(up, "▲ +", "▼ -").astype(object)
+    diff_str = fmt_series(np.abs(diff), formatter).to_numpy()
+    html = ("<span style='background:" + bg_color + "; color:" + color + "; padding:4px 8px; border-radius:6px; font-weight:800; font-size:0.8rem; letter-spacing:-0.5px; border:1px solid "
+            + color + "50; white-space:nowrap; box-shadow: 0 1px 2px rgba(0,0,0,0.1);'>" + arrow + diff_str + "</span>")
+    html = np.where(up | down, html, GROWTH_NEUTRAL_HTML)
+    return pd.Series(np.where(invalid, GROWTH_NA_HTML, html), index=_index(current))
+
+def growth_text_series(current, base, formatter):
+    """Teks growth polos (tanpa HTML) untuk sel tabel: "▲ +x", "▼ -x" atau "➖ 0"."""
+    diff, invalid, _ = _growth_diff(current, base)
+    text = np.where(diff > 0, "▲ +", "▼ -").astype(object) + fmt_series(np.abs(diff), formatter).to_numpy()
+    text = np.where((diff > 0) | (diff < 0), text, "➖ 0")
+    return pd.Series(np.where(invalid, "➖ N/A", text), index=_index(current))
+
+def rank_change_text_series(change, base):
+    """Teks perubahan rank untuk sel tabel (padanan teks get_table_rank_change_html)."""
+    index = _index(change)
+    change = np.nan_to_num(to_float_array(change)[0]).astype("int64")
+    text = np.where(change > 0, "▲ ", "▼ ").astype(object) + np.abs(change).astype(str).astype(object)
+    text = np.where(change != 0, text, "➖")
+    return pd.Series(np.where(to_float_array(base)[0] != 0, text, "NEW"), index=index)
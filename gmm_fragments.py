@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+
+# ---------------------------
+# Cache Fragmen HTML (Lintas Sesi)
+# ---------------------------
+class FragmentCache:
+    """LRU string HTML yang sudah dirender, dibagi semua sesi (simpan di st.cache_resource).
+
+    Kunci: (data_version, entity_id, kategori, view). Saat versi data yang
+    lebih baru muncul, seluruh fragmen versi lama dibuang sekaligus, sehingga
+    fragmen tidak pernah basi setelah import. `stats()` memberi hit-rate
+    untuk ditampilkan di admin panel.
+    """
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._version = None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if self._version is None or version > self._version:
+            self.evictions += len(self._items)
+            self._items.clear()
+            self._version = version
+
+    def get_or_render(self, key, render):
+        """Kembalikan fragmen untuk `key`; jika belum ada, panggil render() lalu simpan."""
+        with self._lock:
+            self._check_version(key[0])
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        html = render()
+        with self._lock:
+            # Render versi lama yang selesai setelah import tidak ikut disimpan
+            if key[0] == self._version:
+                self._items[key] = html
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+                    self.evictions += 1
+        return html
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._items)
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            views = {}
+            for key in self._items: views[key[3]] = views.get(key[3], 0) + 1
+            return {
+                "version": self._version,
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+                "evictions": self.evictions,
+                "per_view": views,
+            }
@@ -0,0 +1,216 @@
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Riwayat Snapshot per Upload (Append-Only, Kolom Terkompresi)
+# ---------------------------
+# Kolom metrik yang disimpan per (entity, kategori); rank tidak disimpan, dihitung ulang dari score & sec
+HISTORY_METRICS = ["score", "sec"]
+ID_SEP = "\x1f"
+
+def create_history_tables(cur):
+    """Tabel riwayat: satu baris per upload + satu blob per kolom (bukan satu baris per pegawai).
+
+    Setiap kolom (score/sec per kategori) disimpan sebagai array float64
+    yang di-byte-shuffle lalu di-zlib. Daftar entity_id hanya ditulis
+    ulang jika berubah dari upload sebelumnya, sehingga setahun upload
+    harian tetap kecil.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_upload (
+            snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uploaded_at TEXT NOT NULL,
+            data_version INTEGER,
+            jumlah_pegawai INTEGER,
+            jumlah_cabang INTEGER
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_upload_time ON snapshot_upload(uploaded_at)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_column (
+            snapshot_id INTEGER NOT NULL,
+            entity TEXT NOT NULL,
+            kolom TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (snapshot_id, entity, kolom)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_column_kolom ON snapshot_column(entity, kolom, snapshot_id)")
+
+def _pack(values):
+    # Byte-shuffle: byte ke-i semua nilai dikumpulkan berdampingan, jauh lebih mudah dikompres
+    values = np.ascontiguousarray(values, dtype="<f8")
+    return zlib.compress(values.view(np.uint8).reshape(-1, 8).T.tobytes(), 6)
+
+def _unpack(blob):
+    raw = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+    return np.ascontiguousarray(raw.reshape(8, -1).T).view("<f8").ravel()
+
+def _pack_ids(ids):
+    return zlib.compress(ID_SEP.join(ids).encode("utf-8"), 6)
+
+def _unpack_ids(blob):
+    text = zlib.decompress(blob).decode("utf-8")
+    return np.array(text.split(ID_SEP) if text else [], dtype=object)
+
+def append_snapshot(cur, uploaded_at=None, data_version=None):
+    """Tambahkan isi leaderboard_snapshot saat ini sebagai satu upload baru (dipanggil di transaksi import).
+
+    Urutan entity_id sama untuk semua kategori satu entity, sehingga daftar
+    ID cukup disimpan sekali. Hasil: snapshot_id baru.
+    """
+    create_history_tables(cur)
+    uploaded_at = uploaded_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    snap = pd.DataFrame(cur.execute(f"""
+        SELECT entity, kategori, entity_id, {", ".join(HISTORY_METRICS)} FROM leaderboard_snapshot
+    """).fetchall(), columns=["entity", "kategori", "entity_id"] + HISTORY_METRICS)
+
+    counts = snap.drop_duplicates(["entity", "entity_id"])["entity"].value_counts()
+    cur.execute("INSERT INTO snapshot_upload (uploaded_at, data_version, jumlah_pegawai, jumlah_cabang) VALUES (?, ?, ?, ?)",
+                (uploaded_at, data_version, int(counts.get("pegawai", 0)), int(counts.get("cabang", 0))))
+    snapshot_id = cur.lastrowid
+
+    rows = []
+    for entity, df_e in snap.groupby("entity", sort=False):
+        ids = pd.Index(sorted(df_e["entity_id"].unique()))
+        packed_ids = _pack_ids(ids)
+        previous = _ids_blob(cur, entity, snapshot_id)
+        if previous is None or previous != packed_ids: rows.append((snapshot_id, entity, "entity_id", packed_ids))
+        for kategori, df_k in df_e.groupby("kategori", sort=False):
+            df_k = df_k.set_index("entity_id").reindex(ids)
+            for col in HISTORY_METRICS:
+                rows.append((snapshot_id, entity, f"{kategori}.{col}", _pack(df_k[col].fillna(0).to_numpy())))
+    cur.executemany("INSERT INTO snapshot_column (snapshot_id, entity, kolom, data) VALUES (?, ?, ?, ?)", rows)
+    return snapshot_id
+
+def _ids_blob(conn, entity, snapshot_id):
+    """Blob daftar entity_id yang berlaku untuk upload `snapshot_id` (ditulis di upload itu atau sebelumnya)."""
+    row = conn.execute("""
+        SELECT data FROM snapshot_column WHERE entity = ? AND kolom = 'entity_id' AND snapshot_id <= ?
+        ORDER BY snapshot_id DESC LIMIT 1
+    """, (entity, snapshot_id)).fetchone()
+    return row[0] if row else None
+
+def rank_from_scores(score, sec):
+    """RANK() OVER (ORDER BY score DESC, sec DESC) seperti di leaderboard_snapshot, dari array NumPy."""
+    n = len(score)
+    rank = np.empty(n, dtype=np.int64)
+    if n == 0: return rank
+    order = np.lexsort((-sec, -score))
+    s, c = score[order], sec[order]
+    new_group = np.r_[True, (s[1:] != s[:-1]) | (c[1:] != c[:-1])]
+    first = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+    rank[order] = first + 1
+    return rank
+
+def list_snapshots(conn, since=None, until=None):
+    """Daftar upload (snapshot_id, uploaded_at, ...) dalam rentang waktu, urut naik (index idx_snapshot_upload_time)."""
+    where, params = [], []
+    if since: where.append("uploaded_at >= ?"); params.append(since)
+    if until: where.append("uploaded_at <= ?"); params.append(until)
+    return pd.read_sql_query(f"""
+        SELECT snapshot_id, uploaded_at, data_version, jumlah_pegawai, jumlah_cabang FROM snapshot_upload
+        {"WHERE " + " AND ".join(where) if where else ""} ORDER BY uploaded_at, snapshot_id
+    """, conn, params=params)
+
+def snapshot_before(conn, moment):
+    """snapshot_id upload terakhir pada/sebelum `moment` (string "YYYY-mm-dd HH:MM:SS"), None jika tidak ada."""
+    row = conn.execute("SELECT snapshot_id FROM snapshot_upload WHERE uploaded_at <= ? ORDER BY uploaded_at DESC, snapshot_id DESC LIMIT 1",
+                       (moment,)).fetchone()
+    return row[0] if row else None
+
+def _metric_blobs(conn, snapshot_id, entity, kategori):
+    kolom = [f"{kategori}.{c}" for c in HISTORY_METRICS]
+    return dict(conn.execute(f"""
+        SELECT kolom, data FROM snapshot_column WHERE snapshot_id = ? AND entity = ? AND kolom IN ({", ".join("?" for _ in kolom)})
+    """, (snapshot_id, entity, *kolom)).fetchall())
+
+def load_snapshot(conn, snapshot_id, entity, kategori):
+    """Satu upload satu (entity, kategori) sebagai DataFrame: entity_id, score, sec, rank_current."""
+    ids_blob = _ids_blob(conn, entity, snapshot_id)
+    if ids_blob is None: return pd.DataFrame(columns=["entity_id"] + HISTORY_METRICS + ["rank_current"])
+    data = {"entity_id": _unpack_ids(ids_blob)}
+    blobs = _metric_blobs(conn, snapshot_id, entity, kategori)
+    for col in HISTORY_METRICS:
+        blob = blobs.get(f"{kategori}.{col}")
+        data[col] = _unpack(blob) if blob is not None else np.zeros(len(data["entity_id"]))
+    data["rank_current"] = rank_from_scores(data["score"], data["sec"])
+    return pd.DataFrame(data)
+
+def snapshot_deltas(conn, entity, kategori, snapshot_old, snapshot_new):
+    """Selisih skor & rank antar dua upload. rank_change > 0 = naik peringkat; entity baru -> *_old NaN."""
+    old = load_snapshot(conn, snapshot_old, entity, kategori)
+    new = load_snapshot(conn, snapshot_new, entity, kategori)
+    df = new.merge(old, on="entity_id", how="left", suffixes=("", "_old"))
+    df["delta_score"] = df["score"] - df["score_old"]
+    df["delta_sec"] = df["sec"] - df["sec_old"]
+    df["rank_change"] = df["rank_current_old"] - df["rank_current"]
+    return df
+
+def period_deltas(conn, entity, kategori, days=1, now=None):
+    """Delta terhadap upload terakhir `days` hari sebelum upload terbaru (1 = harian, 7 = mingguan).
+
+    Hasil: (DataFrame snapshot_deltas, (snapshot_lama, snapshot_baru)); DataFrame
+    kosong jika riwayat belum cukup panjang.
+    """
+    latest = snapshot_before(conn, now or "9999-12-31 23:59:59")
+    if latest is None: return pd.DataFrame(), (None, None)
+    latest_at = conn.execute("SELECT uploaded_at FROM snapshot_upload WHERE snapshot_id = ?", (latest,)).fetchone()[0]
+    cutoff = (datetime.strptime(latest_at, "%Y-%m-%d %H:%M:%S") - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    previous = snapshot_before(conn, cutoff)
+    if previous is None: return pd.DataFrame(), (None, latest)
+    return snapshot_deltas(conn, entity, kategori, previous, latest), (previous, latest)
+
+def top_movers(conn, entity, kategori, days=1, n=5):
+    """N entity dengan kenaikan rank terbesar terhadap upload `days` hari sebelumnya (lihat period_deltas).
+
+    Urut rank_change turun lalu rank_current naik; kosong jika riwayat belum cukup atau tidak ada yang naik.
+    """
+    df, _ = period_deltas(conn, entity, kategori, days)
+    if df.empty: return df
+    df = df[df["rank_change"] > 0]
+    return df.sort_values(["rank_change", "rank_current"], ascending=[False, True]).head(n).reset_index(drop=True)
+
+def trajectory(conn, entity, entity_id, kategori, since=None, until=None):
+    """Skor & rank satu cabang/pegawai di setiap upload dalam rentang: uploaded_at, score, sec, rank_current.
+
+    Daftar ID tiap upload sudah terurut, jadi posisi entity dicari lewat
+    np.searchsorted (daftar yang sama antar upload hanya di-decode sekali),
+    dan rank cukup dihitung dengan membandingkan satu skor ke seluruh array.
+    """
+    snaps = list_snapshots(conn, since, until)
+    rows, ids_cache = [], (None, None)
+    for snapshot_id, uploaded_at in zip(snaps["snapshot_id"].tolist(), snaps["uploaded_at"]):
+        ids_blob = _ids_blob(conn, entity, snapshot_id)
+        if ids_blob is None: continue
+        if ids_cache[0] != ids_blob: ids_cache = (ids_blob, _unpack_ids(ids_blob).astype(str))
+        ids = ids_cache[1]
+        pos = np.searchsorted(ids, entity_id)
+        if pos >= len(ids) or ids[pos] != entity_id: continue
+
+        blobs = _metric_blobs(conn, snapshot_id, entity, kategori)
+        if len(blobs) < len(HISTORY_METRICS): continue
+        score, sec = _unpack(blobs[f"{kategori}.score"]), _unpack(blobs[f"{kategori}.sec"])
+        s, c = score[pos], sec[pos]
+        rank = int(np.count_nonzero((score > s) | ((score == s) & (sec > c)))) + 1
+        rows.append({"uploaded_at": uploaded_at, "score": s.item(), "sec": c.item(), "rank_current": rank})
+    return pd.DataFrame(rows, columns=["uploaded_at"] + HISTORY_METRICS + ["rank_current"])
+
+def trajectory_change(traj, days):
+    """(perubahan rank, selisih skor) upload terakhir vs upload terakhir `days` hari sebelumnya; None jika belum ada."""
+    if len(traj) < 2: return None
+    times = pd.to_datetime(traj["uploaded_at"])
+    earlier = traj[times <= times.iloc[-1] - timedelta(days=days)]
+    if earlier.empty: return None
+    last, prev = traj.iloc[-1], earlier.iloc[-1]
+    return int(prev["rank_current"] - last["rank_current"]), float(last["score"] - prev["score"])
+
+def storage_bytes(conn):
+    """Total ukuran blob riwayat (byte) dan jumlah upload, untuk admin panel."""
+    try: row = conn.execute("SELECT IFNULL(SUM(LENGTH(data)),0), COUNT(DISTINCT snapshot_id) FROM snapshot_column").fetchone()
+    except sqlite3.OperationalError: return 0, 0
+    return row[0], row[1]
@@ -0,0 +1,358 @@
+import multiprocessing
+import os
+import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+# ---------------------------
+# Spesifikasi Sheet & Alias Kolom
+# ---------------------------
+SHEET_LIVIN = "GMM LIVIN"
+SHEET_MERCHANT = "GMM MERCHANT"
+SHEET_TRANSAKSI = "GMM TRANSAKSI"
+
+# Urutan sheet menentukan prioritas nama pegawai saat merge (LIVIN paling utama).
+# "first_wins": untuk NIP duplikat dalam satu sheet, kolom ini diambil dari baris
+# pertama (kolom lain dari baris terakhir), sama dengan loop per baris versi lama
+SHEET_SPECS = {
+    SHEET_LIVIN: {
+        "nip": ['nip'],
+        "required": ["nama"],
+        "text": {
+            "nama": ['nama', 'employee name'],
+            "kode_cabang": ['kode cabang', 'kode_cabang'],
+            "unit": ['nama cabang', 'nama_cabang', 'cabang', 'unit'],
+            "area": ['area', 'wilayah'],
+            "kelas_cabang": ['kelas cabang', 'kelas'],
+            "posisi": ['posisi', 'unit kerja'],
+        },
+        "num": {
+            "cif_akuisisi": ['cif akuisisi', 'cif'],
+            "cif_setor": ['cif setor'],
+            "end_balance": ['end_balance', 'end balance'],
+            "rata_rata": ['rata-rata', 'rata rata'],
+            "cif_sudah_transaksi": ['cif_sudah_transaksi', 'cif sudah transaksi'],
+            "frek_dari_cif_akuisisi": ['frek dari cif akuisisi'],
+        },
+    },
+    SHEET_MERCHANT: {
+        "nip": ['nip'],
+        "required": [],
+        "first_wins": ["nama"],
+        "text": {"nama": ['nama pegawai', 'nama']},
+        "num": {
+            "total_referral_livin": ['total referral livin'],
+            "total_referral_edc": ['total referral edc'],
+        },
+    },
+    SHEET_TRANSAKSI: {
+        "nip": ['nip'],
+        "required": [],
+        "first_wins": ["nama"],
+        "text": {"nama": ['nama pegawai', 'nama']},
+        "num": {
+            "total_poin_transaksi": ['total poin transaksi'],
+            "poin_on_us": ['poin on us'],
+            "poin_off_us": ['poin off us'],
+            "frek_on_us": ['frek on us'],
+            "frek_off_us": ['frek off us'],
+            "pct_on_us": ['pct on us'],
+        },
+    },
+}
+
+TEXT_COLS = ["nama", "kode_cabang", "unit", "area", "kelas_cabang", "posisi"]
+NUM_COLS = [c for spec in SHEET_SPECS.values() for c in spec["num"]]
+MASTER_COLS = ["nip"] + TEXT_COLS + NUM_COLS
+
+_NON_NUMERIC = re.compile(r'[^\d\.-]')
+
+
+# ---------------------------
+# Resolusi Kolom & Normalisasi (Vectorized)
+# ---------------------------
+def find_col(columns, aliases):
+    lc_cols = [str(c).lower().strip() for c in columns]
+    for a in aliases:
+        if a.lower() in lc_cols: return columns[lc_cols.index(a.lower())]
+    return None
+
+def resolve_columns(columns, spec):
+    """Cocokkan alias ke nama kolom asli sekali per sheet (bukan per baris)."""
+    columns = list(columns)
+    resolved = {"nip": find_col(columns, spec["nip"])}
+    for target, aliases in list(spec["text"].items()) + list(spec["num"].items()):
+        resolved[target] = find_col(columns, aliases)
+    return resolved
+
+def clean_text_series(s):
+    return s.fillna('').astype(str).str.strip()
+
+def normalize_series(s):
+    """Normalisasi angka per kolom: koma jadi titik, buang karakter non-angka, gagal parse = 0."""
+    s = clean_text_series(s).str.replace(',', '.', regex=False)
+    s = s.str.replace(_NON_NUMERIC, '', regex=True)
+    return pd.to_numeric(s, errors='coerce').fillna(0.0).astype('float64')
+
+def dedupe_nip(df, spec):
+    """Satu baris per NIP (index): baris terakhir menang, kecuali kolom spec["first_wins"].
+
+    Bisa diterapkan ulang pada gabungan hasilnya (mis. antar chunk streaming).
+    """
+    out = df[~df.index.duplicated(keep="last")]
+    first = spec.get("first_wins", [])
+    if first and len(out) < len(df):
+        out = out.copy()
+        out[first] = df.loc[~df.index.duplicated(keep="first"), first].reindex(out.index)
+    return out
+
+def parse_sheet(df, spec, resolved):
+    """Normalisasi satu sheet menjadi frame ber-index NIP. Duplikat NIP: lihat dedupe_nip."""
+    if resolved["nip"] is None: return None
+    if any(resolved[c] is None for c in spec["required"]): return None
+
+    out = pd.DataFrame({"nip": clean_text_series(df[resolved["nip"]])}, index=df.index)
+    for target in spec["text"]:
+        src = resolved[target]
+        out[target] = clean_text_series(df[src]) if src is not None else ''
+    for target in spec["num"]:
+        src = resolved[target]
+        out[target] = normalize_series(df[src]) if src is not None else 0.0
+
+    out = out[(out["nip"] != '') & (out["nip"] != 'nan')]
+    return dedupe_nip(out.set_index("nip"), spec)
+
+
+# ---------------------------
+# Merge Tiga Sheet Berdasarkan NIP
+# ---------------------------
+def merge_sheets(parsed):
+    """Gabungkan frame per sheet dengan satu outer join pada index NIP."""
+    frames, nama_cols = [], []
+    for sheet_name in SHEET_SPECS:
+        df = parsed.get(sheet_name)
+        if df is None: continue
+        nama_col = f"nama__{len(nama_cols)}"
+        nama_cols.append(nama_col)
+        frames.append(df.rename(columns={"nama": nama_col}))
+
+    if not frames:
+        return pd.DataFrame(columns=MASTER_COLS)
+
+    master = pd.concat(frames, axis=1, join="outer")
+    nama = master[nama_cols[0]]
+    for c in nama_cols[1:]:
+        nama = nama.fillna(master[c])
+    master["nama"] = nama
+
+    for c in TEXT_COLS:
+        master[c] = master[c].fillna('') if c in master.columns else ''
+    for c in NUM_COLS:
+        master[c] = master[c].fillna(0.0).astype('float64') if c in master.columns else 0.0
+
+    master.index.name = "nip"
+    return master.reset_index()[MASTER_COLS]
+
+def _report(progress, name, done, total):
+    # progress(tahap, porsi 0..1) opsional, dipanggil setiap satu sheet selesai
+    if progress is not None: progress(f"Sheet {name} selesai ({done}/{total})", done / total)
+
+def build_master_frame(xls, timings=None, progress=None):
+    """Pipeline import: resolve alias -> normalisasi vectorized -> merge NIP.
+
+    `xls` adalah dict {nama_sheet: DataFrame} hasil read_excel(sheet_name=None).
+    Jika `timings` (dict) diberikan, durasi tiap tahap (detik) dicatat di sana.
+    `progress(tahap, porsi)` dipanggil setiap satu sheet selesai dinormalisasi.
+    """
+    if timings is None: timings = {}
+
+    t0 = time.perf_counter()
+    resolved = {name: resolve_columns(xls[name].columns, spec) for name, spec in SHEET_SPECS.items() if name in xls}
+    timings["Resolve Kolom"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    parsed = {}
+    for i, (name, cols) in enumerate(resolved.items(), 1):
+        parsed[name] = parse_sheet(xls[name], SHEET_SPECS[name], cols)
+        _report(progress, name, i, len(resolved))
+    timings["Normalisasi"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    master = merge_sheets(parsed)
+    timings["Merge NIP"] = time.perf_counter() - t0
+    return master
+
+
+# ---------------------------
+# Mode Streaming (openpyxl read-only, per chunk)
+# ---------------------------
+CHUNK_ROWS = 5000
+
+def _cell_str(v):
+    # Samakan dengan read_excel(dtype=str): angka bulat tanpa ".0", sel kosong = NaN
+    if v is None: return None
+    if isinstance(v, float) and v.is_integer(): return str(int(v))
+    return str(v)
+
+def open_workbook(source):
+    from openpyxl import load_workbook
+    if hasattr(source, "seek"): source.seek(0)
+    return load_workbook(source, read_only=True, data_only=True)
+
+def list_sheets(source):
+    wb = open_workbook(source)
+    try: return list(wb.sheetnames)
+    finally: wb.close()
+
+def iter_sheet_chunks(ws, spec, chunk_rows=CHUNK_ROWS):
+    """Yield (DataFrame, resolved) per `chunk_rows` baris, hanya kolom yang punya alias."""
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None: return
+
+    header = [str(h).strip() if h is not None else '' for h in header]
+    resolved = resolve_columns(header, spec)
+    src_cols = list(dict.fromkeys(c for c in resolved.values() if c is not None))
+    idxs = [header.index(c) for c in src_cols]
+
+    buffer = []
+    for row in rows:
+        buffer.append([_cell_str(row[i]) if i < len(row) else None for i in idxs])
+        if len(buffer) >= chunk_rows:
+            yield pd.DataFrame(buffer, columns=src_cols, dtype=object), resolved
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=src_cols, dtype=object), resolved
+
+def parse_sheet_streaming(wb, name, chunk_rows=CHUNK_ROWS):
+    """Baca & normalisasi satu sheet GMM dari workbook terbuka: (DataFrame atau None, detik baca, detik normalisasi)."""
+    spec = SHEET_SPECS[name]
+    t_baca = t_norm = 0.0
+    pieces = []
+    t0 = time.perf_counter()
+    for chunk, resolved in iter_sheet_chunks(wb[name], spec, chunk_rows):
+        t1 = time.perf_counter()
+        t_baca += t1 - t0
+        part = parse_sheet(chunk, spec, resolved)
+        if part is None: break
+        pieces.append(part)
+        t0 = time.perf_counter()
+        t_norm += t0 - t1
+    if not pieces: return None, t_baca, t_norm
+    return dedupe_nip(pd.concat(pieces), spec), t_baca, t_norm
+
+def parse_sheet_file(path, name, chunk_rows=CHUNK_ROWS):
+    """Unit kerja proses paralel: buka workbook sendiri dari `path`, parse satu sheet (tidak ada -> None)."""
+    wb = open_workbook(path)
+    try:
+        if name not in wb.sheetnames: return None, 0.0, 0.0
+        return parse_sheet_streaming(wb, name, chunk_rows)
+    finally:
+        wb.close()
+
+def _parse_sheets_parallel(path, chunk_rows, timings, progress):
+    # Satu proses per sheet; yang dikirim hanya path & nama sheet, yang kembali hanya frame hasil normalisasi.
+    # 'spawn': worker tidak mewarisi lock/thread server Streamlit (fork dari proses multi-thread)
+    # maupun state tracemalloc pemanggil
+    parsed = {}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(SHEET_SPECS), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(parse_sheet_file, os.fspath(path), name, chunk_rows): name for name in SHEET_SPECS}
+        for i, future in enumerate(as_completed(futures), 1):
+            df, _, _ = future.result()
+            if df is not None: parsed[futures[future]] = df
+            _report(progress, futures[future], i, len(futures))
+    timings["Baca & Normalisasi (Paralel)"] = time.perf_counter() - t0
+    return parsed
+
+def build_master_frame_streaming(source, chunk_rows=CHUNK_ROWS, timings=None, progress=None, parallel=False):
+    """Sama seperti build_master_frame, tapi membaca workbook .xlsx secara streaming.
+
+    Hanya tiga sheet GMM dan kolom beralias yang dibaca; sheet diproses per
+    chunk sehingga memori tidak tergantung jumlah kolom/sheet lain di file.
+    `parallel=True` (hanya jika `source` berupa path file) membaca & menormalisasi
+    tiap sheet di proses terpisah; hasil merge identik dengan mode serial.
+    """
+    if timings is None: timings = {}
+
+    if parallel and isinstance(source, (str, os.PathLike)):
+        parsed = _parse_sheets_parallel(source, chunk_rows, timings, progress)
+    else:
+        t_baca = t_norm = 0.0
+        parsed = {}
+        wb = open_workbook(source)
+        try:
+            names = [name for name in SHEET_SPECS if name in wb.sheetnames]
+            for i, name in enumerate(names, 1):
+                df, dt_baca, dt_norm = parse_sheet_streaming(wb, name, chunk_rows)
+                t_baca += dt_baca
+                t_norm += dt_norm
+                if df is not None: parsed[name] = df
+                _report(progress, name, i, len(names))
+        finally:
+            wb.close()
+        timings["Baca Excel (Streaming)"] = t_baca
+        timings["Normalisasi"] = t_norm
+
+    t0 = time.perf_counter()
+    master = merge_sheets(parsed)
+    timings["Merge NIP"] = time.perf_counter() - t0
+    return master
+
+def max_rss_bytes(children=False):
+    """Puncak RSS (high-water mark) proses ini atau proses anak terbesar; 0 jika modul resource tidak ada (Windows)."""
+    try: import resource
+    except ImportError: return 0
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # Linux: KB, macOS: byte
+
+class PeakMemory:
+    """Context manager pencatat puncak memori selama blok.
+
+    Default: puncak RSS dari getrusage, tanpa overhead, aman dipakai di
+    server. Nilainya high-water mark proses sejak start, jadi bisa lebih
+    besar dari kebutuhan import itu sendiri; `child_peak_bytes` = RSS
+    puncak proses worker (parse paralel). `trace=True` memakai tracemalloc
+    (alokasi Python saja, jauh lebih lambat & berlaku global di proses),
+    khusus untuk benchmark.
+    """
+    def __init__(self, trace=False):
+        self.trace = trace
+
+    def __enter__(self):
+        if self.trace:
+            self._owner = not tracemalloc.is_tracing()
+            if self._owner: tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.peak_bytes = self.child_peak_bytes = 0
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._owner: tracemalloc.stop()
+        else:
+            self.peak_bytes = max_rss_bytes()
+            self.child_peak_bytes = max_rss_bytes(children=True)
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak_bytes / (1024 * 1024)
+
+    @property
+    def child_peak_mb(self):
+        return self.child_peak_bytes / (1024 * 1024)
+
+def format_timings(timings):
+    """Ubah dict timing menjadi DataFrame kecil untuk ditampilkan ke admin."""
+    total = sum(timings.values()) or 1e-9
+    return pd.DataFrame({
+        "Tahap": list(timings.keys()),
+        "Durasi (detik)": [round(v, 3) for v in timings.values()],
+        "Porsi": [f"{v / total * 100:.1f}%" for v in timings.values()],
+    })
@@ -0,0 +1,176 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+
+# ---------------------------
+# Job Import di Background (Tabel jobs + Worker Thread)
+# ---------------------------
+JOB_STATUS_ACTIVE = ("queued", "running")
+
+def create_jobs_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            file_path TEXT,
+            options TEXT,
+            stage TEXT,
+            progress REAL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            attempts INTEGER DEFAULT 0
+        )
+    """)
+    try:
+        conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER DEFAULT 0")
+    except:
+        pass
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _row_to_job(row, columns):
+    job = dict(zip(columns, row))
+    for key in ("options", "result"):
+        job[key] = json.loads(job[key]) if job.get(key) else {}
+    return job
+
+def get_job(conn, job_id):
+    cur = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    row = cur.fetchone()
+    return _row_to_job(row, [d[0] for d in cur.description]) if row else None
+
+def recent_jobs(conn, limit=10):
+    cur = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+    columns = [d[0] for d in cur.description]
+    return [_row_to_job(r, columns) for r in cur.fetchall()]
+
+
+class JobRunner:
+    """Worker thread yang menjalankan job dari tabel `jobs` satu per satu (FIFO).
+
+    `submit()` menyimpan file upload ke `upload_dir` lalu menambah baris
+    'queued', sehingga job tidak bergantung pada sesi/rerun Streamlit yang
+    mengirimnya. `handler(job, report)` mengerjakan job; `report(stage,
+    progress)` menulis tahap & progres (0..1) ke tabel agar bisa di-poll
+    admin panel. Hasil handler (dict) disimpan sebagai JSON di kolom
+    `result`. Job yang masih 'running' saat proses mati diantrekan ulang
+    ketika runner berikutnya start (file-nya masih ada di disk), kecuali
+    sudah dicoba `max_attempts` kali: job itu ditandai 'failed' agar file
+    yang membuat proses crash tidak diulang terus.
+    """
+    def __init__(self, db_path, upload_dir, handler, poll_interval=5.0, keep_files=False, max_attempts=3):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self.keep_files = keep_files
+        self.max_attempts = max_attempts
+
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(upload_dir, exist_ok=True)
+        with self._connect() as conn:
+            create_jobs_table(conn)
+            abandoned = conn.execute("SELECT file_path FROM jobs WHERE status = 'running' AND attempts >= ?", (max_attempts,)).fetchall()
+            conn.execute("UPDATE jobs SET status = 'failed', stage = 'Gagal', error = ?, finished_at = ? WHERE status = 'running' AND attempts >= ?",
+                         (f"Proses berhenti saat job berjalan ({max_attempts}x percobaan); tidak diantrekan ulang.", _now(), max_attempts))
+            conn.execute("UPDATE jobs SET status = 'queued', stage = 'Diantrekan ulang' WHERE status = 'running'")
+        for (path,) in abandoned: self._remove_file(path)
+        atexit.register(self.stop)
+
+    @contextmanager
+    def _connect(self):
+        # Koneksi sendiri (bukan writer pool): status job tetap bisa ditulis
+        # walau import memegang writer, dan tidak ikut ter-commit di tengah transaksinya
+        conn = sqlite3.connect(self.db_path, timeout=15.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, kind, filename, data, options=None):
+        """Simpan file ke disk, daftarkan job 'queued', bangunkan worker. Kembalikan id job."""
+        with self._connect() as conn:
+            cur = conn.execute("INSERT INTO jobs (kind, status, options, stage, created_at) VALUES (?, 'queued', ?, 'Menunggu', ?)",
+                               (kind, json.dumps(options or {}), _now()))
+            job_id = cur.lastrowid
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename))
+        path = os.path.join(self.upload_dir, f"job_{job_id}_{safe_name}")
+        with open(path, "wb") as f: f.write(data)
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET file_path = ? WHERE id = ?", (path, job_id))
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def report(self, job_id, stage, progress=None):
+        with self._connect() as conn:
+            if progress is None: conn.execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+            else: conn.execute("UPDATE jobs SET stage = ?, progress = ? WHERE id = ?", (stage, max(0.0, min(1.0, progress)), job_id))
+
+    def _claim_next(self):
+        with self._connect() as conn:
+            cur = conn.execute("SELECT * FROM jobs WHERE status = 'queued' AND file_path IS NOT NULL ORDER BY id LIMIT 1")
+            row = cur.fetchone()
+            if row is None: return None
+            job = _row_to_job(row, [d[0] for d in cur.description])
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ?, progress = 0, attempts = attempts + 1 WHERE id = ?", (_now(), job["id"]))
+        return job
+
+    def run_pending(self):
+        """Kerjakan semua job 'queued' (dipanggil worker; bisa juga dipanggil langsung). Kembalikan jumlah job."""
+        done = 0
+        while not self._stop.is_set():
+            job = self._claim_next()
+            if job is None: break
+            try:
+                result = self.handler(job, lambda stage, progress=None: self.report(job["id"], stage, progress)) or {}
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET status = 'done', stage = 'Selesai', progress = 1, result = ?, finished_at = ? WHERE id = ?",
+                                 (json.dumps(result, default=str), _now(), job["id"]))
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                                 (traceback.format_exc(), _now(), job["id"]))
+            self._remove_file(job.get("file_path"))
+            done += 1
+        return done
+
+    def _remove_file(self, path):
+        if not self.keep_files and path and os.path.exists(path): os.remove(path)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try: self.run_pending()
+            except Exception as e: self.last_error = f"{type(e).__name__}: {e}"
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gmm-job-runner", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None: self._thread.join(timeout=timeout)
@@ -0,0 +1,310 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Antrian Tulis access_log (Write-Behind, Group Commit)
+# ---------------------------
+def sqlite_writer(db_path, timeout=15.0):
+    """Factory context manager: buka koneksi, commit di akhir blok, lalu tutup."""
+    @contextmanager
+    def writer():
+        conn = sqlite3.connect(db_path, timeout=timeout)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    return writer
+
+_STOP = object()
+
+class AccessLogQueue:
+    """Antrian in-process untuk INSERT access_log agar login tidak menunggu disk.
+
+    `put()` hanya memasukkan baris ke antrian. Worker thread mengumpulkan
+    baris sampai `flush_rows` baris atau `flush_ms` milidetik sejak baris
+    pertama, lalu menulisnya dalam satu transaksi lewat `writer()` (context
+    manager yang yield koneksi & commit di akhir). Sisa antrian ditulis saat
+    proses berhenti (atexit). `stats()` memberi kedalaman antrian & latensi commit.
+    """
+    def __init__(self, writer, flush_rows=50, flush_ms=200, on_commit=None):
+        self.writer = writer
+        self.flush_rows = flush_rows
+        self.flush_ms = flush_ms
+        self.on_commit = on_commit
+
+        self.commits = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self._total_commit_ms = 0.0
+        self._q = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def put(self, waktu, nip, nama, ip_address):
+        self._ensure_started()
+        self._q.put((waktu, nip, nama, ip_address))
+
+    def depth(self):
+        return self._q.qsize()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive(): return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="gmm-access-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is _STOP: return
+            batch = [item]
+            deadline = time.perf_counter() + self.flush_ms / 1000
+            stop = False
+            while len(batch) < self.flush_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0: break
+                try: item = self._q.get(timeout=remaining)
+                except queue.Empty: break
+                if item is _STOP: stop = True; break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try: item = self._q.get_nowait()
+            except queue.Empty: break
+            if item is not _STOP: batch.append(item)
+        if batch: self._commit(batch)
+
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        try:
+            with self.writer() as conn:
+                conn.executemany("INSERT INTO access_log (waktu, nip, nama, ip_address) VALUES (?, ?, ?, ?)", batch)
+        except Exception as e:
+            self.rows_dropped += len(batch)
+            logger.error("Error SQLite (access_log), %d baris dibuang: %s", len(batch), e)
+            return
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.commits += 1
+        self.rows_written += len(batch)
+        self.last_commit_ms = elapsed
+        self.max_commit_ms = max(self.max_commit_ms, elapsed)
+        self._total_commit_ms += elapsed
+        if self.on_commit is not None:
+            try: self.on_commit()
+            except Exception: pass
+
+    def stop(self):
+        """Tulis semua baris yang masih di antrian lalu hentikan worker."""
+        if self._thread is not None and self._thread.is_alive():
+            self._q.put(_STOP)
+            self._thread.join()
+        else:
+            self._drain()
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "commits": self.commits,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "last_commit_ms": round(self.last_commit_ms, 2),
+            "avg_commit_ms": round(self._total_commit_ms / self.commits, 2) if self.commits else 0.0,
+            "max_commit_ms": round(self.max_commit_ms, 2),
+        }
+
+
+# ---------------------------
+# Pengiriman access_log ke Google Sheets (Background, Batch)
+# ---------------------------
+SHEET_NAME = "Log GMM R11"
+WORKSHEET_NAME = "log_access"
+LOG_COLS = ["waktu", "nip", "nama", "ip_address"]
+
+def ensure_shipped_column(conn):
+    """Tambah kolom watermark `shipped` di access_log.
+
+    Saat kolom baru dibuat, log lama ditandai sudah terkirim karena dulu
+    dikirim langsung (append_row) ketika login.
+    """
+    try:
+        conn.execute("ALTER TABLE access_log ADD COLUMN shipped INTEGER DEFAULT 0")
+        conn.execute("UPDATE access_log SET shipped = 1")
+    except sqlite3.OperationalError:
+        pass
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_access_log_shipped ON access_log(shipped, id)")
+    conn.commit()
+
+
+# ---------------------------
+# Ringkasan Kunjungan per NIP (visit_stats)
+# ---------------------------
+def ensure_visit_stats(conn):
+    """Buat tabel ringkasan visit_stats (nip -> jumlah & kunjungan terakhir) + trigger pengisinya.
+
+    Trigger AFTER INSERT pada access_log menjaga ringkasan di transaksi yang
+    sama dengan INSERT log, sehingga login cukup lookup PK walau log sudah
+    jutaan baris. Saat tabel baru dibuat, isinya dihitung sekali dari log lama.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_access_log_nip ON access_log(nip)")
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'visit_stats'").fetchone() is None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS visit_stats (
+            nip TEXT PRIMARY KEY,
+            nama TEXT,
+            visit_count INTEGER DEFAULT 0,
+            last_visit TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_access_log_visit_stats AFTER INSERT ON access_log
+        BEGIN
+            INSERT INTO visit_stats (nip, nama, visit_count, last_visit) VALUES (NEW.nip, NEW.nama, 1, NEW.waktu)
+            ON CONFLICT(nip) DO UPDATE SET nama = excluded.nama, visit_count = visit_count + 1,
+                last_visit = MAX(IFNULL(last_visit, ''), IFNULL(excluded.last_visit, ''));
+        END
+    """)
+    if created:
+        # Kolom nama ikut baris dengan MAX(waktu) (bare column SQLite) = nama terakhir
+        conn.execute("""
+            INSERT INTO visit_stats (nip, nama, visit_count, last_visit)
+            SELECT nip, nama, COUNT(*), MAX(waktu) FROM access_log WHERE nip IS NOT NULL GROUP BY nip
+        """)
+
+def get_visit_stats(conn, nip):
+    """(jumlah kunjungan, kunjungan terakhir) dari visit_stats; (0, None) jika belum pernah login."""
+    row = conn.execute("SELECT visit_count, last_visit FROM visit_stats WHERE nip = ?", (nip,)).fetchone()
+    return (row[0] or 0, row[1] or None) if row else (0, None)
+
+
+class LogShipper:
+    """Worker thread yang mengirim baris access_log (shipped = 0) ke Google Sheets.
+
+    `client_factory` mengembalikan client ala gspread (punya `.open(nama)`
+    -> `.worksheet(nama)` -> `.append_rows(rows)`); client & worksheet
+    di-cache dan baru dibuat ulang setelah terjadi error. Batch gagal diulang
+    dengan backoff eksponensial; baris yang belum terkirim tetap shipped = 0
+    dan dicoba lagi di putaran berikutnya. Flush terakhir di `stop()` (atexit)
+    dibatasi `timeout` detik agar shutdown server tidak menunggu backoff penuh.
+    """
+    def __init__(self, db_path, client_factory, batch_size=200, interval=10.0,
+                 max_retries=4, backoff=1.0, sleep=time.sleep):
+        self.db_path = db_path
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+        self.shipped_total = 0
+        self.last_error = None
+        self._worksheet = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        atexit.register(self.stop)
+
+    def _get_worksheet(self):
+        if self._worksheet is None:
+            self._worksheet = self.client_factory().open(SHEET_NAME).worksheet(WORKSHEET_NAME)
+        return self._worksheet
+
+    def _append_with_retry(self, rows, deadline=None):
+        for attempt in range(self.max_retries):
+            try:
+                self._get_worksheet().append_rows(rows)
+                self.last_error = None
+                return True
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._worksheet = None
+                if attempt == self.max_retries - 1: break
+                delay = self.backoff * (2 ** attempt)
+                # Lewat batas waktu shutdown: berhenti, baris tetap shipped = 0
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    logger.warning("Batas waktu flush log tercapai, sisa log dikirim saat start berikutnya: %s", self.last_error)
+                    return False
+                self.sleep(delay)
+        logger.warning("Gagal mengirim log ke Google Sheets setelah %d percobaan: %s", self.max_retries, self.last_error)
+        return False
+
+    def ship_pending(self, deadline=None):
+        """Kirim semua baris yang belum terkirim per batch. Kembalikan jumlah baris terkirim.
+
+        `deadline` (time.monotonic) membatasi lama pengiriman: retry/backoff
+        dan batch berikutnya dihentikan bila melewatinya.
+        """
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=15.0)
+            sent = 0
+            try:
+                while True:
+                    rows = conn.execute(f"SELECT id, {', '.join(LOG_COLS)} FROM access_log WHERE shipped = 0 ORDER BY id LIMIT ?",
+                                        (self.batch_size,)).fetchall()
+                    if not rows: break
+                    if deadline is not None and time.monotonic() > deadline: break
+                    if not self._append_with_retry([["" if v is None else v for v in r[1:]] for r in rows], deadline): break
+                    conn.executemany("UPDATE access_log SET shipped = 1 WHERE id = ?", [(r[0],) for r in rows])
+                    conn.commit()
+                    sent += len(rows)
+                    if len(rows) < self.batch_size: break
+            finally:
+                conn.close()
+            self.shipped_total += sent
+            return sent
+
+    def pending_count(self):
+        conn = sqlite3.connect(self.db_path, timeout=15.0)
+        try: return conn.execute("SELECT COUNT(*) FROM access_log WHERE shipped = 0").fetchone()[0]
+        finally: conn.close()
+
+    def wake(self):
+        """Minta worker mengirim sekarang (dipanggil setelah log baru disimpan)."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try: self.ship_pending()
+            except Exception as e: self.last_error = f"{type(e).__name__}: {e}"
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gmm-log-shipper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True, timeout=5.0):
+        """Hentikan worker lalu (opsional) kirim sisa log, total paling lama `timeout` detik."""
+        deadline = time.monotonic() + timeout
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None: self._thread.join(timeout=timeout)
+        if not flush: return
+        # Worker masih di tengah retry (lock dipegang): jangan tunggu, sisa log
+        # tetap shipped = 0 dan dikirim saat start berikutnya.
+        if not self._lock.acquire(timeout=max(0.0, deadline - time.monotonic())): return
+        self._lock.release()
+        try: self.ship_pending(deadline)
+        except Exception as e: self.last_error = f"{type(e).__name__}: {e}"
@@ -0,0 +1,88 @@
+import sqlite3
+
+# ---------------------------
+# Indeks Pencarian Profil (FTS5 Trigram)
+# ---------------------------
+SEARCH_LIMIT = 20
+SEARCH_COLS = ["entity", "entity_id", "nama", "unit", "kode_cabang"]
+
+def create_search_index(cur):
+    """Buat tabel search_index: FTS5 trigram bila tersedia, tabel biasa (LIKE) bila tidak.
+
+    Trigram membutuhkan SQLite >= 3.34; build lama tetap jalan lewat LIKE
+    '%q%' yang lebih lambat tapi hasilnya sama.
+    """
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").fetchone() is not None: return
+    try:
+        cur.execute("""
+            CREATE VIRTUAL TABLE search_index USING fts5(
+                entity UNINDEXED, entity_id, nama, unit, kode_cabang, tokenize = 'trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        cur.execute(f"CREATE TABLE search_index ({', '.join(c + ' TEXT' for c in SEARCH_COLS)})")
+
+def is_fts(conn):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'search_index'").fetchone()
+    return row is not None and "fts5" in row[0].lower()
+
+def rebuild_search_index(cur, cabang_where="1"):
+    """Isi ulang search_index dari pegawai & cabang (dipanggil di transaksi import).
+
+    `cabang_where`: filter kode cabang sampah milik skema pemanggil
+    (mis. "valid = 1" di v9x).
+    """
+    create_search_index(cur)
+    cur.execute("DELETE FROM search_index")
+    cur.execute(f"""
+        INSERT INTO search_index ({", ".join(SEARCH_COLS)})
+        SELECT 'cabang', kode_cabang, unit, NULL, kode_cabang FROM cabang WHERE {cabang_where}
+        UNION ALL
+        SELECT 'pegawai', nip, nama, unit, kode_cabang FROM pegawai WHERE nip IS NOT NULL
+    """)
+
+def ensure_search_index(conn, cabang_where="1"):
+    """Buat indeks; isi sekali jika DB lama sudah berisi pegawai tapi indeks masih kosong."""
+    cur = conn.cursor()
+    create_search_index(cur)
+    if cur.execute("SELECT 1 FROM search_index LIMIT 1").fetchone() is None:
+        if cur.execute("SELECT 1 FROM pegawai LIMIT 1").fetchone() is not None:
+            rebuild_search_index(cur, cabang_where)
+
+def _like(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+SEARCH_TEXT_SQL = "(IFNULL(entity_id,'') || ' ' || IFNULL(nama,'') || ' ' || IFNULL(unit,'') || ' ' || IFNULL(kode_cabang,''))"
+
+def _search(conn, terms, match_terms, exact, limit):
+    # Kata di match_terms lewat MATCH trigram, sisanya disaring LIKE '%kata%'
+    like_terms = [t for t in terms if t not in match_terms]
+    where = [f"{SEARCH_TEXT_SQL} LIKE ? ESCAPE '\\'" for _ in like_terms]
+    params = [_like(t) for t in like_terms]
+    if match_terms:
+        where.insert(0, "search_index MATCH ?")
+        params.insert(0, " ".join('"' + t.replace('"', '""') + '"' for t in match_terms))
+    order = "entity_id = ? DESC, entity = 'cabang' DESC, " + ("rank" if match_terms else "nama")
+    return conn.execute(f"""
+        SELECT entity, entity_id, nama FROM search_index
+        WHERE {" AND ".join(where)}
+        ORDER BY {order} LIMIT ?
+    """, params + [exact, limit]).fetchall()
+
+def search(conn, query, limit=SEARCH_LIMIT):
+    """Maksimal `limit` hasil [(entity, entity_id, nama)] untuk teks ketikan pengguna.
+
+    Setiap kata dicocokkan sebagai substring ke NIP/kode, nama, unit atau
+    kode cabang (semua kata harus cocok). Kecocokan ID persis tampil
+    paling atas, lalu cabang sebelum pegawai, lalu relevansi/nama.
+    """
+    terms = query.strip().split()
+    if not terms: return []
+    exact = query.strip()
+
+    # Trigram hanya bisa mencocokkan kata >= 3 karakter; kata lebih pendek disaring lewat LIKE
+    match_terms = [t for t in terms if len(t) >= 3]
+    if match_terms:
+        try: return _search(conn, terms, match_terms, exact, limit)
+        except sqlite3.OperationalError: pass  # search_index tabel biasa (SQLite tanpa trigram)
+    return _search(conn, terms, [], exact, limit)
@@ -1,13 +1,24 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 import streamlit as st
-import io
 import os
 import math
-import re
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+import gmm_db
+import gmm_engine
+import gmm_fragments
+import gmm_history
+import gmm_import
+import gmm_jobs
+import gmm_logship
+import gmm_search
+from gmm_format import (fmt_rp, fmt_num, fmt_pct, fmt_num_series, fmt_series, growth_html_series,
+                        growth_text_series, rank_change_text_series)
+
 # ---------------------------
 # 1. KONFIGURASI HALAMAN
 # ---------------------------
@@ -19,59 +30,15 @@ st.set_page_config(
 )
 
 DB_PATH = "ycc_leaderboard.db"
+UPLOAD_DIR = "uploads"  # File Excel yang menunggu diproses job import
+JOB_POLL_SECONDS = 2
+RIWAYAT_DAYS = 30  # Jendela grafik riwayat di profil; biaya decode sebanding jumlah upload di jendela
+MOVERS_N = 5  # Jumlah pegawai "naik peringkat terbanyak" harian/mingguan di HOME
 
 # ---------------------------
 # 2. FORMATTERS & CONFIG KPI
 # ---------------------------
-def fmt_rp(value):
-    try:
-        v = int(round(float(value)))
-        return f"Rp {v:,}".replace(",", ".") + " Jt"
-    except:
-        return "Rp 0 Jt"
-
-def fmt_num(value):
-    try:
-        v = int(round(float(value)))
-        return f"{v:,}".replace(",", ".")
-    except:
-        return "0"
-
-def fmt_pct(value):
-    try:
-        v = float(value)
-        return f"{v * 100:.1f}%" if v <= 1 else f"{v:.1f}%"
-    except:
-        return "0.0%"
-
-def fmt_growth(current, base, formatter, is_penalty=False):
-    """Menghitung dan memformat indikator pertumbuhan (Growth DtD) dengan gaya Badge"""
-    try:
-        curr_val = float(current) if current else 0.0
-        base_val = float(base) if base else 0.0
-        
-        if is_penalty:
-            curr_val = abs(curr_val)
-            base_val = abs(base_val)
-            
-        diff = curr_val - base_val
-        
-        if diff > 0:
-            color = "#E10600" if is_penalty else "#10B981" 
-            bg_color = "#FFF5F5" if is_penalty else "#ECFDF5"
-            arrow, sign = "▲", "+"
-        elif diff < 0:
-            color = "#10B981" if is_penalty else "#E10600" 
-            bg_color = "#ECFDF5" if is_penalty else "#FFF5F5"
-            arrow, sign = "▼", "-"
-            diff = abs(diff) 
-        else:
-            return "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem; border:1px solid #CBD5E1;'>➖ 0</span>"
-        
-        diff_str = formatter(diff)
-        return f"<span style='background:{bg_color}; color:{color}; padding:4px 8px; border-radius:6px; font-weight:800; font-size:0.8rem; letter-spacing:-0.5px; border:1px solid {color}50; white-space:nowrap; box-shadow: 0 1px 2px rgba(0,0,0,0.1);'>{arrow} {sign}{diff_str}</span>"
-    except Exception as e:
-        return "<span style='background:#F1F5F9; color:#64748B; padding:4px 8px; border-radius:6px; font-weight:700; font-size:0.8rem;'>➖ N/A</span>"
+# Formatter scalar & versi kolomnya ada di gmm_format (bisa dites tanpa Streamlit)
 KAT_CONFIG = {
     "LIVIN": {
         "score_col": "end_balance", "score_label": "End Balance",
@@ -90,165 +57,105 @@ KAT_CONFIG = {
 # ---------------------------
 # 3. DATABASE SETUP
 # ---------------------------
-def init_db():
-    conn = sqlite3.connect(DB_PATH, timeout=15.0)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    cur = conn.cursor()
-
-    # --- CREATE TABLE ---
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS cabang (
-            kode_cabang TEXT PRIMARY KEY,
-            unit TEXT,
-            area TEXT,
-            nama_cabang TEXT,
-            kelas_cabang TEXT
-        )
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS pegawai (
-            nip TEXT PRIMARY KEY,
-            nama TEXT,
-            kode_cabang TEXT,
-            unit TEXT,
-            area TEXT,
-            nama_cabang TEXT,
-            posisi TEXT,
-            avatar_url TEXT,
-            end_balance REAL DEFAULT 0,
-            cif_akuisisi REAL DEFAULT 0,
-            cif_setor REAL DEFAULT 0,
-            cif_sudah_transaksi REAL DEFAULT 0,
-            frek_dari_cif_akuisisi REAL DEFAULT 0,
-            rata_rata REAL DEFAULT 0,
-            total_referral_livin REAL DEFAULT 0,
-            total_referral_edc REAL DEFAULT 0,
-            total_poin_transaksi REAL DEFAULT 0,
-            poin_on_us REAL DEFAULT 0,
-            poin_off_us REAL DEFAULT 0,
-            frek_on_us REAL DEFAULT 0,
-            frek_off_us REAL DEFAULT 0,
-            pct_on_us REAL DEFAULT 0,
-            FOREIGN KEY (kode_cabang) REFERENCES cabang(kode_cabang)
-        )
-    """)
-
-    # --- INDEX (WAJIB untuk performa) ---
-    try:
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_kode_cabang ON pegawai(kode_cabang)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_area ON pegawai(area)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_nip ON pegawai(nip)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_pegawai_is_active ON pegawai(is_active)")
-    except:
-        pass
-
-    # --- TAMBAH KOLOM BASE ---
-    base_cols = [
-        "end_balance_base", "cif_akuisisi_base", "cif_setor_base",
-        "cif_sudah_transaksi_base", "frek_dari_cif_akuisisi_base",
-        "rata_rata_base", "total_referral_livin_base",
-        "total_referral_edc_base", "total_poin_transaksi_base",
-        "poin_on_us_base", "poin_off_us_base",
-        "frek_on_us_base", "frek_off_us_base", "pct_on_us_base"
-    ]
+@st.cache_resource
+def get_db():
+    return gmm_db.ConnectionPool(DB_PATH)
 
-    for col in base_cols:
-        try:
-            cur.execute(f"ALTER TABLE pegawai ADD COLUMN {col} REAL DEFAULT 0")
-        except:
-            pass
-
-    # --- KOLOM ACTIVE ---
-    try:
-        cur.execute("ALTER TABLE pegawai ADD COLUMN is_active INTEGER DEFAULT 1")
-    except:
-        pass
-
-    # --- ACCESS LOG ---
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS access_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            waktu TEXT,
-            nip TEXT,
-            nama TEXT,
-            ip_address TEXT
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+@st.cache_resource
+def init_db():
+    # Sekali per proses server: di tiap rerun, writer lock bisa sedang dipegang import yang berjalan
+    with get_db().write() as conn:
+        gmm_db.create_schema(conn)
+
+def run_import_job(pool, job, report):
+    # Dijalankan worker thread gmm_jobs (di luar sesi Streamlit): baca & normalisasi -> tulis database
+    opts = job["options"]
+    parse_progress = lambda stage, frac: report(f"Baca & Normalisasi · {stage}", 0.6 * frac)
+    with gmm_import.PeakMemory() as mem:
+        report("Baca & Normalisasi", 0.0)
+        if opts.get("streaming"):
+            timings = {}
+            master = gmm_import.build_master_frame_streaming(job["file_path"], timings=timings, progress=parse_progress,
+                                                             parallel=opts.get("parallel", False))
+        else:
+            t0 = time.perf_counter()
+            xls = pd.read_excel(job["file_path"], sheet_name=None, dtype=str)
+            timings = {"Baca Excel": time.perf_counter() - t0}
+            master = gmm_import.build_master_frame(xls, timings, progress=parse_progress)
+
+        # Progres di tahap ini tidak dilaporkan: writer memegang transaksi sampai selesai
+        report("Tulis Database", 0.6)
+        diff_counts = {}
+        with pool.write() as conn:
+            inserted = gmm_db.bulk_load_master(conn, master, is_base=opts.get("is_base", False), timings=timings,
+                                               delta=opts.get("delta", True), diff_counts=diff_counts)
+    return {"inserted": inserted, "diff_counts": diff_counts, "timings": timings, "peak_mb": mem.peak_mb,
+            "child_peak_mb": mem.child_peak_mb}
+
+@st.cache_resource
+def get_job_runner():
+    # Satu worker import per proses server, terpisah dari sesi admin yang mengirim job
+    pool = get_db()
+    return gmm_jobs.JobRunner(DB_PATH, UPLOAD_DIR, lambda job, report: run_import_job(pool, job, report)).start()
+
+def get_data_version():
+    # Dinaikkan oleh import & hard reset; ikut jadi bagian kunci cache di bawah
+    with get_db().read() as conn:
+        return gmm_db.get_data_version(conn)
+
+@st.cache_resource(max_entries=2)
+def load_engine(data_version):
+    # Satu engine per versi data, dibagi ke semua sesi; versi lama tersingkir oleh max_entries
+    with get_db().read() as conn:
+        return gmm_engine.LeaderboardEngine.from_connection(conn)
+
+def get_engine():
+    return load_engine(get_data_version())
+
+@st.cache_resource
+def get_fragment_cache():
+    # Fragmen HTML (kartu profil, baris mini list) dibagi semua sesi; kunci diawali data_version
+    return gmm_fragments.FragmentCache()
+
+@st.cache_resource(max_entries=2)
+def load_dashboard_summary(data_version):
+    # Top/bottom per kategori untuk HOME: beberapa query LIMIT kecil, tanpa menunggu engine dimuat
+    with get_db().read() as conn:
+        return gmm_db.query_dashboard_summary(conn)
+
+def get_dashboard_summary():
+    return load_dashboard_summary(get_data_version())
+
+@st.cache_resource(max_entries=2)
+def load_period_movers(data_version):
+    # Pegawai paling banyak naik peringkat vs upload sehari/seminggu sebelumnya (riwayat snapshot), per kategori
+    with get_db().read() as conn:
+        return {(kat, label): gmm_history.top_movers(conn, "pegawai", kat, days, MOVERS_N)
+                for kat in KAT_CONFIG for label, days in (("Harian", 1), ("Mingguan", 7))}
+
+@st.cache_resource(max_entries=2)
+def load_nama_map(data_version):
+    # NIP -> nama untuk login, dibaca sekali per versi data
+    with get_db().read() as conn:
+        return dict(conn.execute("SELECT nip, nama FROM pegawai").fetchall())
+
+@st.cache_data(max_entries=256)
+def load_trajectory(data_version, entity, entity_id, kategori, since=None):
+    # Skor & rank per upload Data Berjalan dari riwayat snapshot (berubah hanya saat import)
+    with get_db().read() as conn:
+        return gmm_history.trajectory(conn, entity, entity_id, kategori, since=since)
 
-@st.cache_data(ttl=60)
 def get_cabang_leaderboard(kategori="LIVIN"):
-    conf = KAT_CONFIG[kategori]
-    sc, se = conf["score_col"], conf["sec_col"]
+    return get_engine().cabang_leaderboard(kategori)
 
-    if kategori == "TRANSAKSI":
-        sc_expr, se_expr = "SUM(p.total_poin_transaksi)", "SUM(p.poin_on_us)"
-        sc_base_expr, se_base_expr = "SUM(p.total_poin_transaksi_base)", "SUM(p.poin_on_us_base)"
-    else:
-        sc_expr, se_expr = f"SUM(p.{sc})", f"SUM(p.{se})"
-        sc_base_expr, se_base_expr = f"SUM(p.{sc}_base)", f"SUM(p.{se}_base)"
-
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(f"""
-        SELECT k.kode_cabang, COALESCE(c.unit, k.kode_cabang) AS unit, COALESCE(c.area, '(Unknown)') AS area, COALESCE(c.kelas_cabang, '-') AS kelas_cabang,
-               IFNULL({sc_expr},0) AS total_balance, IFNULL({sc_base_expr},0) AS total_balance_base,
-               (IFNULL({sc_expr},0) - IFNULL({sc_base_expr},0)) AS growth_score,
-               IFNULL({se_expr},0) AS total_cif, IFNULL({se_base_expr},0) AS total_cif_base,
-               (IFNULL({se_expr},0) - IFNULL({se_base_expr},0)) AS growth_cif,
-               IFNULL(COUNT(p.nip),0) AS jumlah_pegawai
-        FROM (SELECT kode_cabang FROM cabang WHERE kode_cabang IS NOT NULL AND TRIM(kode_cabang) != '' AND LOWER(kode_cabang) NOT IN ('unknown', 'nan','aktif')
-              UNION SELECT DISTINCT kode_cabang FROM pegawai WHERE kode_cabang IS NOT NULL AND TRIM(kode_cabang) != '' AND LOWER(kode_cabang) NOT IN ('unknown', 'nan','aktif')) k
-        LEFT JOIN cabang c ON k.kode_cabang = c.kode_cabang
-        LEFT JOIN pegawai p ON k.kode_cabang = p.kode_cabang AND p.is_active = 1
-        GROUP BY k.kode_cabang ORDER BY total_balance DESC
-    """, conn)
-    conn.close()
-    if not df.empty:
-        df['rank_default'] = df['total_balance'].rank(method='min', ascending=False).astype(int)
-    return df
-@st.cache_data(ttl=60)
-def get_pegawai(kode, kategori="LIVIN"):
-    conf = KAT_CONFIG[kategori]
-    sc, se = conf["score_col"], conf["sec_col"]
-
-    if kategori == "TRANSAKSI":
-        sc_expr = "(CASE WHEN (frek_on_us + frek_off_us) > 0 THEN (frek_on_us / (frek_on_us + frek_off_us)) ELSE 0 END)"
-        se_expr, sc_base_expr = "total_poin_transaksi", "pct_on_us_base"
-        se_base_expr = "total_poin_transaksi_base"
-    else:
-        sc_expr, se_expr, sc_base_expr = sc, se, f"{sc}_base"
-        se_base_expr = f"{se}_base"
-
-    conn = sqlite3.connect(DB_PATH)
-    base_query = f"""
-        SELECT *, IFNULL({sc_expr},0) AS score_utama, IFNULL({sc_base_expr},0) AS score_utama_base,
-               (IFNULL({sc_expr},0) - IFNULL({sc_base_expr},0)) AS growth_score, 
-               IFNULL({se_expr},0) AS score_kedua, IFNULL({se_base_expr},0) AS score_kedua_base,
-               (IFNULL({se_expr},0) - IFNULL({se_base_expr},0)) AS growth_kedua
-        FROM pegawai WHERE kode_cabang IS NOT NULL AND TRIM(kode_cabang) != '' AND LOWER(kode_cabang) NOT IN ('unknown', 'nan','aktif') AND is_active = 1
-    """
-    
-    if kode is None or kode == "ALL": df = pd.read_sql_query(base_query + " ORDER BY score_utama DESC, score_kedua DESC", conn)
-    elif len(kode) == 3: df = pd.read_sql_query(base_query + " AND area = ? ORDER BY score_utama DESC, score_kedua DESC", conn, params=(kode,))
-    else:
-        df_cabang = pd.read_sql_query("SELECT kode_cabang FROM cabang", conn)
-        if kode in df_cabang['kode_cabang'].tolist(): df = pd.read_sql_query(base_query + " AND kode_cabang = ? ORDER BY score_utama DESC, score_kedua DESC", conn, params=(kode,))
-        else: df = pd.read_sql_query(base_query + " AND area = ? ORDER BY score_utama DESC, score_kedua DESC", conn, params=(kode,))
-    conn.close()
-    
-    if not df.empty:
-        df['rank_default'] = df['score_utama'].rank(method='min', ascending=False).astype(int)
-    return df
+def get_pegawai_page(kode, kategori="LIVIN", posisi=None, sort="score_utama", ascending=False, page=1, page_size=50):
+    # Filter area/cabang/posisi, sort & paging lewat array in-memory; rank per scope dari snapshot
+    engine = get_engine()
+    return engine.pegawai_page(kategori, engine.scope_of(kode), kode, posisi, sort, ascending, page, page_size)
 
-def normalize_val(x):
-    if pd.isna(x) or x is None: return 0
-    s = str(x).strip().replace(',', '.')
-    s = re.sub(r'[^\d\.-]', '', s)
-    try: return float(s)
-    except: return 0
+def get_posisi_list(kode, kategori="LIVIN"):
+    engine = get_engine()
+    return engine.posisi_list(kategori, engine.scope_of(kode), kode)
 
 # ---------------------------
 # 4. CSS STYLING F1 WHITE EDITION (V14 - PREMIUM POLISH)
@@ -404,10 +311,19 @@ if "kode" in params:
     st.session_state.view = "pegawai"
     st.session_state.kode = str(params.get("kode")).strip()
     st.query_params.clear()
+if "nip" in params:
+    st.session_state.view = "detail_pegawai"
+    st.session_state.detail_nip = str(params.get("nip")).strip()
+    st.query_params.clear()
 if "view" in params:
     st.session_state.view = str(params.get("view"))
     st.query_params.clear()
 
+@st.cache_resource
+def get_access_log_queue():
+    # Write-behind: INSERT access_log di-group-commit lewat writer pool, bukan di jalur login
+    return gmm_logship.AccessLogQueue(get_db().write)
+
 def log_visitor(nip, nama):
     try:
         headers = st.context.headers
@@ -416,18 +332,13 @@ def log_visitor(nip, nama):
         
     waktu_sekarang = datetime.now(ZoneInfo("Asia/Makassar")).strftime("%Y-%m-%d %H:%M:%S")
 
-    try:
-        conn = sqlite3.connect(DB_PATH, timeout=15.0)
-        conn.execute("INSERT INTO access_log (waktu, nip, nama, ip_address) VALUES (?, ?, ?, ?)", (waktu_sekarang, nip, nama, ip_address))
-        conn.commit()
-    except Exception: pass
-    finally: conn.close()
+    get_access_log_queue().put(waktu_sekarang, nip, nama, ip_address)
 
 def get_visit_stats(n):
-    conn = sqlite3.connect(DB_PATH)
-    stats = conn.execute("SELECT COUNT(*), MAX(waktu) FROM access_log WHERE nip = ?", (n,)).fetchone()
-    conn.close()
-    return (stats[0] if stats[0] else 0) + 1, stats[1] if stats[1] else "Ini kunjungan pertama Anda"
+    # Lookup PK di visit_stats (dijaga trigger access_log), bukan agregasi log penuh
+    with get_db().read() as conn:
+        count, last_visit = gmm_logship.get_visit_stats(conn, n)
+    return count + 1, last_visit if last_visit else "Ini kunjungan pertama Anda"
 
 # --- GLOBAL F1 HELPER UNTUK SEMUA VIEW ---
 def get_f1_style_global(area_code):
@@ -485,9 +396,8 @@ if not st.session_state.logged_in:
             nip_input = st.text_input("NIP Pegawai")
             if st.form_submit_button("Masuk 🚀", use_container_width=True):
                 nip_clean = nip_input.strip()
-                conn = sqlite3.connect(DB_PATH)
-                user_data = conn.execute("SELECT nama FROM pegawai WHERE nip = ?", (nip_clean,)).fetchone()
-                conn.close()
+                nama_map = load_nama_map(get_data_version())
+                user_data = (nama_map[nip_clean],) if nip_clean in nama_map else None
                 
                 is_super_admin = ("admin_nip" in st.secrets and nip_clean == st.secrets["admin_nip"]) or ("admin_pass" in st.secrets and nip_clean.lower() == st.secrets["admin_pass"])
                 
@@ -574,19 +484,42 @@ st.markdown("<hr style='border-color: var(--border); margin: 24px 0px;'>", unsaf
 # 9. HTML BUILDER & FORMATTER
 # ---------------------------
 def build_card_html(cards_tuple_list):
+    # Nilai & badge growth diformat per kelompok formatter (satu pass Series), baru dirangkai per kartu
+    cards = pd.DataFrame(cards_tuple_list, columns=["icon", "title", "val", "base", "formatter"], dtype=object)
+    penalti = cards["title"].isin(["Poin Off Us", "Trx Off Us"])
+    val_strs, growths = pd.Series("", index=cards.index, dtype=object), pd.Series("", index=cards.index, dtype=object)
+    groups = {}
+    for i, f in enumerate(cards["formatter"]): groups.setdefault(f, []).append(i)
+    for formatter, rows in groups.items():
+        val_strs[rows] = fmt_series(cards["val"][rows], formatter).to_numpy()
+        growths[rows] = growth_html_series(cards["val"][rows], cards["base"][rows], formatter, penalti[rows]).to_numpy()
+
     html = "<div class='detail-grid'>"
-    for icon, title, val_raw, base_raw, formatter in cards_tuple_list:
-        val_str = formatter(val_raw)
+    for icon, title, val_raw, val_str, growth_html, is_penalti in zip(cards["icon"], cards["title"], cards["val"], val_strs, growths, penalti):
         if title == "Kebutuhan": 
             html += f"<div class='detail-card highlight-card' style='grid-column:'><div class='detail-title'>{icon} {title}</div><div class='detail-value'>{val_raw}</div></div>"
             continue    
-        is_penalti = title in ["Poin Off Us", "Trx Off Us"]
-        growth_html = fmt_growth(val_raw, base_raw, formatter, is_penalty=is_penalti)
         bg_style = "background: #FFF5F5; border-left-color: var(--f1-red);" if is_penalti else ""
         html += f"<div class='detail-card' style='{bg_style}'><div class='detail-title'><span>{icon}</span> {title}</div><div class='detail-value'>{val_str}</div><div style='margin-top:6px;'>{growth_html}</div></div>"
     html += "</div>"
     return html
 
+def render_nav_table(df_show, areas, nav_values, nav_param, key):
+    """Render seluruh tabel leaderboard sebagai SATU elemen (st.dataframe), bukan 3 widget per baris.
+
+    Warna baris mengikuti area (get_f1_style_global). Klik sebuah baris menulis
+    `nav_param` (mis. kode / nip) ke query params lalu rerun, sehingga perpindahan
+    view ditangani routing URL di bagian 6 tanpa reload halaman (session tetap).
+    """
+    colors = [get_f1_style_global(a) for a in areas]
+    styled = df_show.reset_index(drop=True).style.apply(
+        lambda row: [f"background-color: {colors[row.name][0]}; color: {colors[row.name][1]}; font-weight: 700"] * len(row), axis=1)
+    event = st.dataframe(styled, hide_index=True, use_container_width=True, height=(len(df_show) + 1) * 35 + 3,
+                         on_select="rerun", selection_mode="single-row", key=key)
+    if event.selection.rows:
+        st.query_params[nav_param] = str(nav_values[event.selection.rows[0]])
+        st.rerun()
+
 kategori_aktif = st.session_state.kategori
 if kategori_aktif != "HOME" and st.session_state.view in ["cabang", "pegawai"]:
     fmt_fungsi = KAT_CONFIG[kategori_aktif]["fmt"]
@@ -599,57 +532,29 @@ if kategori_aktif != "HOME" and st.session_state.view in ["cabang", "pegawai"]:
 # 10. RENDERER PROFIL (DETAIL)
 # ---------------------------
 
-def render_profil_cabang(kode_cabang):
-    conn = sqlite3.connect(DB_PATH)
+def build_profil_cabang_html(kode_cabang):
+    """Potongan HTML profil cabang (banner + kartu per kategori); None jika cabang tidak ada."""
+    parts = []
+    # Agregasi cabang: hanya identitas + SUM metrik yang dirender di kartu ketiga kategori
+    with get_db().read() as conn:
+        df_detail = gmm_db.query_cabang_profile(conn, kode_cabang, KAT_CONFIG.keys())
     
-    # Query Agregasi: Menggabungkan data cabang dan menjumlahkan seluruh performa pegawainya
-    query_cabang = """
-        SELECT 
-            c.kode_cabang, c.unit, c.area, c.kelas_cabang,
-            COUNT(p.nip) as jml_pegawai,
-            SUM(p.end_balance) as end_balance, SUM(p.end_balance_base) as end_balance_base,
-            SUM(p.cif_akuisisi) as cif_akuisisi, SUM(p.cif_akuisisi_base) as cif_akuisisi_base,
-            SUM(p.cif_setor) as cif_setor, SUM(p.cif_setor_base) as cif_setor_base,
-            SUM(p.cif_sudah_transaksi) as cif_sudah_transaksi, SUM(p.cif_sudah_transaksi_base) as cif_sudah_transaksi_base,
-            SUM(p.frek_dari_cif_akuisisi) as frek_dari_cif_akuisisi, SUM(p.frek_dari_cif_akuisisi_base) as frek_dari_cif_akuisisi_base,
-            SUM(p.rata_rata) as rata_rata, SUM(p.rata_rata_base) as rata_rata_base,
-            SUM(p.total_referral_livin) as total_referral_livin, SUM(p.total_referral_livin_base) as total_referral_livin_base,
-            SUM(p.total_referral_edc) as total_referral_edc, SUM(p.total_referral_edc_base) as total_referral_edc_base,
-            SUM(p.total_poin_transaksi) as total_poin_transaksi, SUM(p.total_poin_transaksi_base) as total_poin_transaksi_base,
-            SUM(p.poin_on_us) as poin_on_us, SUM(p.poin_on_us_base) as poin_on_us_base,
-            SUM(p.poin_off_us) as poin_off_us, SUM(p.poin_off_us_base) as poin_off_us_base,
-            SUM(p.frek_on_us) as frek_on_us, SUM(p.frek_on_us_base) as frek_on_us_base,
-            SUM(p.frek_off_us) as frek_off_us, SUM(p.frek_off_us_base) as frek_off_us_base
-        FROM cabang c
-        LEFT JOIN pegawai p ON c.kode_cabang = p.kode_cabang AND p.is_active = 1
-        WHERE c.kode_cabang = ?
-        GROUP BY c.kode_cabang
-    """
-    df_detail = pd.read_sql_query(query_cabang, conn, params=(kode_cabang,))
-    
-    if df_detail.empty: 
-        st.error("Data cabang tidak ditemukan.")
-        conn.close()
-        return False
+    if df_detail.empty: return None
 
     r = df_detail.iloc[0]
     
-    # Ambil Ranking Cabang secara Live dari fungsi leaderboard
-    df_l = get_cabang_leaderboard("LIVIN")
-    df_m = get_cabang_leaderboard("MERCHANT")
-    df_t = get_cabang_leaderboard("TRANSAKSI")
-    
-    rank_livin = df_l[df_l['kode_cabang'] == kode_cabang]['rank_default'].values[0] if not df_l[df_l['kode_cabang'] == kode_cabang].empty else "-"
-    rank_merchant = df_m[df_m['kode_cabang'] == kode_cabang]['rank_default'].values[0] if not df_m[df_m['kode_cabang'] == kode_cabang].empty else "-"
-    rank_trx = df_t[df_t['kode_cabang'] == kode_cabang]['rank_default'].values[0] if not df_t[df_t['kode_cabang'] == kode_cabang].empty else "-"
-    
-    conn.close()
+    # Ranking Cabang: lookup langsung ke index (kategori, entity, kode_cabang) di leaderboard_snapshot
+    with get_db().read() as conn:
+        ranks = gmm_db.get_entity_ranks(conn, "cabang", kode_cabang)
+    rank_livin = ranks.get("LIVIN", ("-",))[0]
+    rank_merchant = ranks.get("MERCHANT", ("-",))[0]
+    rank_trx = ranks.get("TRANSAKSI", ("-",))[0]
 
     # Styling Banner berdasarkan Area Tim F1
     bg_col, txt_col = get_f1_style_global(r.get('area', ''))
     area_str = get_area_name_global(r.get('area', ''))
 
-    st.markdown(f"""
+    parts.append(f"""
     <div class="emp-banner" style="border-top: 6px solid {bg_col if bg_col != '#FFFFFF' else 'var(--f1-dark)'};">
         <div class="emp-avatar" style="background-color:{bg_col}; color:{txt_col}; border: 4px solid #F8FAFC;">🏢</div>
         <div>
@@ -659,10 +564,10 @@ def render_profil_cabang(kode_cabang):
             <div style="background-color:{bg_col}; color:{txt_col}; padding:4px 10px; border-radius:6px; font-size:0.75rem; font-weight:800; display:inline-block; margin-top:10px; border:1px solid #E2E8F0; letter-spacing:0.5px;">AREA {area_str.upper()}</div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """)
 
     # -- LIVIN SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:24px;'>📱 LIVIN (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_livin}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:24px;'>📱 LIVIN (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_livin}</span></h4>")
     cards_livin = [
         ("🏦", "End Balance", r.get("end_balance",0), r.get("end_balance_base",0), fmt_rp),
         ("📌", "CIF Akuisisi", r.get("cif_akuisisi",0), r.get("cif_akuisisi_base",0), fmt_num),
@@ -671,10 +576,10 @@ def render_profil_cabang(kode_cabang):
         ("⏱️", "Frek Dari CIF", r.get("frek_dari_cif_akuisisi",0), r.get("frek_dari_cif_akuisisi_base",0), fmt_num),
         ("📊", "Total Rata-rata", r.get("rata_rata",0), r.get("rata_rata_base",0), fmt_rp)
     ]
-    st.markdown(build_card_html(cards_livin), unsafe_allow_html=True)
+    parts.append(build_card_html(cards_livin))
 
     # -- MERCHANT SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>🏪 MERCHANT (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_merchant}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>🏪 MERCHANT (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_merchant}</span></h4>")
     tot_ref = int(r.get("total_referral_edc",0) + r.get("total_referral_livin",0))
     tot_ref_base = int(r.get("total_referral_edc_base",0) + r.get("total_referral_livin_base",0))
     cards_merchant = [
@@ -682,10 +587,10 @@ def render_profil_cabang(kode_cabang):
         ("🖥️", "Referral EDC", r.get("total_referral_edc",0), r.get("total_referral_edc_base",0), fmt_num),
         ("💳", "Referral LVM", r.get("total_referral_livin",0), r.get("total_referral_livin_base",0), fmt_num)
     ]
-    st.markdown(build_card_html(cards_merchant), unsafe_allow_html=True)
+    parts.append(build_card_html(cards_merchant))
     
     # -- TRANSAKSI SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>💳 TRANSAKSI (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_trx}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>💳 TRANSAKSI (Akumulasi Cabang) <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_trx}</span></h4>")
 
     poin_on_us, poin_off_us = r.get("poin_on_us", 0), r.get("poin_off_us", 0)
     trx_on_us, trx_off_us = r.get("frek_on_us", 0), r.get("frek_off_us", 0)
@@ -716,27 +621,26 @@ def render_profil_cabang(kode_cabang):
         ("🎯", "% Target", "80.0%", None, str),
         ("💡", "Kebutuhan", kebutuhan_display, None, str)  
     ]
-    st.markdown(build_card_html(cards_transaksi), unsafe_allow_html=True)
-    return True
-def render_profil_pegawai(nip):
-    conn = sqlite3.connect(DB_PATH)
-    df_detail = pd.read_sql_query("SELECT * FROM pegawai WHERE nip = ?", conn, params=(nip,))
-    if df_detail.empty: st.error("Data pegawai tidak ditemukan."); conn.close(); return False
+    parts.append(build_card_html(cards_transaksi))
+    return parts
+def build_profil_pegawai_html(nip):
+    """Potongan HTML profil pegawai (banner + kartu per kategori); None jika NIP tidak ada."""
+    parts = []
+    db = get_db()
+    with db.read() as conn:
+        df_detail = gmm_db.query_pegawai_profile(conn, nip, KAT_CONFIG.keys())
+    if df_detail.empty: return None
 
     r = df_detail.iloc[0]
     
-    def get_global_rank(col_name, score, tie_col=None, tie_score=None):
-        cur = conn.cursor()
-        if tie_col and tie_score: cur.execute(f"SELECT COUNT(*) + 1 FROM pegawai WHERE {col_name} > ? OR ({col_name} = ? AND {tie_col} > ?)", (score, score, tie_score))
-        else: cur.execute(f"SELECT COUNT(*) + 1 FROM pegawai WHERE {col_name} > ?", (score,))
-        return cur.fetchone()[0]
-
-    rank_livin = get_global_rank("end_balance", r["end_balance"])
-    rank_merchant = get_global_rank("total_referral_edc", r["total_referral_edc"])
-    rank_pct_on_us = get_global_rank("pct_on_us", r.get("pct_on_us",0), "total_poin_transaksi", r.get("total_poin_transaksi",0))
-    conn.close()
-
-    st.markdown(f"""
+    # Rank global ketiga kategori dalam satu lookup ke leaderboard_snapshot
+    with db.read() as conn:
+        ranks = gmm_db.get_entity_ranks(conn, "pegawai", nip)
+    rank_livin = ranks.get("LIVIN", ("-",))[0]
+    rank_merchant = ranks.get("MERCHANT", ("-",))[0]
+    rank_pct_on_us = ranks.get("TRANSAKSI", ("-",))[0]
+
+    parts.append(f"""
     <div class="emp-banner">
         <div class="emp-avatar">{r['nama'][0].upper() if r['nama'] else "?"}</div>
         <div>
@@ -745,10 +649,10 @@ def render_profil_pegawai(nip):
             <div style="color: var(--text-muted); font-size: 0.95rem; font-weight:600; margin-top: 2px;">CABANG: <span style="color:var(--text-dark);">{r.get('unit','')}</span></div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """)
 
     # -- LIVIN SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:24px;'>📱 LIVIN <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_livin}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:24px;'>📱 LIVIN <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_livin}</span></h4>")
     cards_livin = [
         ("🏦", "End Balance", r.get("end_balance",0), r.get("end_balance_base",0), fmt_rp),
         ("📌", "CIF Akuisisi", r.get("cif_akuisisi",0), r.get("cif_akuisisi_base",0), fmt_num),
@@ -757,10 +661,10 @@ def render_profil_pegawai(nip):
         ("⏱️", "Frek Dari CIF", r.get("frek_dari_cif_akuisisi",0), r.get("frek_dari_cif_akuisisi_base",0), fmt_num),
         ("📊", "Rata-rata", r.get("rata_rata",0), r.get("rata_rata_base",0), fmt_rp)
     ]
-    st.markdown(build_card_html(cards_livin), unsafe_allow_html=True)
+    parts.append(build_card_html(cards_livin))
 
     # -- MERCHANT SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>🏪 MERCHANT <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_merchant}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>🏪 MERCHANT <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_merchant}</span></h4>")
     tot_ref = int(r.get("total_referral_edc",0) + r.get("total_referral_livin",0))
     tot_ref_base = int(r.get("total_referral_edc_base",0) + r.get("total_referral_livin_base",0))
     cards_merchant = [
@@ -768,10 +672,10 @@ def render_profil_pegawai(nip):
         ("🖥️", "Referral EDC", r.get("total_referral_edc",0), r.get("total_referral_edc_base",0), fmt_num),
         ("💳", "Referral LVM", r.get("total_referral_livin",0), r.get("total_referral_livin_base",0), fmt_num)
     ]
-    st.markdown(build_card_html(cards_merchant), unsafe_allow_html=True)
+    parts.append(build_card_html(cards_merchant))
     
     # -- TRANSAKSI SECTION --
-    st.markdown(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>💳 TRANSAKSI <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_pct_on_us}</span></h4>", unsafe_allow_html=True)
+    parts.append(f"<h4 style='color:var(--f1-dark); margin-top:32px;'>💳 TRANSAKSI <span style='color:var(--f1-red); font-size:0.85rem; background:#FFF5F5; padding:4px 12px; border-radius:12px; margin-left:8px; border: 1px solid #FECACA; vertical-align:middle;'>🏆 Rank #{rank_pct_on_us}</span></h4>")
 
     poin_on_us, poin_off_us = r.get("poin_on_us", 0), r.get("poin_off_us", 0)
     trx_on_us, trx_off_us = r.get("frek_on_us", 0), r.get("frek_off_us", 0)
@@ -795,7 +699,50 @@ def render_profil_pegawai(nip):
         ("🎯", "% Target", "80.0%", None, str),
         ("💡", "Kebutuhan", kebutuhan_display, None, str)  
     ]
-    st.markdown(build_card_html(cards_transaksi), unsafe_allow_html=True)
+    parts.append(build_card_html(cards_transaksi))
+    return parts
+
+def render_riwayat(entity, entity_id):
+    version = get_data_version()
+    # Batas bawah per tanggal (bukan per detik) agar kunci cache stabil sepanjang hari
+    since = (datetime.now() - timedelta(days=RIWAYAT_DAYS)).strftime("%Y-%m-%d")
+    with st.expander(f"📈 Riwayat Rank per Upload ({RIWAYAT_DAYS} hari terakhir)", expanded=False):
+        for tab, kat in zip(st.tabs(list(KAT_CONFIG)), KAT_CONFIG):
+            with tab:
+                traj = load_trajectory(version, entity, entity_id, kat, since)
+                if len(traj) < 2:
+                    st.caption("Riwayat belum cukup (minimal 2 upload Data Berjalan).")
+                    continue
+                st.line_chart(traj.set_index("uploaded_at")[["rank_current"]], height=220)
+                fmt_fn = fmt_num if kat == "TRANSAKSI" and entity == "cabang" else KAT_CONFIG[kat]["fmt"]
+                notes = []
+                for label, days in (("Harian", 1), ("Mingguan", 7)):
+                    change = gmm_history.trajectory_change(traj, days)
+                    if change is None: continue
+                    rank_change, delta = change
+                    arrow = f"▲ {rank_change}" if rank_change > 0 else (f"▼ {abs(rank_change)}" if rank_change < 0 else "➖")
+                    notes.append(f"{label}: rank {arrow}, {KAT_CONFIG[kat]['score_label']} {'+' if delta >= 0 else '-'}{fmt_fn(abs(delta))}")
+                st.caption(" · ".join(notes) if notes else "Belum ada upload sehari/seminggu sebelumnya.")
+
+def render_profil_cabang(kode_cabang):
+    # Banner & kartu dirender sekali per versi data lalu dibagi lintas sesi (gmm_fragments)
+    parts = get_fragment_cache().get_or_render((get_data_version(), kode_cabang, "ALL", "profil_cabang"),
+                                               lambda: build_profil_cabang_html(kode_cabang))
+    if parts is None:
+        st.error("Data cabang tidak ditemukan.")
+        return False
+    for html in parts: st.markdown(html, unsafe_allow_html=True)
+    render_riwayat("cabang", kode_cabang)
+    return True
+
+def render_profil_pegawai(nip):
+    parts = get_fragment_cache().get_or_render((get_data_version(), nip, "ALL", "profil_pegawai"),
+                                               lambda: build_profil_pegawai_html(nip))
+    if parts is None:
+        st.error("Data pegawai tidak ditemukan.")
+        return False
+    for html in parts: st.markdown(html, unsafe_allow_html=True)
+    render_riwayat("pegawai", nip)
     return True
 
 # ---------------------------
@@ -814,22 +761,18 @@ elif st.session_state.view == "cari" and not st.session_state.show_update_panel:
     st.markdown("<h2 style='margin-bottom:8px;'>🔍 Pencarian Profil Terpadu</h2>", unsafe_allow_html=True)
     st.markdown("<p class='small-muted' style='margin-bottom:24px;'>Cari profil spesifik berdasarkan Nama, NIP Pegawai, atau Nama Unit Cabang.</p>", unsafe_allow_html=True)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    # Ambil Daftar Pegawai
-    cur.execute("SELECT nip, nama FROM pegawai ORDER BY nama ASC")
-    peg_list = [f"👤 {row[0]} - {row[1]}" for row in cur.fetchall()]
-    
-    # Ambil Daftar Cabang
-    cur.execute("SELECT kode_cabang, unit FROM cabang WHERE kode_cabang IS NOT NULL AND TRIM(kode_cabang) != '' AND LOWER(kode_cabang) NOT IN ('unknown', 'nan','aktif') ORDER BY unit ASC")
-    cab_list = [f"🏢 {row[0]} - {row[1]}" for row in cur.fetchall()]
-    conn.close()
+    # Pencarian di server (indeks search_index), hanya hasil teratas yang dikirim ke browser
+    query = st.text_input("Cari Cabang / Pegawai:", placeholder="Ketik Nama, NIP, Unit atau Kode Cabang")
+    matches = []
+    if query.strip():
+        with get_db().read() as conn:
+            matches = gmm_search.search(conn, query)
+        if not matches: st.info("Tidak ada cabang / pegawai yang cocok.")
 
-    all_options = ["-- Ketik atau Pilih Disini --"] + cab_list + peg_list
+    all_options = ["-- Ketik atau Pilih Disini --"] + [f"{'👤' if entity == 'pegawai' else '🏢'} {entity_id} - {nama}" for entity, entity_id, nama in matches]
     
     # Render Selectbox
-    selected_profile = st.selectbox("Pilih Cabang / Pegawai (Ketik untuk mencari):", options=all_options)
+    selected_profile = st.selectbox(f"Pilih Hasil Pencarian ({len(matches)} teratas):", options=all_options)
 
     if selected_profile != "-- Ketik atau Pilih Disini --":
         st.markdown("<hr style='border-color:var(--border); margin-top:8px; margin-bottom:24px;'>", unsafe_allow_html=True)
@@ -880,82 +823,93 @@ elif st.session_state.view == "home" and not st.session_state.show_update_panel:
         else:
             return "<span style='color:#94A3B8; font-weight:900; font-size:1.1rem;'>➖</span>"
 
-    def render_mini_list(title, df_list, name_col, score_col, base_col, fmt_fn, is_pegawai=False):
+    def render_mini_list(title, df_list, name_col, score_col, base_col, fmt_fn, is_pegawai=False, kategori=None):
         html = f"<div class='mini-list-card'><h5 style='margin-bottom:16px; font-size: 1.1rem; color: var(--f1-dark); display:flex; align-items:center; gap:8px;'><span>🏆</span> {title}</h5>"
         if df_list.empty: return html + "<div class='small-muted'>Data belum tersedia.</div></div>"
             
+        fragments, version = get_fragment_cache(), get_data_version()
+        view = "home_pegawai" if is_pegawai else "home_cabang"
+        score_fmt = fmt_series(df_list[score_col], fmt_fn).tolist()
         for idx, r in enumerate(df_list.to_dict('records')):
-            name = r[name_col]
-            val_html = f"<span style='color:var(--f1-dark); font-weight:900; font-size:1.05rem;'>{fmt_fn(r[score_col])}</span>"
-            
-            # Styling untuk Peringkat (1, 2, 3, dan seterusnya)
-            rank_num = r.get('rank_current', idx + 1)
-            if rank_num == 1: rank_cls, rank_style = "top1", ""
-            elif rank_num == 2: rank_cls, rank_style = "top2", ""
-            elif rank_num == 3: rank_cls, rank_style = "top3", ""
-            else: rank_cls, rank_style = "", "background: #F8FAFC; color: #475569; border: 1px solid #CBD5E1;"
-            
-            # Area Logic & Penentuan Teks Badge
-            area_code = str(r.get('area', '')).strip().upper()
-            bg_col, txt_col = get_f1_style_global(area_code)
-            area_name_str = get_area_name(area_code)
-            
-            if is_pegawai:
-                unit_name = str(r.get('unit', '-')).strip()
-                badge_text = f"{unit_name} — {area_name_str}"
-            else:
-                badge_text = f"{area_name_str}"
-            
-            # Hitung Status Perubahan
-            change_html = get_rank_change_html(r.get('rank_change', 0), r.get(base_col, 0))
-            
-            html += f"<div class='row-card' style='padding: 8px 12px; margin-bottom: 6px;'>"
-            
-            # Kolom Kiri: Rank & Nama (Flexbox dengan batasan overflow agar teks panjang tidak merusak layout)
-            html += f"<div style='display:flex; align-items:center; gap:12px; flex: 1; min-width: 0;'>"
-            html += f"<div class='rank-badge {rank_cls}' style='margin:0; {rank_style}; flex-shrink: 0;'>{int(rank_num)}</div>"
-            html += f"<div class='row-meta' style='min-width: 0; overflow: hidden;'>"
-            html += f"<div class='unit' style='font-weight:700; color:var(--f1-dark); font-size:0.9rem; white-space:nowrap; overflow:hidden; text-overflow:ellipsis;'>{name}</div>"
-            html += f"<div style='background-color:{bg_col}; color:{txt_col}; padding:2px 6px; border-radius:4px; font-size:0.65rem; font-weight:800; display:inline-block; margin-top:2px; border:1px solid #E2E8F0; letter-spacing:0.5px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis; max-width:100%;'>{badge_text.upper()}</div>"
-            html += f"</div></div>"
-            
-            # Kolom Kanan: Skor & Indikator Perubahan Posisi
-            html += f"<div class='row-right' style='display:flex; align-items:center; gap:16px; justify-content:flex-end; flex-shrink: 0;'>"
-            html += f"<div style='text-align:right;'>{val_html}</div>"
-            html += f"<div style='width: 40px; text-align:center;'>{change_html}</div>"
-            html += f"</div></div>"
+            entity_id = r['nip'] if is_pegawai else r['kode_cabang']
+            html += fragments.get_or_render((version, entity_id, kategori, view),
+                                            lambda: render_mini_row(r, idx, name_col, score_fmt[idx], base_col, is_pegawai))
         return html + "</div>"
+
+    def render_mini_row(r, idx, name_col, score_str, base_col, is_pegawai):
+        name = r[name_col]
+        val_html = f"<span style='color:var(--f1-dark); font-weight:900; font-size:1.05rem;'>{score_str}</span>"
+        
+        # Styling untuk Peringkat (1, 2, 3, dan seterusnya)
+        rank_num = r.get('rank_current', idx + 1)
+        if rank_num == 1: rank_cls, rank_style = "top1", ""
+        elif rank_num == 2: rank_cls, rank_style = "top2", ""
+        elif rank_num == 3: rank_cls, rank_style = "top3", ""
+        else: rank_cls, rank_style = "", "background: #F8FAFC; color: #475569; border: 1px solid #CBD5E1;"
+        
+        # Area Logic & Penentuan Teks Badge
+        area_code = str(r.get('area', '')).strip().upper()
+        bg_col, txt_col = get_f1_style_global(area_code)
+        area_name_str = get_area_name(area_code)
+        
+        if is_pegawai:
+            unit_name = str(r.get('unit', '-')).strip()
+            badge_text = f"{unit_name} — {area_name_str}"
+        else:
+            badge_text = f"{area_name_str}"
+        
+        # Hitung Status Perubahan
+        change_html = get_rank_change_html(r.get('rank_change', 0), r.get(base_col, 0))
+        
+        html = f"<div class='row-card' style='padding: 8px 12px; margin-bottom: 6px;'>"
+        
+        # Kolom Kiri: Rank & Nama (Flexbox dengan batasan overflow agar teks panjang tidak merusak layout)
+        html += f"<div style='display:flex; align-items:center; gap:12px; flex: 1; min-width: 0;'>"
+        html += f"<div class='rank-badge {rank_cls}' style='margin:0; {rank_style}; flex-shrink: 0;'>{int(rank_num)}</div>"
+        html += f"<div class='row-meta' style='min-width: 0; overflow: hidden;'>"
+        html += f"<div class='unit' style='font-weight:700; color:var(--f1-dark); font-size:0.9rem; white-space:nowrap; overflow:hidden; text-overflow:ellipsis;'>{name}</div>"
+        html += f"<div style='background-color:{bg_col}; color:{txt_col}; padding:2px 6px; border-radius:4px; font-size:0.65rem; font-weight:800; display:inline-block; margin-top:2px; border:1px solid #E2E8F0; letter-spacing:0.5px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis; max-width:100%;'>{badge_text.upper()}</div>"
+        html += f"</div></div>"
+        
+        # Kolom Kanan: Skor & Indikator Perubahan Posisi
+        html += f"<div class='row-right' style='display:flex; align-items:center; gap:16px; justify-content:flex-end; flex-shrink: 0;'>"
+        html += f"<div style='text-align:right;'>{val_html}</div>"
+        html += f"<div style='width: 40px; text-align:center;'>{change_html}</div>"
+        html += f"</div></div>"
+        return html
     
+    dashboard = get_dashboard_summary()
+    version = get_data_version()
+    movers, nama_map = load_period_movers(version), load_nama_map(version)
     for kat in kats:
         st.markdown(f"<h3 style='color: var(--f1-red); margin-top: 40px; border-bottom: 2px solid var(--border); padding-bottom: 12px; margin-bottom: 20px;'>📊 KATEGORI {kat}</h3>", unsafe_allow_html=True)
         
-        # Ambil seluruh data terlebih dahulu untuk kalkulasi rank global
-        df_c = get_cabang_leaderboard(kat)
-        df_p = get_pegawai("ALL", kat)
+        # Top 10 sudah disiapkan per versi data (rank_current/base/change dari snapshot)
+        top_c = dashboard[kat]["top_cabang"]
+        top_p = dashboard[kat]["top_pegawai"]
         
         fmt_fn_p = KAT_CONFIG[kat]["fmt"]
         fmt_fn_c = fmt_num if kat == "TRANSAKSI" else KAT_CONFIG[kat]["fmt"]
         
-        # --- KALKULASI RANKING CABANG ---
-        if not df_c.empty:
-            df_c['rank_current'] = df_c['total_balance'].rank(method='min', ascending=False).astype(int)
-            df_c['rank_base'] = df_c['total_balance_base'].rank(method='min', ascending=False).astype(int)
-            df_c['rank_change'] = df_c['rank_base'] - df_c['rank_current']
-            
-        # --- KALKULASI RANKING PEGAWAI ---
-        if not df_p.empty:
-            df_p['rank_current'] = df_p['score_utama'].rank(method='min', ascending=False).astype(int)
-            df_p['rank_base'] = df_p['score_utama_base'].rank(method='min', ascending=False).astype(int)
-            df_p['rank_change'] = df_p['rank_base'] - df_p['rank_current']
-        
-        # Potong menjadi Top 10 setelah kalkulasi selesai
-        top_c = df_c.head(10) if not df_c.empty else df_c
-        top_p = df_p.head(10) if not df_p.empty else df_p
-        
         c1, c2 = st.columns(2)
         # Perhatikan tambahan parameter is_pegawai=False/True di bawah ini
-        with c1: st.markdown(render_mini_list(f"Top 10 Cabang", top_c, "unit", "total_balance", "total_balance_base", fmt_fn_c, is_pegawai=False), unsafe_allow_html=True)
-        with c2: st.markdown(render_mini_list(f"Top 10 Pegawai", top_p, "nama", "score_utama", "score_utama_base", fmt_fn_p, is_pegawai=True), unsafe_allow_html=True)
+        with c1: st.markdown(render_mini_list(f"Top 10 Cabang", top_c, "unit", "total_balance", "total_balance_base", fmt_fn_c, is_pegawai=False, kategori=kat), unsafe_allow_html=True)
+        with c2: st.markdown(render_mini_list(f"Top 10 Pegawai", top_p, "nama", "score_utama", "score_utama_base", fmt_fn_p, is_pegawai=True, kategori=kat), unsafe_allow_html=True)
+
+        # Perubahan harian & mingguan dari riwayat snapshot per upload (bukan terhadap baseline)
+        for col, label in zip(st.columns(2), ("Harian", "Mingguan")):
+            df_m = movers[kat, label]
+            with col:
+                st.markdown(f"##### 🚀 Naik Peringkat Terbanyak ({label})")
+                if df_m.empty:
+                    st.caption("Belum ada upload Data Berjalan pembanding, atau tidak ada pegawai yang naik peringkat.")
+                    continue
+                st.dataframe(pd.DataFrame({
+                    "NAMA": df_m["entity_id"].map(nama_map).fillna(df_m["entity_id"]),
+                    "RANK": "#" + df_m["rank_current"].astype(str),
+                    "CHG": "▲ " + df_m["rank_change"].astype("int64").astype(str),
+                    KAT_CONFIG[kat]["score_label"].upper(): growth_text_series(df_m["score"], df_m["score_old"], fmt_fn_p),
+                }), use_container_width=True, hide_index=True)
 
 
 # --- View: CABANG LEADERBOARD (TABEL) ---
@@ -963,12 +917,6 @@ elif st.session_state.view == "cabang" and not st.session_state.show_update_pane
     st.markdown(f"<h2 style='margin-bottom:24px;'>🏢 Leaderboard Cabang <span style='color:var(--text-light); font-weight:400;'>/ {kategori_aktif}</span></h2>", unsafe_allow_html=True)
     df = get_cabang_leaderboard(kategori_aktif)
     
-    # 1. Kalkulasi Rank Change Cabang
-    if not df.empty:
-        df['rank_current'] = df['total_balance'].rank(method='min', ascending=False).fillna(0).astype(int)
-        df['rank_base'] = df['total_balance_base'].rank(method='min', ascending=False).fillna(0).astype(int)
-        df['rank_change'] = df['rank_base'] - df['rank_current']
-    
     area_options = ["All Area"] + sorted(df['area'].dropna().unique())
     kelas_options = ["All Kelas"] + sorted(df['kelas_cabang'].dropna().unique())
 
@@ -988,49 +936,23 @@ elif st.session_state.view == "cabang" and not st.session_state.show_update_pane
         is_ascending = (sort_order_c == "Terendah ➔ Tertinggi")
         df = df.sort_values(by=sort_options_c[sort_by_c], ascending=is_ascending)
 
-# Render Header
-    header_html = f"""
-    <div class="table-header">
-        <div class="col-rank" style="color:var(--text-light); text-transform:uppercase;">RANK</div>
-        <div class="col-chg" style="color:var(--text-light); text-transform:uppercase;">CHG</div>
-        <div class="col-id" style="color:var(--text-light); text-transform:uppercase;">KODE</div>
-        <div class="col-name" style="color:var(--text-light); text-transform:uppercase;">NAMA CABANG</div>
-        <div class="col-score" style="color:var(--text-light); text-transform:uppercase;">{label_utama}</div>
-        <div class="col-growth" style="color:var(--text-light); text-transform:uppercase;">GROWTH</div>
-        <div class="col-score" style="color:var(--text-light); text-transform:uppercase;">{label_kedua}</div>
-        <div class="col-growth" style="color:var(--text-light); text-transform:uppercase;">GROWTH</div>
-    </div>
-    """
-    c_head, c_btn_head = st.columns([8.5, 1.5])
-    with c_head: st.markdown(header_html, unsafe_allow_html=True)
-    with c_btn_head: st.markdown("<div style='font-size:0.75rem; font-weight:800; color:var(--text-light); text-transform:uppercase; text-align:center; margin-top:28px;'>AKSI</div>", unsafe_allow_html=True)
-
+    # Render Tabel Cabang (satu elemen; klik baris -> ?kode=<kode_cabang>)
     if df.empty:
         st.info("Tidak ada data cabang sesuai filter.")
     else:
-        for idx, (_, r) in enumerate(df.iterrows(), start=1):
-            bg_col, txt_col = get_f1_style_global(r.get('area', ''))
-            change_badge = get_table_rank_change_html(r.get('rank_change', 0), r.get('total_balance_base', 0))
-            
-            # Render Baris Data Cabang
-            row_html = f"""
-            <div class="table-row" style="background-color:{bg_col};">
-                <div class="col-rank" style="color:{txt_col};">#{idx}</div>
-                <div class="col-chg">{change_badge}</div>
-                <div class="col-id" style="color:{txt_col};">{r['kode_cabang']}</div>
-                <div class="col-name" style="color:{txt_col};">{r.get('unit','-')}</div>
-                <div class="col-score" style="color:{txt_col};">{fmt_fungsi(r['total_balance'])}</div>
-                <div class="col-growth">{fmt_growth(r['total_balance'], r['total_balance_base'], fmt_fungsi)}</div>
-                <div class="col-score" style="color:{txt_col};">{fmt_num(r['total_cif'])}</div>
-                <div class="col-growth">{fmt_growth(r['total_cif'], r['total_cif_base'], fmt_num)}</div>
-            </div>
-            """
-            
-            c_data, c_btn = st.columns([8.5, 1.5], vertical_alignment="center")
-            with c_data: st.markdown(row_html, unsafe_allow_html=True)
-            with c_btn:
-                if st.button("Detail", key=f"btn_cb_{r['kode_cabang']}", use_container_width=True):
-                    st.session_state.view = "pegawai"; st.session_state.kode = r['kode_cabang']; st.rerun()
+        df = df.reset_index(drop=True)
+        df_show = pd.DataFrame({
+            "RANK": [f"#{i}" for i in range(1, len(df) + 1)],
+            "CHG": rank_change_text_series(df['rank_change'], df['total_balance_base']),
+            "KODE": df['kode_cabang'],
+            "NAMA CABANG": df['unit'].fillna('-'),
+            label_utama.upper(): fmt_series(df['total_balance'], fmt_fungsi),
+            f"GROWTH {label_utama.upper()}": growth_text_series(df['total_balance'], df['total_balance_base'], fmt_fungsi),
+            label_kedua.upper(): fmt_num_series(df['total_cif']),
+            f"GROWTH {label_kedua.upper()}": growth_text_series(df['total_cif'], df['total_cif_base'], fmt_num),
+        })
+        st.caption("Klik baris cabang untuk melihat daftar pegawainya.")
+        render_nav_table(df_show, df['area'].tolist(), df['kode_cabang'].tolist(), "kode", key=f"tbl_cb_{kategori_aktif}_{area_filter}_{kelas_filter}")
 
 # --- View: PEGAWAI LEADERBOARD (TABEL) ---
 elif st.session_state.view == "pegawai" and not st.session_state.show_update_panel:
@@ -1055,20 +977,13 @@ elif st.session_state.view == "pegawai" and not st.session_state.show_update_pan
     with colA: 
         chosen = st.selectbox("Pilih Area/Cabang:", options=options, index=default_index)
         
-        # Eksekusi penentuan kode lebih awal agar bisa langsung tarik data dfp_all
+        # Eksekusi penentuan kode lebih awal agar filter posisi & halaman ikut scope terpilih
         if chosen == "ALL": st.session_state.kode = "ALL"
         elif " — " in chosen: st.session_state.kode = chosen.split(" — ",1)[0].strip()
         else: st.session_state.kode = chosen
 
-    # Tarik data sementara berdasarkan Cabang/Area untuk mengekstrak list Posisi
-    dfp_all_temp = get_pegawai(st.session_state.kode, kategori_aktif)
-
     # Buat list dropdown posisi dinamis (hanya munculkan posisi yang ada di cabang/area terpilih)
-    if not dfp_all_temp.empty and 'posisi' in dfp_all_temp.columns:
-        posisi_unik = sorted([p for p in dfp_all_temp['posisi'].dropna().unique() if str(p).strip() != ""])
-        list_posisi = ["Semua Posisi"] + posisi_unik
-    else:
-        list_posisi = ["Semua Posisi"]
+    list_posisi = ["Semua Posisi"] + get_posisi_list(st.session_state.kode, kategori_aktif)
 
     with colPos: 
         posisi_terpilih = st.selectbox("Filter Posisi:", options=list_posisi)
@@ -1080,29 +995,29 @@ elif st.session_state.view == "pegawai" and not st.session_state.show_update_pan
     with colC: 
         sort_order_p = st.selectbox("Urutan", ["Tertinggi ➔ Terendah", "Terendah ➔ Tertinggi"])
 
-    # Terapkan filter posisi yang dipilih ke dataframe utama
-    dfp_all = dfp_all_temp.copy()
-    if posisi_terpilih != "Semua Posisi":
-        dfp_all = dfp_all[dfp_all['posisi'] == posisi_terpilih]
     # ------------------------------------------------------
 
-    dfp_all = get_pegawai(st.session_state.kode, kategori_aktif)
-
-    # Kalkulasi Rank Change Pegawai
-    if not dfp_all.empty:
-        dfp_all['rank_current'] = dfp_all['score_utama'].rank(method='min', ascending=False).fillna(0).astype(int)
-        dfp_all['rank_base'] = dfp_all['score_utama_base'].rank(method='min', ascending=False).fillna(0).astype(int)
-        dfp_all['rank_change'] = dfp_all['rank_base'] - dfp_all['rank_current']
-
-        total_pegawai = len(dfp_all)
+    # Filter posisi, sort & paging dikerjakan SQLite; yang ditarik hanya satu halaman + ringkasan
+    page_size = 50
+    is_ascending_p = (sort_order_p == "Terendah ➔ Tertinggi")
+    posisi_param = None if posisi_terpilih == "Semua Posisi" else posisi_terpilih
+    dfp_page, summary = get_pegawai_page(st.session_state.kode, kategori_aktif, posisi_param, sort_options_p[sort_by_p],
+                                         is_ascending_p, st.session_state.page_num, page_size)
+    total_pegawai = summary["total"]
+    total_pages = max(1, int(math.ceil(total_pegawai / page_size)))
+    if total_pegawai and st.session_state.page_num > total_pages:
+        st.session_state.page_num = total_pages
+        st.rerun()
+
+    if total_pegawai:
         if kategori_aktif == "TRANSAKSI":
-            val_akumulasi, label_akumulasi, fmt_akumulasi = dfp_all["total_poin_transaksi"].sum(), "Total Poin", fmt_num
-            avg_balance = dfp_all["total_poin_transaksi"].mean()
+            val_akumulasi, label_akumulasi, fmt_akumulasi = summary["sum_sec"], "Total Poin", fmt_num
+            avg_balance = summary["avg_sec"]
         else:
-            val_akumulasi, label_akumulasi, fmt_akumulasi = dfp_all["score_utama"].sum(), f"Akumulasi {label_utama}", fmt_fungsi
-            avg_balance = dfp_all["score_utama"].mean()
+            val_akumulasi, label_akumulasi, fmt_akumulasi = summary["sum_score"], f"Akumulasi {label_utama}", fmt_fungsi
+            avg_balance = summary["avg_score"]
             
-        total_cif = dfp_all["score_kedua"].sum()
+        total_cif = summary["sum_sec"]
         
         st.markdown(f"""
         <div class="stat-container" style="margin-bottom:32px;">
@@ -1113,58 +1028,22 @@ elif st.session_state.view == "pegawai" and not st.session_state.show_update_pan
         </div>
         """, unsafe_allow_html=True)
 
-        is_ascending_p = (sort_order_p == "Terendah ➔ Tertinggi")
-        dfp_all = dfp_all.sort_values(by=sort_options_p[sort_by_p], ascending=is_ascending_p)
-
-        # Render Header Pegawai
-        header_html = f"""
-        <div class="table-header">
-            <div class="col-rank" style="color:var(--text-light); text-transform:uppercase;">RANK</div>
-            <div class="col-chg" style="color:var(--text-light); text-transform:uppercase;">CHG</div>
-            <div class="col-id" style="color:var(--text-light); text-transform:uppercase;">NIP</div>
-            <div class="col-name" style="color:var(--text-light); text-transform:uppercase;">NAMA PEGAWAI</div>
-            <div class="col-pos" style="color:var(--text-light); text-transform:uppercase;">POSISI</div>
-            <div class="col-area" style="color:var(--text-light); text-transform:uppercase;">CABANG-AREA</div>
-            <div class="col-score" style="color:var(--text-light); text-transform:uppercase;">{label_utama}</div>
-            <div class="col-growth" style="color:var(--text-light); text-transform:uppercase;">GROWTH</div>
-        </div>
-        """
-        c_head, c_btn_head = st.columns([8.5, 1.5])
-        with c_head: st.markdown(header_html, unsafe_allow_html=True)
-        with c_btn_head: st.markdown("<div style='font-size:0.75rem; font-weight:800; color:var(--text-light); text-transform:uppercase; text-align:center; margin-top:10px;'>AKSI</div>", unsafe_allow_html=True)
-
-        page_size = 50
-        total_pages = max(1, int(math.ceil(total_pegawai / page_size)))
         start = (st.session_state.page_num - 1) * page_size
-        dfp_page = dfp_all.iloc[start:start+page_size]
 
-        for idx, (_, r) in enumerate(dfp_page.iterrows(), start=start+1):
-            bg_col, txt_col = get_f1_style_global(r.get('area', ''))
-            change_badge = get_table_rank_change_html(r.get('rank_change', 0), r.get('score_utama_base', 0))
-            
-            # Format Cabang - Area
-            area_str = get_area_name_global(r.get('area', ''))
-            cabang_area_str = f"{r.get('unit', '-')} - AREA {area_str}"
-            
-            # Render Baris Data Pegawai
-            row_html = f"""
-            <div class="table-row" style="background-color:{bg_col};">
-                <div class="col-rank" style="color:{txt_col};">#{idx}</div>
-                <div class="col-chg">{change_badge}</div>
-                <div class="col-id" style="color:{txt_col};">{r['nip']}</div>
-                <div class="col-name" style="color:{txt_col};">{r.get('nama','-')}</div>
-                <div class="col-pos" style="color:{txt_col};">{r.get('posisi','-')}</div>
-                <div class="col-area" style="color:{txt_col};">{cabang_area_str}</div>
-                <div class="col-score" style="color:{txt_col};">{fmt_fungsi(r['score_utama'])}</div>
-                <div class="col-growth">{fmt_growth(r['score_utama'], r['score_utama_base'], fmt_fungsi)}</div>
-            </div>
-            """
-            
-            c_data, c_btn = st.columns([8.5, 1.5], vertical_alignment="center")
-            with c_data: st.markdown(row_html, unsafe_allow_html=True)
-            with c_btn:
-                if st.button("Detail", key=f"btn_pg_{r['nip']}", use_container_width=True):
-                    st.session_state.view = "detail_pegawai"; st.session_state.detail_nip = r['nip']; st.rerun()
+        # Render Tabel Pegawai (satu elemen; klik baris -> ?nip=<nip>)
+        df_show = pd.DataFrame({
+            "RANK": [f"#{i}" for i in range(start + 1, start + 1 + len(dfp_page))],
+            "CHG": rank_change_text_series(dfp_page['rank_change'], dfp_page['score_utama_base']),
+            "NIP": dfp_page['nip'],
+            "NAMA PEGAWAI": dfp_page['nama'].fillna('-'),
+            "POSISI": dfp_page['posisi'].fillna('-'),
+            "CABANG-AREA": [f"{u} - AREA {get_area_name_global(a)}" for u, a in zip(dfp_page['unit'].fillna('-'), dfp_page['area'])],
+            label_utama.upper(): fmt_series(dfp_page['score_utama'], fmt_fungsi),
+            "GROWTH": growth_text_series(dfp_page['score_utama'], dfp_page['score_utama_base'], fmt_fungsi),
+        })
+        st.caption("Klik baris pegawai untuk membuka profil.")
+        render_nav_table(df_show, dfp_page['area'].tolist(), dfp_page['nip'].tolist(), "nip",
+                         key=f"tbl_pg_{kategori_aktif}_{st.session_state.kode}_{posisi_terpilih}_{sort_by_p}_{sort_order_p}_{st.session_state.page_num}")
 
         st.markdown("<div style='margin-top: 24px;'></div>", unsafe_allow_html=True)
         b1, b2, b3 = st.columns([1,2,1])
@@ -1184,139 +1063,90 @@ if st.session_state.show_update_panel and st.session_state.get("is_admin", False
     st.markdown("<hr style='border-color:var(--border)'>", unsafe_allow_html=True)
     with st.expander("⚙️ Admin Panel (Uploader & Setting)", expanded=True):
         st.markdown("#### 📊 Rekapitulasi Pengunjung")
-        conn = sqlite3.connect(DB_PATH)
-        df_summary = pd.read_sql_query("SELECT nip AS NIP, nama AS Nama, COUNT(*) AS 'Total Kunjungan', MAX(waktu) AS 'Kunjungan Terakhir' FROM access_log GROUP BY nip, nama ORDER BY 'Total Kunjungan' DESC", conn)
+        df_summary = get_db().read_df("SELECT nip AS NIP, nama AS Nama, visit_count AS 'Total Kunjungan', last_visit AS 'Kunjungan Terakhir' FROM visit_stats ORDER BY visit_count DESC")
         st.dataframe(df_summary, use_container_width=True, hide_index=True)
-        conn.close()
+        q_stats = get_access_log_queue().stats()
+        st.caption(f"Antrian log: {q_stats['depth']} baris menunggu · {q_stats['commits']} commit · latensi commit rata-rata {q_stats['avg_commit_ms']} ms (maks {q_stats['max_commit_ms']} ms)")
+        f_stats = get_fragment_cache().stats()
+        per_view = ", ".join(f"{v}: {n}" for v, n in sorted(f_stats['per_view'].items())) or "-"
+        st.caption(f"Cache fragmen HTML (versi data {f_stats['version']}): hit-rate {f_stats['hit_rate']}% · {f_stats['hits']} hit / {f_stats['misses']} miss · {f_stats['entries']} fragmen ({per_view}) · {f_stats['evictions']} dibuang")
+        with get_db().read() as conn: h_bytes, h_uploads = gmm_history.storage_bytes(conn)
+        st.caption(f"Riwayat snapshot: {h_uploads} upload Data Berjalan · {h_bytes / 1024 / 1024:,.1f} MB")
         st.markdown("<hr style='border-color:var(--border)'>", unsafe_allow_html=True)
 
         st.markdown("#### 📤 Upload Data Master")
         upload_type = st.radio("Pilih Jenis Data yang Di-upload:", options=["Data Berjalan (Update Current Data)", "Data Baseline (Posisi 31 Maret - Base Growth)"], help="Pilih Baseline jika Anda ingin mengatur titik awal perhitungan persentase kenaikan (Growth).")
         upload_file = st.file_uploader("Upload Excel (.xlsx/.xls) - GMM LIVIN, GMM MERCHANT, GMM TRANSAKSI", type=['xlsx','xls'])
+        mode_streaming = st.checkbox("Mode Streaming (hemat memori, khusus .xlsx)", value=True, help="Baca hanya 3 sheet GMM & kolom yang dipakai, per potongan baris. Disarankan untuk file besar.")
+        mode_paralel = st.checkbox("Parse Paralel (1 proses per sheet, khusus streaming)", value=False, help="Sheet LIVIN, MERCHANT & TRANSAKSI dibaca di proses terpisah lalu digabung. Hanya berguna di server multi-core; tiap worker mengimpor ulang modul (spawn), jadi di server 1 core mode serial lebih cepat.")
+        mode_delta = st.checkbox("Import Delta (hanya tulis pegawai yang berubah)", value=True, help="Khusus Data Berjalan: baris dibandingkan lewat hash, hanya NIP baru/berubah/hilang yang ditulis. Jika tidak ada perubahan, cache tetap dipakai.")
         
+        get_job_runner()
+        with get_db().read() as conn: jobs = gmm_jobs.recent_jobs(conn, 5)
+        active_jobs = [j for j in jobs if j["status"] in gmm_jobs.JOB_STATUS_ACTIVE]
+
         if upload_file:
-            file_bytes = io.BytesIO(upload_file.getvalue())
-            xls = pd.read_excel(file_bytes, sheet_name=None, dtype=str)
-            st.success(f"Membaca {len(xls)} sheet: {', '.join(xls.keys())}")
+            is_streaming = mode_streaming and upload_file.name.lower().endswith(".xlsx")
+            # Daftar sheet dibaca sekali per file: selama job berjalan halaman ini rerun tiap JOB_POLL_SECONDS
+            cached = st.session_state.get("upload_sheets")
+            if cached is None or cached[0] != upload_file.file_id:
+                if upload_file.name.lower().endswith(".xlsx"):
+                    sheet_names = gmm_import.list_sheets(upload_file)
+                else:
+                    sheet_names = pd.ExcelFile(upload_file).sheet_names
+                st.session_state.upload_sheets = cached = (upload_file.file_id, sheet_names)
+            sheet_names = cached[1]
+            st.success(f"Membaca {len(sheet_names)} sheet: {', '.join(sheet_names)}")
             
-            if st.button("Mulai Proses Data", type="primary"):
-                conn = sqlite3.connect(DB_PATH, timeout=30.0)
-                conn.execute("PRAGMA journal_mode=WAL;")
-                cur = conn.cursor()
-                
-                try:
-                    master_data = {}
-                    def find_col(df, aliases):
-                        lc_cols = [str(c).lower().strip() for c in df.columns]
-                        for a in aliases:
-                            if a.lower() in lc_cols: return df.columns[lc_cols.index(a.lower())]
-                        return None
-                    
-                    def safe_get_num(row, col): return normalize_val(row[col]) if col is not None else 0
-
-                    if "GMM LIVIN" in xls:
-                        df_l = xls["GMM LIVIN"]
-                        c_nip, c_nama, c_kode = find_col(df_l, ['nip']), find_col(df_l, ['nama','employee name']), find_col(df_l, ['kode cabang','kode_cabang'])
-                        c_unit, c_area, c_kelas, c_posisi = find_col(df_l, ['nama cabang', 'nama_cabang', 'cabang', 'unit']), find_col(df_l, ['area', 'wilayah']), find_col(df_l, ['kelas cabang', 'kelas']), find_col(df_l, ['posisi', 'unit kerja'])
-                        c_cif_akuisisi, c_cif_setor, c_end_balance, c_rata_rata = find_col(df_l, ['cif akuisisi','cif']), find_col(df_l, ['cif setor']), find_col(df_l, ['end_balance','end balance']), find_col(df_l, ['rata-rata','rata rata'])
-                        c_cif_trx, c_frek_cif = find_col(df_l, ['cif_sudah_transaksi','cif sudah transaksi']), find_col(df_l, ['frek dari cif akuisisi'])
-
-                        if c_nip and c_nama:
-                            for _, r in df_l.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                master_data[nip] = {
-                                    'nip': nip, 'nama': str(r[c_nama]).strip(),
-                                    'kode_cabang': str(r[c_kode]).strip() if c_kode else '', 'unit': str(r[c_unit]).strip() if c_unit else '',
-                                    'area': str(r[c_area]).strip() if c_area else '', 'kelas_cabang': str(r[c_kelas]).strip() if c_kelas else '',
-                                    'posisi': str(r[c_posisi]).strip() if c_posisi else '',
-                                    'cif_akuisisi': safe_get_num(r, c_cif_akuisisi), 'cif_setor': safe_get_num(r, c_cif_setor),
-                                    'end_balance': safe_get_num(r, c_end_balance), 'rata_rata': safe_get_num(r, c_rata_rata),
-                                    'cif_sudah_transaksi': safe_get_num(r, c_cif_trx), 'frek_dari_cif_akuisisi': safe_get_num(r, c_frek_cif),
-                                }
-
-                    if "GMM MERCHANT" in xls:
-                        df_m = xls["GMM MERCHANT"]
-                        c_nip = find_col(df_m, ['nip'])
-                        if c_nip:
-                            for _, r in df_m.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data: master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_m, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_referral_livin'] = normalize_val(r[find_col(df_m, ['total referral livin'])])
-                                master_data[nip]['total_referral_edc'] = normalize_val(r[find_col(df_m, ['total referral edc'])])
-
-                    if "GMM TRANSAKSI" in xls:
-                        df_t = xls["GMM TRANSAKSI"]
-                        c_nip = find_col(df_t, ['nip'])
-                        if c_nip:
-                            for _, r in df_t.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data: master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_t, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_poin_transaksi'] = normalize_val(r[find_col(df_t, ['total poin transaksi'])])
-                                master_data[nip]['poin_on_us'] = normalize_val(r[find_col(df_t, ['poin on us'])])
-                                master_data[nip]['poin_off_us'] = normalize_val(r[find_col(df_t, ['poin off us'])])
-                                master_data[nip]['frek_on_us'] = normalize_val(r[find_col(df_t, ['frek on us'])])
-                                master_data[nip]['frek_off_us'] = normalize_val(r[find_col(df_t, ['frek off us'])])
-                                master_data[nip]['pct_on_us'] = normalize_val(r[find_col(df_t, ['pct on us'])])
-
-                    inserted = 0
-                    is_base = "Baseline" in upload_type
-                    if not is_base: cur.execute("UPDATE pegawai SET is_active = 0")
-                    
-                    for nip, d in master_data.items():
-                        d.setdefault('kode_cabang', ''); d.setdefault('unit', ''); d.setdefault('area', ''); d.setdefault('kelas_cabang', ''); d.setdefault('posisi', '')
-                        
-                        if d['kode_cabang']:
-                            cur.execute("""
-                                INSERT INTO cabang (kode_cabang, unit, area, kelas_cabang) VALUES (?, ?, ?, ?)
-                                ON CONFLICT(kode_cabang) DO UPDATE SET unit=excluded.unit, area=excluded.area, kelas_cabang=excluded.kelas_cabang
-                            """, (d['kode_cabang'], d.get('unit'), d.get('area'), d.get('kelas_cabang')))
-                        
-                        if is_base:
-                            cur.execute("""
-                                INSERT INTO pegawai (nip, nama, kode_cabang, unit, area, posisi, end_balance_base, cif_akuisisi_base, cif_setor_base, cif_sudah_transaksi_base, rata_rata_base, frek_dari_cif_akuisisi_base, total_referral_livin_base, total_referral_edc_base, total_poin_transaksi_base, poin_on_us_base, poin_off_us_base, frek_on_us_base, frek_off_us_base, pct_on_us_base)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                ON CONFLICT(nip) DO UPDATE SET
-                                    nama=excluded.nama, kode_cabang=excluded.kode_cabang, unit=excluded.unit, area=excluded.area, posisi=excluded.posisi,
-                                    end_balance_base=excluded.end_balance_base, cif_akuisisi_base=excluded.cif_akuisisi_base, cif_setor_base=excluded.cif_setor_base, 
-                                    cif_sudah_transaksi_base=excluded.cif_sudah_transaksi_base, rata_rata_base=excluded.rata_rata_base, frek_dari_cif_akuisisi_base=excluded.frek_dari_cif_akuisisi_base,
-                                    total_referral_livin_base=excluded.total_referral_livin_base, total_referral_edc_base=excluded.total_referral_edc_base, 
-                                    total_poin_transaksi_base=excluded.total_poin_transaksi_base, poin_on_us_base=excluded.poin_on_us_base, poin_off_us_base=excluded.poin_off_us_base, 
-                                    frek_on_us_base=excluded.frek_on_us_base, frek_off_us_base=excluded.pct_on_us_base
-                            """, (d['nip'], d['nama'], d['kode_cabang'], d.get('unit'), d.get('area'), d.get('posisi'), 
-                                  d.get('end_balance',0), d.get('cif_akuisisi',0), d.get('cif_setor',0), d.get('cif_sudah_transaksi',0), d.get('rata_rata',0), d.get('frek_dari_cif_akuisisi',0),
-                                  d.get('total_referral_livin',0), d.get('total_referral_edc',0), d.get('total_poin_transaksi',0), d.get('poin_on_us',0), d.get('poin_off_us',0), d.get('frek_on_us',0), d.get('frek_off_us',0), d.get('pct_on_us',0)))
-                        else:
-                            cur.execute("""
-                                INSERT INTO pegawai (nip, nama, kode_cabang, unit, area, posisi, end_balance, cif_akuisisi, cif_setor, cif_sudah_transaksi, rata_rata, frek_dari_cif_akuisisi, total_referral_livin, total_referral_edc, total_poin_transaksi, poin_on_us, poin_off_us, frek_on_us, frek_off_us, pct_on_us, is_active)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-                                ON CONFLICT(nip) DO UPDATE SET
-                                    nama=excluded.nama, kode_cabang=excluded.kode_cabang, unit=excluded.unit, area=excluded.area, posisi=excluded.posisi,
-                                    end_balance=excluded.end_balance, cif_akuisisi=excluded.cif_akuisisi, cif_setor=excluded.cif_setor, 
-                                    cif_sudah_transaksi=excluded.cif_sudah_transaksi, rata_rata=excluded.rata_rata, frek_dari_cif_akuisisi=excluded.frek_dari_cif_akuisisi,
-                                    total_referral_livin=excluded.total_referral_livin, total_referral_edc=excluded.total_referral_edc, 
-                                    total_poin_transaksi=excluded.total_poin_transaksi, poin_on_us=excluded.poin_on_us, poin_off_us=excluded.poin_off_us, 
-                                    frek_on_us=excluded.frek_on_us, frek_off_us=excluded.frek_off_us, pct_on_us=excluded.pct_on_us, is_active=1
-                            """, (d['nip'], d['nama'], d['kode_cabang'], d.get('unit'), d.get('area'), d.get('posisi'), 
-                                  d.get('end_balance',0), d.get('cif_akuisisi',0), d.get('cif_setor',0), d.get('cif_sudah_transaksi',0), d.get('rata_rata',0), d.get('frek_dari_cif_akuisisi',0),
-                                  d.get('total_referral_livin',0), d.get('total_referral_edc',0), d.get('total_poin_transaksi',0), d.get('poin_on_us',0), d.get('poin_off_us',0), d.get('frek_on_us',0), d.get('frek_off_us',0), d.get('pct_on_us',0)))
-                        inserted += 1
-
-                    conn.commit()
-                    st.success(f"Selesai! Berhasil update {inserted} baris {upload_type.split(' ')[1]}.")
-                except Exception as e:
-                    import traceback
-                    st.error(f"Pesan Error: {e}"); st.code(traceback.format_exc(), language="python")
-                finally: conn.close()
+            if active_jobs:
+                st.info("Masih ada job import yang berjalan; tunggu sampai selesai sebelum memproses file berikutnya.")
+            elif st.button("Mulai Proses Data", type="primary"):
+                # File disimpan ke disk & diproses worker; sesi ini hanya mem-poll tabel jobs
+                get_job_runner().submit("import_master", upload_file.name, upload_file.getvalue(), {
+                    "label": upload_type.split(' ')[1], "is_base": "Baseline" in upload_type,
+                    "streaming": is_streaming, "parallel": mode_paralel, "delta": mode_delta,
+                })
+                st.rerun()
+
+        st.markdown("##### 🗂️ Status Job Import")
+        for job in reversed(active_jobs):
+            st.progress(float(job["progress"] or 0.0), text=f"Job #{job['id']} ({job['options'].get('label', '')}) · {job['stage']}")
+
+        last_job = next((j for j in jobs if j["status"] not in gmm_jobs.JOB_STATUS_ACTIVE), None)
+        if last_job is not None and last_job["status"] == "done":
+            result = last_job["result"]
+            st.success(f"Job #{last_job['id']} selesai {last_job['finished_at']}: berhasil update {result.get('inserted', 0)} baris {last_job['options'].get('label', '')}.")
+            if result.get("diff_counts"):
+                st.caption(" · ".join(f"{k}: {v:,}" for k, v in result["diff_counts"].items()))
+            st.markdown("##### ⏱️ Rincian Waktu Proses")
+            st.dataframe(gmm_import.format_timings(result.get("timings", {})), use_container_width=True, hide_index=True)
+            mode = "baca penuh"
+            if last_job["options"].get("streaming"):
+                mode = "streaming"
+                if last_job["options"].get("parallel"):
+                    mode = f"streaming paralel; RSS puncak worker per sheet {result.get('child_peak_mb', 0):,.1f} MB, tidak termasuk angka ini"
+            st.caption(f"Puncak RSS proses server: {result.get('peak_mb', 0):,.1f} MB ({mode})")
+        elif last_job is not None and last_job["status"] == "failed":
+            st.error(f"Job #{last_job['id']} gagal ({last_job['finished_at']}).")
+            st.code(last_job["error"], language="python")
+        if jobs:
+            st.dataframe(pd.DataFrame([{"Job": j["id"], "Status": j["status"], "Tahap": j["stage"], "Dibuat": j["created_at"],
+                                        "Selesai": j["finished_at"]} for j in jobs]), use_container_width=True, hide_index=True)
 
         if st.button("⚠️ Hapus Seluruh Database (Hard Reset)"):
-            conn = sqlite3.connect(DB_PATH)
-            conn.execute("DROP TABLE IF EXISTS pegawai")
-            conn.execute("DROP TABLE IF EXISTS cabang")
-            conn.commit(); conn.close()
-            st.cache_resource.clear() 
-            init_db()
+            with get_db().write() as conn:
+                conn.execute("DROP TABLE IF EXISTS pegawai")
+                conn.execute("DROP TABLE IF EXISTS cabang")
+                conn.execute("DROP TABLE IF EXISTS leaderboard_snapshot")
+                conn.execute("DROP TABLE IF EXISTS search_index")
+                conn.execute("DROP TABLE IF EXISTS snapshot_upload")
+                conn.execute("DROP TABLE IF EXISTS snapshot_column")
+                gmm_db.create_schema(conn)
+                gmm_db.bump_data_version(conn.cursor())
+            st.cache_data.clear() 
             st.success("Database berhasil dikosongkan. Halaman akan dimuat ulang...")
             import time; time.sleep(1); st.rerun()
+
+        # Poll status selama masih ada job berjalan (hanya sesi admin ini yang rerun)
+        if active_jobs:
+            time.sleep(JOB_POLL_SECONDS); st.rerun()
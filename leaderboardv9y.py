@@ -5,7 +5,10 @@ import streamlit as st
 import io
 import os
 import math
-import re
+import time
+
+import gmm_db
+import gmm_import
 
 # 1. WAJIB DI ATAS: Konfigurasi Page Streamlit untuk Mobile
 st.set_page_config(
@@ -109,7 +112,10 @@ def init_db():
         ("total_referral_edc", "REAL DEFAULT 0"),
         ("total_poin_transaksi", "REAL DEFAULT 0"),
         ("poin_on_us", "REAL DEFAULT 0"),
-        ("poin_off_us", "REAL DEFAULT 0")
+        ("poin_off_us", "REAL DEFAULT 0"),
+        ("frek_on_us", "REAL DEFAULT 0"),
+        ("frek_off_us", "REAL DEFAULT 0"),
+        ("pct_on_us", "REAL DEFAULT 0")
     ]
     cur.execute("PRAGMA table_info(pegawai)")
     existing_cols = [row[1] for row in cur.fetchall()]
@@ -118,6 +124,8 @@ def init_db():
         if col_name not in existing_cols:
             cur.execute(f"ALTER TABLE pegawai ADD COLUMN {col_name} {col_type}")
 
+    # DB_PATH dipakai bersama v9x: kolom base/valid, snapshot, indeks pencarian & versi data
+    gmm_db.create_schema(conn)
     conn.commit()
     conn.close()
 
@@ -176,12 +184,6 @@ def get_pegawai(kode, kategori="LIVIN"):
     conn.close()
     return df
 
-def normalize_val(x):
-    if pd.isna(x) or x is None: return 0
-    s = str(x).strip().replace(',', '.')
-    s = re.sub(r'[^\d\.-]', '', s)
-    try: return float(s)
-    except: return 0
 
 # ---------------------------
 # CSS Khusus Mobile & Desktop
@@ -321,106 +323,31 @@ if st.session_state.show_update_panel:
         upload_file = st.file_uploader("Upload Excel (.xlsx/.xls) - Berisi sheet GMM LIVIN, GMM MERCHANT, GMM TRANSAKSI", type=['xlsx','xls'])
         if upload_file:
             try:
+                t_read = time.perf_counter()
                 xls = pd.read_excel(upload_file, sheet_name=None, dtype=str)
+                durasi_baca = time.perf_counter() - t_read
                 st.success(f"Berhasil membaca {len(xls)} sheet: {', '.join(xls.keys())}")
                 
                 if st.button("Mulai Import Semua Sheet"):
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
-                    
-                    master_data = {}
+                    conn = sqlite3.connect(DB_PATH, timeout=15.0)
                     
-                    def find_col(df, aliases):
-                        lc_cols = [str(c).lower().strip() for c in df.columns]
-                        for a in aliases:
-                            if a.lower() in lc_cols: return df.columns[lc_cols.index(a.lower())]
-                        return None
-
-                    # 1. Sheet LIVIN
-                    if "GMM LIVIN" in xls:
-                        df_l = xls["GMM LIVIN"]
-                        c_nip = find_col(df_l, ['nip'])
-                        c_nama = find_col(df_l, ['nama','employee name'])
-                        c_kode = find_col(df_l, ['kode cabang','kode_cabang'])
-                        if c_nip and c_nama:
-                            for _, r in df_l.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                master_data[nip] = {
-                                    'nip': nip, 'nama': str(r[c_nama]).strip(),
-                                    'kode_cabang': str(r[c_kode]).strip() if c_kode else '',
-                                    'unit': str(r[find_col(df_l, ['nama cabang','unit'])]).strip() if find_col(df_l, ['nama cabang','unit']) else '',
-                                    'area': str(r[find_col(df_l, ['area','wilayah'])]).strip() if find_col(df_l, ['area','wilayah']) else '',
-                                    'kelas_cabang': str(r[find_col(df_l, ['kelas cabang','kelas'])]).strip() if find_col(df_l, ['kelas cabang','kelas']) else '',
-                                    'posisi': str(r[find_col(df_l, ['posisi','unit kerja'])]).strip() if find_col(df_l, ['posisi','unit kerja']) else '',
-                                    'cif_akuisisi': normalize_val(r[find_col(df_l, ['cif akuisisi','cif'])]),
-                                    'cif_setor': normalize_val(r[find_col(df_l, ['cif setor'])]),
-                                    'end_balance': normalize_val(r[find_col(df_l, ['end_balance','end balance'])]),
-                                    'rata_rata': normalize_val(r[find_col(df_l, ['rata-rata','rata rata'])]),
-                                    'cif_sudah_transaksi': normalize_val(r[find_col(df_l, ['cif_sudah_transaksi','cif sudah transaksi'])]),
-                                }
-
-                    # 2. Sheet MERCHANT
-                    if "GMM MERCHANT" in xls:
-                        df_m = xls["GMM MERCHANT"]
-                        c_nip = find_col(df_m, ['nip'])
-                        if c_nip:
-                            for _, r in df_m.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data:
-                                    master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_m, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_referral_livin'] = normalize_val(r[find_col(df_m, ['total referral livin'])])
-                                master_data[nip]['total_referral_edc'] = normalize_val(r[find_col(df_m, ['total referral edc'])])
-
-                    # 3. Sheet TRANSAKSI
-                    if "GMM TRANSAKSI" in xls:
-                        df_t = xls["GMM TRANSAKSI"]
-                        c_nip = find_col(df_t, ['nip'])
-                        if c_nip:
-                            for _, r in df_t.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data:
-                                    master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_t, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_poin_transaksi'] = normalize_val(r[find_col(df_t, ['total poin transaksi'])])
-                                master_data[nip]['poin_on_us'] = normalize_val(r[find_col(df_t, ['poin on us'])])
-                                master_data[nip]['poin_off_us'] = normalize_val(r[find_col(df_t, ['poin off us'])])
-
-                    inserted = 0
-                    for nip, d in master_data.items():
-                        d.setdefault('kode_cabang', ''); d.setdefault('unit', ''); d.setdefault('area', ''); d.setdefault('kelas_cabang', '')
-                        d.setdefault('end_balance', 0); d.setdefault('cif_akuisisi', 0); d.setdefault('cif_setor', 0)
-                        d.setdefault('cif_sudah_transaksi', 0); d.setdefault('rata_rata', 0)
-                        d.setdefault('total_referral_livin', 0); d.setdefault('total_referral_edc', 0)
-                        d.setdefault('total_poin_transaksi', 0); d.setdefault('poin_on_us', 0); d.setdefault('poin_off_us', 0)
-
-                        if d['kode_cabang']:
-                            cur.execute("INSERT OR IGNORE INTO cabang (kode_cabang, unit, area, kelas_cabang) VALUES (?, ?, ?, ?)",
-                                        (d['kode_cabang'], d.get('unit'), d.get('area'), d.get('kelas_cabang')))
-                        
-                        cur.execute("""
-                            INSERT OR REPLACE INTO pegawai 
-                            (nip, nama, kode_cabang, unit, area, posisi, end_balance, cif_akuisisi, cif_setor, cif_sudah_transaksi, rata_rata,
-                             total_referral_livin, total_referral_edc, total_poin_transaksi, poin_on_us, poin_off_us)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (d['nip'], d['nama'], d['kode_cabang'], d.get('unit'), d.get('area'), d.get('posisi',''), 
-                              d['end_balance'], d['cif_akuisisi'], d['cif_setor'], d['cif_sudah_transaksi'], d['rata_rata'],
-                              d['total_referral_livin'], d['total_referral_edc'], d['total_poin_transaksi'], d['poin_on_us'], d['poin_off_us']))
-                        inserted += 1
-
-                    conn.commit()
+                    timings = {"Baca Excel": durasi_baca}
+                    master = gmm_import.build_master_frame(xls, timings)
+
+                    # Jalur tulis yang sama dengan v9x: flag valid, snapshot leaderboard, indeks pencarian
+                    # & versi data ikut diperbarui sehingga v9x tidak menyajikan snapshot/cache lama
+                    inserted = gmm_db.bulk_load_master(conn, master, timings=timings)
                     conn.close()
                     st.success(f"Import selesai! Berhasil update {inserted} data pegawai gabungan.")
+                    st.markdown("##### ⏱️ Rincian Waktu Proses")
+                    st.dataframe(gmm_import.format_timings(timings), use_container_width=True, hide_index=True)
 
             except Exception as e:
                 st.error(f"Gagal memproses file: {e}")
 
         if st.button("⚠️ Hapus Seluruh Database"):
             conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute("DELETE FROM pegawai")
-            cur.execute("DELETE FROM cabang")
+            gmm_db.clear_master_data(conn.cursor())
             conn.commit()
             conn.close()
             st.success("Database berhasil dikosongkan.")
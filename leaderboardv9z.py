@@ -4,11 +4,16 @@ import streamlit as st
 import io
 import os
 import math
-import re
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import gspread
 
+import gmm_db
+import gmm_import
+import gmm_logship
+import gmm_search
+
 # 1. WAJIB DI ATAS: Konfigurasi Page Streamlit untuk Mobile
 st.set_page_config(
     page_title="GMM RACEBOARD", 
@@ -72,6 +77,8 @@ KAT_CONFIG = {
 # ---------------------------
 # Init DB & queries
 # ---------------------------
+# Filter kode cabang sampah untuk indeks pencarian (sama dengan daftar cabang lama di view pencarian)
+
 # Tambahkan decorator ini agar fungsi hanya dieksekusi sekali per siklus server
 @st.cache_resource
 def init_db():
@@ -134,9 +141,21 @@ def init_db():
     )
     """)
     
+    conn.commit()
+    # DB_PATH dipakai bersama v9x: kolom base/valid, snapshot, indeks pencarian, statistik kunjungan & versi data
+    gmm_db.create_schema(conn)
+    gmm_logship.ensure_shipped_column(conn)
     conn.commit()
     conn.close()
-def get_cabang_leaderboard(kategori="LIVIN"):
+
+@st.cache_resource
+def load_nama_map():
+    # NIP -> nama untuk login; dibuang (load_nama_map.clear) setiap isi tabel pegawai berubah
+    conn = sqlite3.connect(DB_PATH)
+    nama_map = dict(conn.execute("SELECT nip, nama FROM pegawai").fetchall())
+    conn.close()
+    return nama_map
+def _cabang_leaderboard_sql(kategori):
     conf = KAT_CONFIG[kategori]
     sc = conf["score_col"]
     se = conf["sec_col"]
@@ -151,8 +170,7 @@ def get_cabang_leaderboard(kategori="LIVIN"):
         se_expr = f"SUM(p.{se})"
         avg_sc_expr = f"AVG(p.{sc})"
 
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(f"""
+    return f"""
         SELECT k.kode_cabang,
                COALESCE(c.unit, k.kode_cabang) AS unit,
                COALESCE(c.area, '(Unknown)') AS area,
@@ -171,11 +189,14 @@ def get_cabang_leaderboard(kategori="LIVIN"):
         LEFT JOIN cabang c ON k.kode_cabang = c.kode_cabang
         LEFT JOIN pegawai p ON k.kode_cabang = p.kode_cabang
         GROUP BY k.kode_cabang
-        ORDER BY total_balance DESC
-    """, conn)
+    """
+
+def get_cabang_leaderboard(kategori="LIVIN"):
+    conn = sqlite3.connect(DB_PATH)
+    df = pd.read_sql_query(_cabang_leaderboard_sql(kategori) + " ORDER BY total_balance DESC", conn)
     conn.close()
     return df
-def get_pegawai(kode, kategori="LIVIN"):
+def _pegawai_base_sql(kategori):
     conf = KAT_CONFIG[kategori]
     sc = conf["score_col"]
     se = conf["sec_col"]
@@ -188,8 +209,7 @@ def get_pegawai(kode, kategori="LIVIN"):
         sc_expr = sc
         se_expr = se
 
-    conn = sqlite3.connect(DB_PATH)
-    base_query = f"""
+    return f"""
         SELECT nip, nama, kode_cabang, unit, 
                IFNULL({sc_expr},0) AS end_balance, 
                IFNULL({se_expr},0) AS cif_akuisisi, 
@@ -200,6 +220,10 @@ def get_pegawai(kode, kategori="LIVIN"):
           AND TRIM(kode_cabang) != '' 
           AND LOWER(kode_cabang) NOT IN ('unknown', 'nan')
     """
+
+def get_pegawai(kode, kategori="LIVIN"):
+    conn = sqlite3.connect(DB_PATH)
+    base_query = _pegawai_base_sql(kategori)
     
     if kode is None or kode == "ALL":
         df = pd.read_sql_query(base_query + " ORDER BY end_balance DESC, cif_akuisisi DESC", conn)
@@ -213,12 +237,22 @@ def get_pegawai(kode, kategori="LIVIN"):
             df = pd.read_sql_query(base_query + " AND area = ? ORDER BY end_balance DESC, cif_akuisisi DESC", conn, params=(kode,))
     conn.close()
     return df
-def normalize_val(x):
-    if pd.isna(x) or x is None: return 0
-    s = str(x).strip().replace(',', '.')
-    s = re.sub(r'[^\d\.-]', '', s)
-    try: return float(s)
-    except: return 0
+def top_bottom(entity, kategori="LIVIN", n=3, exclude_kelas=None):
+    # Hanya n baris teratas & terbawah: ORDER BY ... LIMIT (top-N sort SQLite), tanpa fetch seluruh tabel.
+    # Bottom urut dari yang paling bawah; exclude_kelas hanya menyaring daftar bottom cabang.
+    if entity == "cabang":
+        sql, keys = f"SELECT * FROM ({_cabang_leaderboard_sql(kategori)})", ["total_balance"]
+    else:
+        sql, keys = _pegawai_base_sql(kategori), ["end_balance", "cif_akuisisi"]
+    bot_sql, params = sql, ()
+    if exclude_kelas and entity == "cabang":
+        bot_sql, params = sql + " WHERE kelas_cabang != ?", (exclude_kelas,)
+
+    conn = sqlite3.connect(DB_PATH)
+    top = pd.read_sql_query(sql + f" ORDER BY {', '.join(k + ' DESC' for k in keys)} LIMIT ?", conn, params=(n,))
+    bot = pd.read_sql_query(bot_sql + f" ORDER BY {', '.join(k + ' ASC' for k in keys)} LIMIT ?", conn, params=params + (n,))
+    conn.close()
+    return top, bot
 
 # ---------------------------
 # CSS Khusus Mobile & Desktop
@@ -379,6 +413,10 @@ if "kode" in params:
     st.session_state.view = "pegawai"
     st.session_state.kode = str(params.get("kode")).strip()
     st.query_params.clear()
+if "nip" in params:
+    st.session_state.view = "detail_pegawai"
+    st.session_state.detail_nip = str(params.get("nip")).strip()
+    st.query_params.clear()
 if "view" in params:
     st.session_state.view = str(params.get("view"))
     st.query_params.clear()
@@ -386,6 +424,18 @@ if "view" in params:
 # ---------------------------
 # FUNGSI LOGGING & HALAMAN LOGIN
 # ---------------------------
+@st.cache_resource
+def get_log_shipper():
+    # Satu worker per proses server; client gspread dibuat sekali lalu di-cache oleh shipper
+    if "gcp_service_account" not in st.secrets: return None
+    creds = dict(st.secrets["gcp_service_account"])
+    return gmm_logship.LogShipper(DB_PATH, lambda: gspread.service_account_from_dict(creds)).start()
+
+@st.cache_resource
+def get_access_log_queue():
+    shipper = get_log_shipper()
+    return gmm_logship.AccessLogQueue(gmm_logship.sqlite_writer(DB_PATH), on_commit=shipper.wake if shipper is not None else None)
+
 def log_visitor(nip, nama):
     try:
         headers = st.context.headers
@@ -395,48 +445,17 @@ def log_visitor(nip, nama):
         
     waktu_sekarang = datetime.now(ZoneInfo("Asia/Makassar")).strftime("%Y-%m-%d %H:%M:%S")
 
-    # 1. Simpan ke Database SQLite Lokal
-    try:
-        conn = sqlite3.connect(DB_PATH, timeout=15.0)
-        cur = conn.cursor()
-        cur.execute("INSERT INTO access_log (waktu, nip, nama, ip_address) VALUES (?, ?, ?, ?)", 
-                    (waktu_sekarang, nip, nama, ip_address))
-        conn.commit()
-    except Exception as e:
-        print(f"Error SQLite: {e}")
-    finally:
-        conn.close()
-
-    # 2. Simpan ke Google Sheets
-    # 2. Simpan ke Google Sheets
-    try:
-        # Menarik kredensial dari file .streamlit/secrets.toml
-        gc = gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-        
-        # SESUAIKAN: Nama file Google Sheet Anda di kiri atas adalah "Log GMM R11"
-        sh = gc.open("Log GMM R11")
-        
-        # SESUAIKAN: Nama tab di pojok kiri bawah adalah "log_access"
-        worksheet = sh.worksheet("log_access")
-        
-        # Siapkan data sebagai list (berurutan sesuai kolom)
-        new_row = [waktu_sekarang, nip, nama, ip_address]
-        
-        # Tambahkan data di baris paling bawah yang kosong
-        worksheet.append_row(new_row)
-        
-    except Exception as e:
-        print(f"Gagal mengirim log ke Google Sheets: {e}")
+    # Masuk antrian write-behind (group commit); worker Google Sheets dibangunkan setelah commit
+    get_access_log_queue().put(waktu_sekarang, nip, nama, ip_address)
     
 def get_visit_stats(n):
+    # Lookup PK di visit_stats (dijaga trigger access_log), bukan agregasi log penuh
     conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*), MAX(waktu) FROM access_log WHERE nip = ?", (n,))
-    stats = cur.fetchone()
+    count, last_visit = gmm_logship.get_visit_stats(conn, n)
     conn.close()
     
-    visit_count = (stats[0] if stats[0] else 0) + 1 
-    last_visit = stats[1] if stats[1] else "Ini kunjungan pertama Anda"
+    visit_count = count + 1 
+    last_visit = last_visit if last_visit else "Ini kunjungan pertama Anda"
     return visit_count, last_visit
 
 # TAMPILAN LOGIN
@@ -454,12 +473,9 @@ if not st.session_state.logged_in:
             if submit_btn:
                 nip_clean = nip_input.strip()
                 
-                # Fetch nama from DB first
-                conn = sqlite3.connect(DB_PATH)
-                cur = conn.cursor()
-                cur.execute("SELECT nama FROM pegawai WHERE nip = ?", (nip_clean,))
-                user_data = cur.fetchone()
-                conn.close()
+                # Fetch nama dari map NIP -> nama yang di-cache
+                nama_map = load_nama_map()
+                user_data = (nama_map[nip_clean],) if nip_clean in nama_map else None
                 
                 # Cek Admin (Menggunakan NIP Admin Spesifik atau Admin123)
                 if nip_clean == st.secrets["admin_nip"] or nip_clean.lower() == st.secrets["admin_pass"]:
@@ -612,13 +628,14 @@ if st.session_state.show_update_panel and st.session_state.get("is_admin", False
             SELECT 
                 nip AS NIP, 
                 nama AS Nama, 
-                COUNT(*) AS 'Total Kunjungan', 
-                MAX(waktu) AS 'Kunjungan Terakhir' 
-            FROM access_log 
-            GROUP BY nip, nama 
-            ORDER BY 'Total Kunjungan' DESC
+                visit_count AS 'Total Kunjungan', 
+                last_visit AS 'Kunjungan Terakhir' 
+            FROM visit_stats 
+            ORDER BY visit_count DESC
         """, conn)
         st.dataframe(df_summary, width='stretch', hide_index=True)
+        q_stats = get_access_log_queue().stats()
+        st.caption(f"Antrian log: {q_stats['depth']} baris menunggu · {q_stats['commits']} commit · latensi commit rata-rata {q_stats['avg_commit_ms']} ms (maks {q_stats['max_commit_ms']} ms)")
         
         # Tabel Log Mentah (100 log terakhir)
         st.markdown("#### 🕵️ 100 Riwayat Akses Terakhir")
@@ -631,123 +648,49 @@ if st.session_state.show_update_panel and st.session_state.get("is_admin", False
         upload_file = st.file_uploader("Upload Excel (.xlsx/.xls) - Berisi sheet GMM LIVIN, GMM MERCHANT, GMM TRANSAKSI", type=['xlsx','xls'])
         if upload_file:
             try:
+                t_read = time.perf_counter()
                 xls = pd.read_excel(upload_file, sheet_name=None, dtype=str)
+                durasi_baca = time.perf_counter() - t_read
                 st.success(f"Berhasil membaca {len(xls)} sheet: {', '.join(xls.keys())}")
                 
                 if st.button("Mulai Import Semua Sheet"):
-                    conn = sqlite3.connect(DB_PATH)
-                    cur = conn.cursor()
+                    conn = sqlite3.connect(DB_PATH, timeout=15.0)
                     
-                    master_data = {}
-                    
-                    def find_col(df, aliases):
-                        lc_cols = [str(c).lower().strip() for c in df.columns]
-                        for a in aliases:
-                            if a.lower() in lc_cols: return df.columns[lc_cols.index(a.lower())]
-                        return None
-
-                    # 1. Sheet LIVIN
-                    if "GMM LIVIN" in xls:
-                        df_l = xls["GMM LIVIN"]
-                        c_nip = find_col(df_l, ['nip'])
-                        c_nama = find_col(df_l, ['nama','employee name'])
-                        c_kode = find_col(df_l, ['kode cabang','kode_cabang'])
-                        if c_nip and c_nama:
-                            for _, r in df_l.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                master_data[nip] = {
-                                    'nip': nip, 'nama': str(r[c_nama]).strip(),
-                                    'kode_cabang': str(r[c_kode]).strip() if c_kode else '',
-                                    'unit': str(r[find_col(df_l, ['nama cabang','unit'])]).strip() if find_col(df_l, ['nama cabang','unit']) else '',
-                                    'area': str(r[find_col(df_l, ['area','wilayah'])]).strip() if find_col(df_l, ['area','wilayah']) else '',
-                                    'kelas_cabang': str(r[find_col(df_l, ['kelas cabang','kelas'])]).strip() if find_col(df_l, ['kelas cabang','kelas']) else '',
-                                    'posisi': str(r[find_col(df_l, ['posisi','unit kerja'])]).strip() if find_col(df_l, ['posisi','unit kerja']) else '',
-                                    'cif_akuisisi': normalize_val(r[find_col(df_l, ['cif akuisisi','cif'])]),
-                                    'cif_setor': normalize_val(r[find_col(df_l, ['cif setor'])]),
-                                    'end_balance': normalize_val(r[find_col(df_l, ['end_balance','end balance'])]),
-                                    'rata_rata': normalize_val(r[find_col(df_l, ['rata-rata','rata rata'])]),
-                                    'cif_sudah_transaksi': normalize_val(r[find_col(df_l, ['cif_sudah_transaksi','cif sudah transaksi'])]),
-                                }
-
-                    # 2. Sheet MERCHANT
-                    if "GMM MERCHANT" in xls:
-                        df_m = xls["GMM MERCHANT"]
-                        c_nip = find_col(df_m, ['nip'])
-                        if c_nip:
-                            for _, r in df_m.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data:
-                                    master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_m, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_referral_livin'] = normalize_val(r[find_col(df_m, ['total referral livin'])])
-                                master_data[nip]['total_referral_edc'] = normalize_val(r[find_col(df_m, ['total referral edc'])])
-
-                    # 3. Sheet TRANSAKSI
-# 3. Sheet TRANSAKSI
-                    if "GMM TRANSAKSI" in xls:
-                        df_t = xls["GMM TRANSAKSI"]
-                        c_nip = find_col(df_t, ['nip'])
-                        if c_nip:
-                            for _, r in df_t.iterrows():
-                                nip = str(r[c_nip]).strip()
-                                if nip == 'nan' or not nip: continue
-                                if nip not in master_data:
-                                    master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_t, ['nama pegawai','nama'])]).strip()}
-                                master_data[nip]['total_poin_transaksi'] = normalize_val(r[find_col(df_t, ['total poin transaksi'])])
-                                master_data[nip]['poin_on_us'] = normalize_val(r[find_col(df_t, ['poin on us'])])
-                                master_data[nip]['poin_off_us'] = normalize_val(r[find_col(df_t, ['poin off us'])])
-                                
-                                # AMBIL DATA FREKUENSI SESUAI KOLOM BARU
-                                master_data[nip]['frek_on_us'] = normalize_val(r[find_col(df_t, ['frek on us'])])
-                                master_data[nip]['frek_off_us'] = normalize_val(r[find_col(df_t, ['frek off us'])])
-                                master_data[nip]['pct_on_us'] = r[find_col(df_t, ['pct on us'])]
-
-                    inserted = 0
-                    for nip, d in master_data.items():
-                        d.setdefault('kode_cabang', ''); d.setdefault('unit', ''); d.setdefault('area', ''); d.setdefault('kelas_cabang', '')
-                        d.setdefault('end_balance', 0); d.setdefault('cif_akuisisi', 0); d.setdefault('cif_setor', 0)
-                        d.setdefault('cif_sudah_transaksi', 0); d.setdefault('rata_rata', 0)
-                        d.setdefault('total_referral_livin', 0); d.setdefault('total_referral_edc', 0)
-                        d.setdefault('total_poin_transaksi', 0); d.setdefault('poin_on_us', 0); d.setdefault('poin_off_us', 0)
-                        d.setdefault('frek_on_us', 0); d.setdefault('frek_off_us', 0); d.setdefault('pct_on_us', 0)
-
-                        if d['kode_cabang']:
-                            cur.execute("INSERT OR IGNORE INTO cabang (kode_cabang, unit, area, kelas_cabang) VALUES (?, ?, ?, ?)",
-                                        (d['kode_cabang'], d.get('unit'), d.get('area'), d.get('kelas_cabang')))
-                        
-                        cur.execute("""
-                            INSERT OR REPLACE INTO pegawai 
-                            (nip, nama, kode_cabang, unit, area, posisi, end_balance, cif_akuisisi, cif_setor, cif_sudah_transaksi, rata_rata,
-                             total_referral_livin, total_referral_edc, total_poin_transaksi, poin_on_us, poin_off_us, frek_on_us, frek_off_us, pct_on_us)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (d['nip'], d['nama'], d['kode_cabang'], d.get('unit'), d.get('area'), d.get('posisi',''), 
-                              d['end_balance'], d['cif_akuisisi'], d['cif_setor'], d['cif_sudah_transaksi'], d['rata_rata'],
-                              d['total_referral_livin'], d['total_referral_edc'], d['total_poin_transaksi'], d['poin_on_us'], d['poin_off_us'], d['frek_on_us'], d['frek_off_us'], d['pct_on_us']))
-                        inserted += 1
-
-                    conn.commit()
+                    timings = {"Baca Excel": durasi_baca}
+                    master = gmm_import.build_master_frame(xls, timings)
+
+                    # Jalur tulis yang sama dengan v9x: flag valid, snapshot leaderboard, indeks pencarian
+                    # & versi data ikut diperbarui sehingga v9x tidak menyajikan snapshot/cache lama
+                    inserted = gmm_db.bulk_load_master(conn, master, timings=timings)
                     conn.close()
+                    load_nama_map.clear()
                     st.success(f"Import selesai! Berhasil update {inserted} data pegawai gabungan.")
+                    st.markdown("##### ⏱️ Rincian Waktu Proses")
+                    st.dataframe(gmm_import.format_timings(timings), width='stretch', hide_index=True)
 
             except Exception as e:
                 st.error(f"Gagal memproses file: {e}")
 
         if st.button("⚠️ Hapus Seluruh Database"):
             conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute("DELETE FROM pegawai")
-            cur.execute("DELETE FROM cabang")
+            gmm_db.clear_master_data(conn.cursor())
             conn.commit()
             conn.close()
+            load_nama_map.clear()
             st.success("Database berhasil dikosongkan.")
         if st.button("Hapus Database"):
             conn = sqlite3.connect(DB_PATH)
             cur = conn.cursor()
             cur.execute("DROP TABLE pegawai")
             cur.execute("DROP TABLE cabang")
+            cur.execute("DROP TABLE IF EXISTS leaderboard_snapshot")
+            cur.execute("DROP TABLE IF EXISTS search_index")
+            # init_db hanya jalan sekali per proses: buat ulang skema di sini, lalu tandai versi data baru
+            gmm_db.create_schema(conn)
+            gmm_db.bump_data_version(cur)
             conn.commit()
             conn.close()
+            load_nama_map.clear()
             st.success("Database berhasil dikosongkan.")
 
 kategori_aktif = st.session_state.kategori
@@ -1020,27 +963,19 @@ if st.session_state.view == "pencarian":
     st.subheader("🔍 Pencarian Profil Cabang dan Pegawai")
     st.markdown("<p class='small-muted'>Cari profil spesifik berdasarkan Nama, NIP Pegawai, atau Nama Unit Cabang.</p>", unsafe_allow_html=True)
 
-    # Mengambil list semua Pegawai dan Cabang
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute("SELECT nip, nama FROM pegawai ORDER BY nama ASC")
-    peg_list = [f"👤 {row[0]} - {row[1]}" for row in cur.fetchall()]
-    
-    # UBAH BARIS INI: Tambahkan filter WHERE pada query cabang
-    cur.execute("""
-        SELECT kode_cabang, unit FROM cabang 
-        WHERE kode_cabang IS NOT NULL AND TRIM(kode_cabang) != '' AND LOWER(kode_cabang) NOT IN ('unknown', 'nan') 
-        ORDER BY unit ASC
-    """)
-    cab_list = [f"🏢 {row[0]} - {row[1]}" for row in cur.fetchall()]
-    conn.close()
+    # Pencarian di server (indeks search_index), hanya 20 hasil teratas yang dikirim ke browser
+    query = st.text_input("Cari Cabang / Pegawai:", placeholder="Ketik Nama, NIP, Unit atau Kode Cabang")
+    matches = []
+    if query.strip():
+        conn = sqlite3.connect(DB_PATH)
+        matches = gmm_search.search(conn, query)
+        conn.close()
+        if not matches: st.info("Tidak ada cabang / pegawai yang cocok.")
 
-    # Menggabungkan list
-    all_options = ["-- Ketik atau Pilih Disini --"] + cab_list + peg_list
+    all_options = ["-- Ketik atau Pilih Disini --"] + [f"{'👤' if entity == 'pegawai' else '🏢'} {entity_id} - {nama}" for entity, entity_id, nama in matches]
     
     # Input pencarian adaptif
-    selected_profile = st.selectbox("Cari Cabang / Pegawai:", options=all_options)
+    selected_profile = st.selectbox(f"Pilih Hasil Pencarian ({len(matches)} teratas):", options=all_options)
 
     if selected_profile != "-- Ketik atau Pilih Disini --":
         st.markdown("<hr style='border-color:rgba(255,255,255,0.05); margin-top:0;'>", unsafe_allow_html=True)
@@ -1094,25 +1029,13 @@ if st.session_state.kategori == "HOME" and st.session_state.view not in ["detail
 
     for kat in kats:
         st.markdown(f"<h3 style='color: var(--accent); margin-top: 30px;'>📊 KATEGORI {kat}</h3>", unsafe_allow_html=True)
-        df_c = get_cabang_leaderboard(kat)
-        df_p = get_pegawai("ALL", kat)
-        
         # Pisahkan formatter karena TRANSAKSI cabang dan pegawai beda metrik
         fmt_fn_p = KAT_CONFIG[kat]["fmt"]
         fmt_fn_c = fmt_num if kat == "TRANSAKSI" else KAT_CONFIG[kat]["fmt"]
         
-        df_c_active = df_c
-        df_p_active = df_p
-        
-        if not df_c_active.empty:
-            df_c_bot_filtered = df_c_active[df_c_active['kelas_cabang'] != "A/R"]
-        else:
-            df_c_bot_filtered = df_c_active
-
-        top_c = df_c.head(3)
-        bot_c = df_c_bot_filtered.tail(3).iloc[::-1] if not df_c_bot_filtered.empty else df_c_bot_filtered.head(0)
-        top_p = df_p.head(3)
-        bot_p = df_p_active.tail(3).iloc[::-1] if not df_p_active.empty else df_p.tail(3).iloc[::-1]
+        # Bottom cabang tanpa kelas A/R
+        top_c, bot_c = top_bottom("cabang", kat, 3, exclude_kelas="A/R")
+        top_p, bot_p = top_bottom("pegawai", kat, 3)
         
         c1, c2 = st.columns(2)
         # Gunakan fmt_fn_c untuk Cabang
@@ -1125,6 +1048,21 @@ if st.session_state.kategori == "HOME" and st.session_state.view not in ["detail
         with p2: st.markdown(render_mini_list(f"Bot 3 Pegawai {kat}", bot_p, "nama", "unit", "end_balance", fmt_fn_p, True), unsafe_allow_html=True)
         st.markdown("<hr style='border-color: rgba(255,255,255,0.06); margin: 10px 0;'>", unsafe_allow_html=True)
 
+# ---------------------------
+# Tabel Navigasi (Klik Baris -> Query Param)
+# ---------------------------
+def render_nav_table(df_show, nav_values, nav_param, key):
+    """Render daftar sebagai SATU elemen st.dataframe, bukan kolom + tombol per baris.
+
+    Klik sebuah baris menulis `nav_param` (kode / nip) ke query params lalu
+    rerun; perpindahan view ditangani blok Routing & Parameter di atas.
+    """
+    event = st.dataframe(df_show, hide_index=True, width='stretch', height=(len(df_show) + 1) * 35 + 3,
+                         on_select="rerun", selection_mode="single-row", key=key)
+    if event.selection.rows:
+        st.query_params[nav_param] = str(list(nav_values)[event.selection.rows[0]])
+        st.rerun()
+
 # ---------------------------
 # View: Cabang
 # ---------------------------
@@ -1141,86 +1079,38 @@ if st.session_state.view == "cabang":
     if area_filter != "All Area": df = df[df['area'] == area_filter]
     if kelas_filter != "All Kelas": df = df[df['kelas_cabang'] == kelas_filter]
 
-    total_all = df['total_balance'].sum() if not df.empty else 0
     st.subheader(f"🏆 Top 3 Cabang - {kategori_aktif}")
     
-    # ---------------------------
-    # MODIFIKASI: Tombol Streamlit pada Top 3 Cabang
-    # ---------------------------
-    for i in range(min(3, len(df))):
-        r = df.iloc[i]
-        share_pct = (r['total_balance'] / total_all * 100) if total_all > 0 else 0
-        medals = [("Rank 1", "🥇", "gold"), ("Rank 2", "🥈", "silver"), ("Rank 3", "🥉", "bronze")]
-        label, emoji, cls = medals[i]
-        
-        st.markdown(f"""
-        <div class='leaderboard-card' style="margin-bottom: 4px; border-bottom-left-radius: 0; border-bottom-right-radius: 0;">
-            <div style='display:flex;justify-content:space-between;align-items:flex-start;'>
-            <div>
-                <div class='medal {cls}'>{emoji} {label}</div>
-                <div style='font-weight:800; font-size:1.1rem;'>{r['unit']}</div>
-                <div class='small-muted'>{r['area']}</div>
-            </div>
-            <div style='text-align:right'>
-                <div style='font-weight:800; font-size:1.2rem; color:var(--accent);'>{fmt_fungsi(r['total_balance'])}</div>
-                <div class='small-muted'>{r['kode_cabang']}</div>
-            </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # --- POSISI TOMBOL DI KANAN ---
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.markdown(f"<div class='small-muted' style='padding-left:12px;'>{label_kedua}: <span style='color:white;font-weight:bold;'>{fmt_num(r['total_cif'])}</span></div>", unsafe_allow_html=True)
-        with col2:
-            if st.button(f"Detail ➔", key=f"btn_top_{r['kode_cabang']}", width='stretch'):
-                st.session_state.view = "pegawai"
-                st.session_state.kode = r["kode_cabang"]
-                st.rerun()
-        st.markdown("<hr style='border-color: rgba(255,255,255,0.05); margin: 8px 0px 16px 0px;'>", unsafe_allow_html=True)
+    # Top 3: satu tabel (satu elemen), klik baris -> ?kode=<kode_cabang>
+    df_top = df.head(3).reset_index(drop=True)
+    if not df_top.empty:
+        medals = ["🥇 Rank 1", "🥈 Rank 2", "🥉 Rank 3"]
+        render_nav_table(pd.DataFrame({
+            "Rank": medals[:len(df_top)],
+            "Cabang": df_top['unit'],
+            "Area": df_top['area'],
+            "Kode": df_top['kode_cabang'],
+            label_utama: df_top['total_balance'].map(fmt_fungsi),
+            label_kedua: df_top['total_cif'].map(fmt_num),
+        }), df_top['kode_cabang'], "kode", key=f"tbl_top_{kategori_aktif}_{area_filter}_{kelas_filter}")
 
     st.markdown("<br><h4 style='font-size:1.1rem;'>Daftar Semua Cabang</h4>", unsafe_allow_html=True)
 
     # ---------------------------
-    # MODIFIKASI: Tombol Streamlit pada Semua Cabang
+    # Semua Cabang: satu tabel (satu elemen), klik baris -> ?kode=<kode_cabang>
     # ---------------------------
-    for rank, (_, r) in enumerate(df.iterrows(), start=1):
-        kode_cb = r.get('kode_cabang', '')
-        unit = r.get('unit', '')
-        area = r.get('area', '')
-        total_balance = r.get('total_balance', 0)
-        total_cif = r.get('total_cif', 0)
-        
-        rank_cls, medal, rank_label = ("", "", str(rank))
-        if rank == 1: rank_cls, medal, rank_label = ("top1", "🥇", "1")
-        elif rank == 2: rank_cls, medal, rank_label = ("top2", "🥈", "2")
-        elif rank == 3: rank_cls, medal, rank_label = ("top3", "🥉", "3")
-
-        # --- MENGGUNAKAN KOLOM UNTUK KIRI & KANAN ---
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            row_left = f"""
-            <div style="display: flex; align-items: center; gap: 12px; margin-bottom: 4px;">
-                <div class="rank-badge {rank_cls}">{medal} {rank_label}</div>
-                <div class="row-meta">
-                    <div class="unit">{unit}</div>
-                    <div class="info small-muted">Area: {area} • Kode: {kode_cb}</div>
-                    <div class="info small-muted">{label_utama}: <span style="color:white;font-weight:bold;">{fmt_fungsi(total_balance)}</span>&nbsp;|&nbsp;{label_kedua}:<span style="color:white;font-weight:bold;">{fmt_fungsi(total_cif)}</span></div>
-                </div>
-            </div>
-            """
-            st.markdown(row_left, unsafe_allow_html=True)
-            
-        with col2:
-            # Spacer agar tombol sejajar dengan tengah teks
-            st.markdown("<div style='height: 8px;'></div>", unsafe_allow_html=True)
-            if st.button("Lihat ➔", key=f"btn_cb_{kode_cb}_{rank}", width='stretch'):
-                st.session_state.view = "pegawai"
-                st.session_state.kode = kode_cb
-                st.rerun()
-                
-        st.markdown("<hr style='border-color: rgba(255,255,255,0.05); margin: 4px 0px 12px 0px;'>", unsafe_allow_html=True)
+    df_all = df.reset_index(drop=True)
+    medals = {1: "🥇 1", 2: "🥈 2", 3: "🥉 3"}
+    df_show = pd.DataFrame({
+        "Rank": [medals.get(i, str(i)) for i in range(1, len(df_all) + 1)],
+        "Cabang": df_all['unit'],
+        "Area": df_all['area'],
+        "Kode": df_all['kode_cabang'],
+        label_utama: df_all['total_balance'].map(fmt_fungsi),
+        label_kedua: df_all['total_cif'].map(fmt_fungsi),
+    })
+    st.caption("Klik baris cabang untuk melihat daftar pegawainya.")
+    render_nav_table(df_show, df_all['kode_cabang'], "kode", key=f"tbl_cb_{kategori_aktif}_{area_filter}_{kelas_filter}")
 
 
 # ---------------------------
@@ -1384,43 +1274,19 @@ if st.session_state.view == "pegawai":
         end = start + page_size
         dfp_page = dfp_all.iloc[start:end]
 
-        # ---------------------------
-        # MODIFIKASI: Tombol Streamlit pada Daftar Pegawai
-        # ---------------------------
-        for idx, (_, r) in enumerate(dfp_page.iterrows(), start=start+1):
-            nama, nip, posisi = r.get('nama', '-'), r.get('nip', ''), r.get('posisi','')
-            cif_display = fmt_num(r.get('cif_akuisisi', 0))
-            end_bal = fmt_fungsi(r.get('end_balance', 0))
-            
-            rank_cls, medal, rank_label = ("", "", str(idx))
-            if idx == 1: rank_cls, medal, rank_label = ("top1", "🥇", "1")
-            elif idx == 2: rank_cls, medal, rank_label = ("top2", "🥈", "2")
-            elif idx == 3: rank_cls, medal, rank_label = ("top3", "🥉", "3")
-
-            # --- MENGGUNAKAN KOLOM UNTUK KIRI & KANAN ---
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                row_left = f"""
-                <div style="display: flex; align-items: center; gap: 12px; margin-bottom: 4px;">
-                    <div class="rank-badge {rank_cls}">{medal} {rank_label}</div>
-                    <div class="row-meta">
-                        <div class="name">{nama}</div>
-                        <div class="small-muted">{nip} · {posisi}</div>
-                                            <div class="info small-muted">{label_utama}: <span style="color:white;font-weight:bold;">{end_bal}</span>&nbsp;|&nbsp;{label_kedua}:<span style="color:white;font-weight:bold;">{cif_display}</span></div>
-                    </div>
-                </div>
-                """
-                st.markdown(row_left, unsafe_allow_html=True)
-                
-            with col2:
-                # Spacer agar tombol sejajar dengan tengah teks
-                st.markdown("<div style='height: 8px;'></div>", unsafe_allow_html=True)
-                if st.button("Detail ➔", key=f"btn_peg_{nip}_{idx}", width='stretch'):
-                    st.session_state.view = "detail_pegawai"
-                    st.session_state.detail_nip = nip 
-                    st.rerun()
-                    
-            st.markdown("<hr style='border-color: rgba(255,255,255,0.05); margin: 4px 0px 12px 0px;'>", unsafe_allow_html=True)
+        # Satu tabel per halaman (bukan kolom + tombol per baris), klik baris -> ?nip=<nip>
+        medals = {1: "🥇 1", 2: "🥈 2", 3: "🥉 3"}
+        df_show = pd.DataFrame({
+            "Rank": [medals.get(i, str(i)) for i in range(start + 1, start + 1 + len(dfp_page))],
+            "Nama": dfp_page['nama'].fillna('-'),
+            "NIP": dfp_page['nip'],
+            "Posisi": dfp_page['posisi'].fillna(''),
+            label_utama: dfp_page['end_balance'].fillna(0).map(fmt_fungsi),
+            label_kedua: dfp_page['cif_akuisisi'].fillna(0).map(fmt_num),
+        })
+        st.caption("Klik baris pegawai untuk membuka profil.")
+        render_nav_table(df_show, dfp_page['nip'], "nip",
+                         key=f"tbl_pg_{kategori_aktif}_{st.session_state.kode}_{st.session_state.page_num}")
 
         b1, b2, b3 = st.columns([1,2,1])
 
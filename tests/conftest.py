@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gmm_db
+from gmm_import import TEXT_COLS, NUM_COLS
+
+AREAS = ["145", "161", "175", "181", "R11"]
+
+
+# ---------------------------
+# Data Sintetis
+# ---------------------------
+def synthetic_master(n_cabang, pegawai_per_cabang=10, seed=0):
+    """Frame master seperti hasil build_master_frame, dengan n_cabang x pegawai_per_cabang baris."""
+    rng = np.random.default_rng(seed)
+    n = n_cabang * pegawai_per_cabang
+    master = pd.DataFrame({"nip": [f"{9000000 + i}" for i in range(n)]})
+    for c in TEXT_COLS: master[c] = ""
+    master["nama"] = [f"PEGAWAI {i}" for i in range(n)]
+    master["kode_cabang"] = np.repeat([f"{i:05d}" for i in range(n_cabang)], pegawai_per_cabang)
+    master["unit"] = "KCP " + master["kode_cabang"]
+    master["area"] = rng.choice(AREAS, n)
+    master["kelas_cabang"] = rng.choice(["A", "B", "C", "A/R"], n)
+    master["posisi"] = rng.choice(["CS", "TELLER", "BO", "SALES"], n)
+    for c in NUM_COLS: master[c] = rng.integers(0, 1000, n).astype("float64")
+    return master
+
+def build_database(path, master, with_base=True):
+    """Isi file SQLite `path` dengan `master` (baseline + data berjalan) lewat jalur import aplikasi."""
+    conn = sqlite3.connect(path)
+    try:
+        gmm_db.create_schema(conn)
+        conn.commit()
+        if with_base: gmm_db.bulk_load_master(conn, master.sample(frac=1.0, random_state=1), is_base=True)
+        gmm_db.bulk_load_master(conn, master)
+    finally:
+        conn.close()
+    return path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """File SQLite kosong dengan skema lengkap gmm_db."""
+    path = str(tmp_path / "gmm_test.db")
+    conn = sqlite3.connect(path)
+    gmm_db.create_schema(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture(scope="session")
+def make_master():
+    """Factory: make_master(n_cabang, pegawai_per_cabang=10, seed=0) -> frame master sintetis."""
+    return synthetic_master
+
+@pytest.fixture(scope="session")
+def make_database(tmp_path_factory):
+    """Factory: make_database(master, with_base=True) -> path DB sementara berisi master."""
+    return lambda master, with_base=True: build_database(str(tmp_path_factory.mktemp("gmm") / "gmm.db"), master, with_base)
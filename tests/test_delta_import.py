@@ -0,0 +1,57 @@
+"""Import delta harus menghasilkan snapshot & indeks pencarian yang sama dengan import penuh."""
+import sqlite3
+
+import pytest
+
+import gmm_db
+
+
+def _bump(col):
+    def change(up): up.loc[up.index[:20], col] += 1
+    return change
+
+def _rename(up): up.loc[up.index[:5], "nama"] = "PEGAWAI BARU"
+
+CHANGES = {
+    "skor LIVIN": _bump("end_balance"),
+    "skor MERCHANT": _bump("total_referral_edc"),
+    "kolom non-skor": _bump("cif_setor"),
+    "nama": _rename,
+}
+
+
+@pytest.fixture(scope="module")
+def master(make_master):
+    return make_master(50, pegawai_per_cabang=10)
+
+def _import(make_database, master, upload, delta):
+    conn = sqlite3.connect(make_database(master, with_base=False))
+    try:
+        diff_counts = {}
+        gmm_db.bulk_load_master(conn, upload, delta=delta, diff_counts=diff_counts)
+        snapshot = conn.execute("SELECT * FROM leaderboard_snapshot ORDER BY 1, 2, 3").fetchall()
+        search = conn.execute("SELECT * FROM search_index ORDER BY 1, 2").fetchall()
+        return snapshot, search, diff_counts
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("change", list(CHANGES))
+def test_delta_matches_full_import(make_database, master, change):
+    upload = master.copy()
+    CHANGES[change](upload)
+    snapshot, search, diff_counts = _import(make_database, master, upload, delta=True)
+    assert diff_counts["Berubah"] > 0
+    assert (snapshot, search) == _import(make_database, master, upload, delta=False)[:2]
+
+
+def test_changed_cabang_ignores_null_vs_empty(make_database, master):
+    conn = sqlite3.connect(make_database(master, with_base=False))
+    try:
+        conn.execute("UPDATE cabang SET kelas_cabang = NULL, area = area || ' ' WHERE kode_cabang IN (SELECT kode_cabang FROM cabang LIMIT 5)")
+        upload = master.copy()
+        upload["kelas_cabang"] = upload["kelas_cabang"].where(~upload["kode_cabang"].isin(
+            [r[0] for r in conn.execute("SELECT kode_cabang FROM cabang WHERE kelas_cabang IS NULL")]), "")
+        assert gmm_db._changed_cabang(conn, upload).empty
+    finally:
+        conn.close()
@@ -0,0 +1,35 @@
+"""Formatter versi kolom (gmm_format.*_series) harus identik dengan versi scalar per sel."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from gmm_format import (fmt_growth, fmt_num, fmt_pct, fmt_rp, fmt_series, growth_html_series,
+                        fmt_num_series, fmt_pct_series, fmt_rp_series)
+
+VALUES = [0, 1, 0.5, 0.9999, 1.0001, 12.345, 2.5, 3.5, -2.5, -1234567.89, 1234567.5, 9.2e18, 1e20, -1e20,
+          np.nan, np.inf, -np.inf, None, "", "abc", "1.5", " 42 ", "1e3", "-7", True]
+NUMERIC = [v for v in VALUES if isinstance(v, float) or type(v) is int]
+
+SCALAR_SERIES = [(fmt_num, fmt_num_series), (fmt_rp, fmt_rp_series), (fmt_pct, fmt_pct_series)]
+
+
+@pytest.mark.parametrize("scalar, series", SCALAR_SERIES, ids=lambda f: f.__name__)
+def test_series_matches_scalar_mixed(scalar, series):
+    values = pd.Series(VALUES, dtype=object)
+    assert series(values).tolist() == [scalar(v) for v in VALUES]
+
+
+@pytest.mark.parametrize("scalar, series", SCALAR_SERIES, ids=lambda f: f.__name__)
+def test_series_matches_scalar_float_column(scalar, series):
+    values = pd.Series(NUMERIC, dtype="float64")
+    assert series(values).tolist() == [scalar(v) for v in values]
+    assert fmt_series(values, scalar).tolist() == [scalar(v) for v in values]
+
+
+@pytest.mark.parametrize("formatter", [fmt_num, fmt_rp, fmt_pct], ids=lambda f: f.__name__)
+@pytest.mark.parametrize("is_penalty", [False, True])
+def test_growth_series_matches_fmt_growth(formatter, is_penalty):
+    current = pd.Series(VALUES, dtype=object)
+    base = pd.Series(list(reversed(VALUES)), dtype=object)
+    expected = [fmt_growth(c, b, formatter, is_penalty) for c, b in zip(current, base)]
+    assert growth_html_series(current, base, formatter, is_penalty).tolist() == expected
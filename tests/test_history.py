@@ -0,0 +1,38 @@
+"""Delta harian/mingguan dari riwayat snapshot (dipakai HOME lewat gmm_history.top_movers)."""
+import sqlite3
+
+import gmm_db
+import gmm_history
+
+
+def _upload_at(conn, moment):
+    conn.execute("UPDATE snapshot_upload SET uploaded_at = ? WHERE snapshot_id = (SELECT MAX(snapshot_id) FROM snapshot_upload)", (moment,))
+    conn.commit()
+
+
+def test_top_movers_daily_and_weekly(make_master, make_database):
+    master = make_master(20, pegawai_per_cabang=5)
+    conn = sqlite3.connect(make_database(master, with_base=False))
+    try:
+        _upload_at(conn, "2026-01-01 08:00:00")
+        week = master.copy()
+        week.loc[week["nip"] == "9000003", "end_balance"] = 5000.0
+        gmm_db.bulk_load_master(conn, week)
+        _upload_at(conn, "2026-01-07 08:00:00")
+        day = week.copy()
+        day.loc[day["nip"] == "9000007", "end_balance"] = 4000.0
+        gmm_db.bulk_load_master(conn, day)
+        _upload_at(conn, "2026-01-08 08:00:00")
+
+        daily = gmm_history.top_movers(conn, "pegawai", "LIVIN", days=1)
+        assert daily["entity_id"].tolist() == ["9000007"]
+        assert daily["rank_current"].iloc[0] == 2
+        assert daily["score"].iloc[0] - daily["score_old"].iloc[0] == 4000.0 - master.loc[master["nip"] == "9000007", "end_balance"].iloc[0]
+
+        weekly = gmm_history.top_movers(conn, "pegawai", "LIVIN", days=7)
+        # Pegawai lain hanya terdorong turun, jadi yang naik dalam seminggu tepat dua ini
+        assert set(weekly["entity_id"]) == {"9000003", "9000007"}
+        assert weekly["rank_change"].is_monotonic_decreasing
+        assert gmm_history.top_movers(conn, "pegawai", "LIVIN", days=30).empty
+    finally:
+        conn.close()
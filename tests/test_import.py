@@ -0,0 +1,121 @@
+"""build_master_frame (vectorized) harus sama dengan loop iterrows lama di admin upload v9x."""
+import re
+
+import numpy as np
+import pandas as pd
+
+import gmm_import
+from gmm_import import NUM_COLS, TEXT_COLS
+
+
+# ---------------------------
+# Implementasi Lama (Per Baris, dari leaderboardv9x sebelum gmm_import)
+# ---------------------------
+def normalize_val(x):
+    if pd.isna(x) or x is None: return 0
+    s = str(x).strip().replace(',', '.')
+    s = re.sub(r'[^\d\.-]', '', s)
+    try: return float(s)
+    except: return 0
+
+def find_col(df, aliases):
+    lc_cols = [str(c).lower().strip() for c in df.columns]
+    for a in aliases:
+        if a.lower() in lc_cols: return df.columns[lc_cols.index(a.lower())]
+    return None
+
+def legacy_master(xls):
+    master_data = {}
+    safe_get_num = lambda row, col: normalize_val(row[col]) if col is not None else 0
+
+    df_l = xls["GMM LIVIN"]
+    c_nip, c_nama, c_kode = find_col(df_l, ['nip']), find_col(df_l, ['nama','employee name']), find_col(df_l, ['kode cabang','kode_cabang'])
+    c_unit, c_area, c_kelas, c_posisi = find_col(df_l, ['nama cabang', 'nama_cabang', 'cabang', 'unit']), find_col(df_l, ['area', 'wilayah']), find_col(df_l, ['kelas cabang', 'kelas']), find_col(df_l, ['posisi', 'unit kerja'])
+    c_cif_akuisisi, c_cif_setor, c_end_balance, c_rata_rata = find_col(df_l, ['cif akuisisi','cif']), find_col(df_l, ['cif setor']), find_col(df_l, ['end_balance','end balance']), find_col(df_l, ['rata-rata','rata rata'])
+    c_cif_trx, c_frek_cif = find_col(df_l, ['cif_sudah_transaksi','cif sudah transaksi']), find_col(df_l, ['frek dari cif akuisisi'])
+    for _, r in df_l.iterrows():
+        nip = str(r[c_nip]).strip()
+        if nip == 'nan' or not nip: continue
+        master_data[nip] = {
+            'nip': nip, 'nama': str(r[c_nama]).strip(),
+            'kode_cabang': str(r[c_kode]).strip() if c_kode else '', 'unit': str(r[c_unit]).strip() if c_unit else '',
+            'area': str(r[c_area]).strip() if c_area else '', 'kelas_cabang': str(r[c_kelas]).strip() if c_kelas else '',
+            'posisi': str(r[c_posisi]).strip() if c_posisi else '',
+            'cif_akuisisi': safe_get_num(r, c_cif_akuisisi), 'cif_setor': safe_get_num(r, c_cif_setor),
+            'end_balance': safe_get_num(r, c_end_balance), 'rata_rata': safe_get_num(r, c_rata_rata),
+            'cif_sudah_transaksi': safe_get_num(r, c_cif_trx), 'frek_dari_cif_akuisisi': safe_get_num(r, c_frek_cif),
+        }
+
+    df_m = xls["GMM MERCHANT"]
+    c_nip = find_col(df_m, ['nip'])
+    for _, r in df_m.iterrows():
+        nip = str(r[c_nip]).strip()
+        if nip == 'nan' or not nip: continue
+        if nip not in master_data: master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_m, ['nama pegawai','nama'])]).strip()}
+        master_data[nip]['total_referral_livin'] = normalize_val(r[find_col(df_m, ['total referral livin'])])
+        master_data[nip]['total_referral_edc'] = normalize_val(r[find_col(df_m, ['total referral edc'])])
+
+    df_t = xls["GMM TRANSAKSI"]
+    c_nip = find_col(df_t, ['nip'])
+    for _, r in df_t.iterrows():
+        nip = str(r[c_nip]).strip()
+        if nip == 'nan' or not nip: continue
+        if nip not in master_data: master_data[nip] = {'nip': nip, 'nama': str(r[find_col(df_t, ['nama pegawai','nama'])]).strip()}
+        for col, alias in [('total_poin_transaksi', 'total poin transaksi'), ('poin_on_us', 'poin on us'), ('poin_off_us', 'poin off us'),
+                           ('frek_on_us', 'frek on us'), ('frek_off_us', 'frek off us'), ('pct_on_us', 'pct on us')]:
+            master_data[nip][col] = normalize_val(r[find_col(df_t, [alias])])
+
+    # Default sama dengan jalur tulis lama: teks kosong, angka 0
+    rows = [{**{c: '' for c in TEXT_COLS}, **{c: 0.0 for c in NUM_COLS}, **d} for d in master_data.values()]
+    master = pd.DataFrame(rows)[gmm_import.MASTER_COLS]
+    # Satu-satunya beda yang disengaja: sel teks kosong dulu jadi 'nan' (str(NaN)), sekarang ''
+    master[TEXT_COLS] = master[TEXT_COLS].replace('nan', '')
+    return master
+
+
+# ---------------------------
+# Workbook Campuran
+# ---------------------------
+MIXED = ["Rp 1,5", "1.234.567", "-", "", None, np.nan, " 42 ", "12,5%", "abc", "-3,25", "7"]
+
+def mixed_workbook():
+    n = len(MIXED)
+    livin = pd.DataFrame({
+        "NIP": [f"100{i}" for i in range(n)] + ["1001", " 1002 ", "nan", ""],  # duplikat (baris terakhir menang), spasi, NIP kosong
+        "Nama": [f"PEGAWAI {i}" for i in range(n)] + ["PEGAWAI 1 BARU", "PEGAWAI 2 BARU", "X", "Y"],
+        "Kode Cabang": ["00001", " 00002", "00001", None] + ["00003"] * (n - 4) + ["00001", "00002", "", ""],
+        "Nama Cabang": "KCP", "Area": ["145", "161"] * (n // 2) + ["175"] + ["145"] * 4, "Kelas": "A", "Posisi": "CS",
+        "CIF Akuisisi": MIXED + ["9", "8", "1", "1"], "CIF Setor": list(reversed(MIXED)) + ["1", "2", "3", "4"],
+        "End Balance": MIXED + ["Rp 2,5", "-", "5", "5"], "Rata-Rata": "1,0",
+        "CIF Sudah Transaksi": MIXED + ["", None, "1", "1"], "Frek dari CIF Akuisisi": "2",
+    })
+    merchant = pd.DataFrame({
+        "NIP": ["1000", "1001", "2000", "2000", "2001", None],  # 2000/2001: hanya ada di MERCHANT
+        "Nama Pegawai": ["A", "B", "MERCHANT SAJA", "MERCHANT SAJA 2", "MERCHANT LAIN", "Z"],
+        "Total Referral LIVIN": ["1.234.567", "Rp 1,5", "-", "3", "", "1"],
+        "Total Referral EDC": ["5", None, "1,5", "2", "abc", "1"],
+    })
+    transaksi = pd.DataFrame({
+        "NIP": ["1000", "2000", "3000"],
+        "Nama": ["A", "B", "TRANSAKSI SAJA"],
+        "Total Poin Transaksi": ["10", "Rp 1,5", "-"], "Poin On Us": ["1", "", None], "Poin Off Us": ["2", "3", "4"],
+        "Frek On Us": ["5", "6", "7"], "Frek Off Us": ["1", "1", "1"], "Pct On Us": ["0,5", "50%", "-"],
+    })
+    return {"GMM LIVIN": livin, "GMM MERCHANT": merchant, "GMM TRANSAKSI": transaksi}
+
+
+def test_vectorized_master_matches_iterrows():
+    xls = mixed_workbook()
+    expected = legacy_master(xls).sort_values("nip").reset_index(drop=True)
+    actual = gmm_import.build_master_frame(xls).sort_values("nip").reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_streaming_matches_full_read_across_chunks(tmp_path):
+    # chunk_rows kecil: NIP duplikat jatuh di chunk berbeda
+    path = tmp_path / "mixed.xlsx"
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for name, df in mixed_workbook().items(): df.to_excel(writer, sheet_name=name, index=False)
+    full = gmm_import.build_master_frame(pd.read_excel(path, sheet_name=None, dtype=str))
+    streaming = gmm_import.build_master_frame_streaming(str(path), chunk_rows=3)
+    pd.testing.assert_frame_equal(streaming.sort_values("nip").reset_index(drop=True), full.sort_values("nip").reset_index(drop=True))
@@ -0,0 +1,43 @@
+"""JobRunner: job dijalankan, file upload dibersihkan, job yang crash dibatasi max_attempts."""
+import os
+import sqlite3
+
+import gmm_jobs
+
+
+def _runner(db_path, tmp_path, handler, **kwargs):
+    return gmm_jobs.JobRunner(db_path, str(tmp_path / "uploads"), handler, **kwargs)
+
+def _status(db_path, job_id):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT status, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+def _crash(db_path, job_id):
+    # Simulasi proses mati di tengah job: status tertinggal 'running'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1 WHERE id = ?", (job_id,))
+
+
+def test_job_runs_and_counts_attempt(db_path, tmp_path):
+    runner = _runner(db_path, tmp_path, lambda job, report: {"ok": True})
+    runner.start = lambda: runner  # tanpa worker thread; job dijalankan langsung
+    job_id = runner.submit("import", "data.xlsx", b"xlsx")
+    assert runner.run_pending() == 1
+    assert _status(db_path, job_id) == ("done", 1)
+    assert gmm_jobs.get_job(sqlite3.connect(db_path), job_id)["result"] == {"ok": True}
+    assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_running_job_requeued_until_max_attempts(db_path, tmp_path):
+    runner = _runner(db_path, tmp_path, lambda job, report: {}, max_attempts=2)
+    runner.start = lambda: runner
+    job_id = runner.submit("import", "data.xlsx", b"xlsx")
+
+    _crash(db_path, job_id)
+    _runner(db_path, tmp_path, lambda job, report: {}, max_attempts=2)
+    assert _status(db_path, job_id) == ("queued", 1)
+
+    _crash(db_path, job_id)
+    _runner(db_path, tmp_path, lambda job, report: {}, max_attempts=2)
+    assert _status(db_path, job_id) == ("failed", 2)
+    assert os.listdir(tmp_path / "uploads") == []
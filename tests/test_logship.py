@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+import gmm_logship
+
+
+# ---------------------------
+# Client Lokal (Pengganti gspread)
+# ---------------------------
+class FakeWorksheet:
+    def __init__(self, fail_times=0):
+        self.rows = []
+        self.calls = 0
+        self.fail_times = fail_times
+
+    def append_rows(self, rows):
+        self.calls += 1
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("simulasi gagal kirim")
+        self.rows.extend(list(r) for r in rows)
+
+class FakeSheetsClient:
+    """Client palsu dengan antarmuka open().worksheet().append_rows() seperti gspread."""
+    def __init__(self, worksheet=None):
+        self.sheet = worksheet or FakeWorksheet()
+
+    def open(self, name):
+        return self
+
+    def worksheet(self, name):
+        return self.sheet
+
+
+@pytest.fixture
+def db_path(db_path):
+    # Skema gmm_db + kolom watermark shipped (dibuat app saat start)
+    conn = sqlite3.connect(db_path)
+    gmm_logship.ensure_shipped_column(conn)
+    conn.close()
+    return db_path
+
+def insert_logs(db_path, n, start=0):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO access_log (waktu, nip, nama, ip_address) VALUES (?, ?, ?, ?)",
+                     [(f"2026-01-01 00:00:{i:05d}", f"{9000000 + i}", f"PEGAWAI {i}", None) for i in range(start, start + n)])
+    conn.commit()
+    conn.close()
+
+def shipped_flags(db_path):
+    conn = sqlite3.connect(db_path)
+    try: return [r[0] for r in conn.execute("SELECT shipped FROM access_log ORDER BY id")]
+    finally: conn.close()
+
+def make_shipper(db_path, worksheet, sleeps=None, **kwargs):
+    client = FakeSheetsClient(worksheet)
+    sleep = (lambda s: sleeps.append(s)) if sleeps is not None else (lambda s: None)
+    return gmm_logship.LogShipper(db_path, lambda: client, sleep=sleep, **kwargs)
+
+
+def test_ship_pending_sends_in_batches_and_marks_shipped(db_path):
+    insert_logs(db_path, 450)
+    sheet = FakeWorksheet()
+    shipper = make_shipper(db_path, sheet, batch_size=200)
+
+    assert shipper.ship_pending() == 450
+    assert sheet.calls == 3
+    assert [r[1] for r in sheet.rows] == [f"{9000000 + i}" for i in range(450)]
+    assert sheet.rows[0][3] == ""  # NULL dikirim sebagai sel kosong
+    assert set(shipped_flags(db_path)) == {1}
+    assert shipper.pending_count() == 0
+
+    # Putaran berikutnya hanya mengirim baris baru
+    insert_logs(db_path, 5, start=450)
+    assert shipper.ship_pending() == 5
+    assert sheet.calls == 4 and len(sheet.rows) == 455
+
+def test_failed_append_is_retried_with_backoff(db_path):
+    insert_logs(db_path, 10)
+    sheet, sleeps = FakeWorksheet(fail_times=2), []
+    shipper = make_shipper(db_path, sheet, sleeps, max_retries=4, backoff=0.5)
+
+    assert shipper.ship_pending() == 10
+    assert sheet.calls == 3
+    assert sleeps == [0.5, 1.0]
+    assert shipper.last_error is None
+    assert set(shipped_flags(db_path)) == {1}
+
+def test_batch_stays_pending_after_retries_exhausted(db_path):
+    insert_logs(db_path, 10)
+    sheet, sleeps = FakeWorksheet(fail_times=5), []
+    shipper = make_shipper(db_path, sheet, sleeps, max_retries=3, backoff=1.0)
+
+    assert shipper.ship_pending() == 0
+    assert sheet.calls == 3 and sleeps == [1.0, 2.0]
+    assert "simulasi gagal kirim" in shipper.last_error
+    assert set(shipped_flags(db_path)) == {0}
+
+    # Setelah koneksi pulih, baris yang tertunda terkirim tanpa duplikat
+    sheet.fail_times = 0
+    assert shipper.ship_pending() == 10
+    assert len(sheet.rows) == 10
+    assert shipper.pending_count() == 0
+
+def test_stop_flush_is_bounded_by_timeout(db_path):
+    insert_logs(db_path, 10)
+    sheet, sleeps = FakeWorksheet(fail_times=100), []
+    shipper = make_shipper(db_path, sheet, sleeps, max_retries=4, backoff=1.0)
+
+    # Backoff pertama (1 detik) melewati batas 0.5 detik: tidak tidur, baris tetap tertunda
+    shipper.stop(timeout=0.5)
+    assert sheet.calls == 1 and sleeps == []
+    assert set(shipped_flags(db_path)) == {0}
+
+def test_atexit_registered_once_across_restarts(db_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(gmm_logship.atexit, "register", registered.append)
+
+    log_queue = gmm_logship.AccessLogQueue(gmm_logship.sqlite_writer(db_path), flush_ms=1)
+    for i in range(2):
+        log_queue.put("2026-01-01 00:00:00", f"{9000000 + i}", "PEGAWAI", None)
+        log_queue.stop()
+    assert log_queue.rows_written == 2
+
+    shipper = make_shipper(db_path, FakeWorksheet(), interval=0.01)
+    for _ in range(2):
+        shipper.start()
+        shipper.stop(flush=False)
+    assert registered == [log_queue.stop, shipper.stop]
@@ -0,0 +1,57 @@
+"""Regresi EXPLAIN QUERY PLAN: query yang dijalankan view aplikasi tidak boleh full scan tabel.
+
+Setiap query yang benar-benar dijalankan fungsi di bawah (ditangkap via
+trace callback) di-EXPLAIN; baris plan "SCAN <tabel>" tanpa index
+membuat test gagal. Bacaan penuh yang memang disengaja (load
+LeaderboardEngine dari leaderboard_snapshot sekali per versi data, peta
+NIP -> nama) tidak ikut dicek.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import gmm_db
+import gmm_history
+import gmm_logship
+import gmm_search
+
+NIP, KODE = "9000015", "00001"
+SINCE = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+
+VIEWS = {
+    "Ringkasan Dashboard (Home)": lambda conn: gmm_db.query_dashboard_summary(conn),
+    "Versi Data (Kunci Cache)": lambda conn: gmm_db.get_data_version(conn),
+    "Rank Entitas": lambda conn: gmm_db.get_entity_ranks(conn, "pegawai", NIP),
+    "Statistik Kunjungan (Login)": lambda conn: gmm_logship.get_visit_stats(conn, NIP),
+    "Profil Pegawai": lambda conn: gmm_db.query_pegawai_profile(conn, NIP),
+    "Profil Cabang": lambda conn: gmm_db.query_cabang_profile(conn, KODE),
+    "Riwayat Profil": lambda conn: gmm_history.trajectory(conn, "pegawai", NIP, "LIVIN", since=SINCE),
+    "Pencarian (Cari)": lambda conn: gmm_search.search(conn, "PEGAWAI 15"),
+}
+
+
+@pytest.fixture(scope="module")
+def conn(make_master, make_database):
+    conn = sqlite3.connect(make_database(make_master(200, pegawai_per_cabang=10)))
+    yield conn
+    conn.close()
+
+def traced_statements(conn, fn):
+    """Jalankan fn() dan kembalikan semua SELECT yang dieksekusi di conn (parameter sudah tersubstitusi)."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try: fn()
+    finally: conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+@pytest.mark.parametrize("view", list(VIEWS))
+def test_view_queries_use_indexes(conn, view):
+    statements = traced_statements(conn, lambda: VIEWS[view](conn))
+    assert statements, f"{view}: tidak ada query yang tertangkap"
+    for sql in statements:
+        plan = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        # Tabel bayangan FTS5 (mis. search_index_config) dibaca internal oleh virtual table
+        scans = [d for d in plan if d.startswith("SCAN ") and " INDEX " not in d and not d.startswith("SCAN main.search_index_")]
+        assert not scans, f"Full table scan pada {view}: {scans}\n{sql}"